@@ -1,28 +1,174 @@
-from flask import Flask, render_template, request, jsonify, send_file, g
+from flask import Flask, render_template, request, jsonify, g, Response, stream_with_context, has_request_context
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict, defaultdict
+from itertools import accumulate, chain, compress, count, islice, product
+from operator import itemgetter, ne
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+import datetime
+import gc
+import hashlib
+import heapq
+import csv
 import io
+import json
+import mmap
+import multiprocessing
 import openpyxl
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles.numbers import builtin_format_code, is_date_format
+from openpyxl.utils.datetime import from_excel, from_ISO8601, to_excel, MAC_EPOCH, WINDOWS_EPOCH
 import os
+import posixpath
+import re
+import string
+import struct
 import time
 import tempfile
+import threading
 import uuid
 import traceback
 import logging
+import sys
+import zipfile
+import zlib
+from xml.etree import ElementTree
+from xml.parsers import expat
+from xml.sax.saxutils import escape as xml_escape
 from werkzeug.utils import secure_filename
 
+try:
+    import numpy as np
+except ImportError:  # optional: vectorized filters (see _vectorized_filter)
+    np = None
+try:
+    import brotli
+except ImportError:  # optional: br response encoding (see compress_response)
+    brotli = None
+
 app = Flask(__name__)
 # Use a temp dir for uploads on Render (safer for ephemeral containers)
-app.config['UPLOAD_FOLDER'] = os.path.join(tempfile.gettempdir(), 'dart_uploads')
+app.config['UPLOAD_FOLDER'] = os.environ.get('DART_UPLOAD_FOLDER') or os.path.join(tempfile.gettempdir(), 'dart_uploads')
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
+# Reload the last uploaded dataset from its snapshot (see save_snapshot) on startup
+app.config['LOAD_SNAPSHOT'] = os.environ.get('DART_LOAD_SNAPSHOT', '1') != '0'
+# Serve the dataset from the memory-mapped snapshot shared by all worker
+# processes (see _sync_shared_dataset); with '0' each process keeps its own
+app.config['SHARED_DATASET'] = os.environ.get('DART_SHARED_DATASET', '1') != '0'
 ALLOWED_EXTENSIONS = {'xlsx', 'csv'}
+# .xlsx reader: 'stream' reads the sheet XML straight from the archive
+# (XlsxSheetReader), 'openpyxl' uses openpyxl's read-only mode
+XLSX_READER = os.environ.get('DART_XLSX_READER', 'stream')
 BLANK_LABEL = '(blank)'
 
-# Store loaded data in memory
-loaded_data = {
-    'rows': [],
-    'filename': None
-}
+# Several named datasets (catalogs) can be loaded at once; requests that
+# name none use DEFAULT_DATASET
+DEFAULT_DATASET = 'default'
+DATASET_ID_RE = re.compile(r'[A-Za-z0-9_-]{1,64}')
+# Approximate bytes all loaded datasets may hold; beyond it the least
+# recently used ones are evicted to their snapshots (see
+# _enforce_memory_budget). 0 means no limit.
+app.config['DATASET_MEMORY_BUDGET'] = int(float(os.environ.get('DART_DATASET_MEMORY_MB', '0')) * 1024 * 1024)
+
+
+def _empty_dataset(dataset_id):
+    """State of a dataset with nothing loaded; every entry of `datasets` has these keys."""
+    return {
+        'dataset_id': dataset_id,
+        'store': None,
+        'filename': None,
+        'filters': None,
+        'search_index': None,
+        'facet_index': None,
+        # SHA-256 of the uploaded file, kept for saving the snapshot on eviction
+        'source_sha256': None,
+        # changed by every publish, unique across datasets (see _publish_dataset)
+        'generation': 0,
+        # identity of the snapshot file the dataset is mapped from or saved to, if any
+        'snapshot_key': None,
+        # whether the dataset is exactly the content of that snapshot file
+        'in_snapshot': False,
+        # released to save memory; mapped from the snapshot again on next use
+        'evicted': False,
+    }
+
+
+# Loaded datasets by id, least recently used first
+datasets = OrderedDict()
+_generations = count(1)
+# Guards datasets so a new upload is swapped in all at once (see _current_dataset)
+_data_lock = threading.Lock()
+# One memory budget pass at a time (see _enforce_memory_budget)
+_budget_lock = threading.Lock()
+# Evictions per dataset id, for /metrics
+_eviction_counts = Counter()
+# Serializes remapping the shared snapshot (see _sync_shared_dataset)
+_sync_lock = threading.Lock()
 
-# Compact field order used for tuple storage. Keep order matching front-end expectations.
+# Background upload jobs by id (see /upload and /upload/status/<job_id>)
+upload_jobs = {}
+_jobs_lock = threading.Lock()
+# Finished jobs kept for status polling
+MAX_UPLOAD_JOBS = 20
+# Uploads are parsed one at a time, off the request thread
+_upload_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='upload')
+# Files of at least UPLOAD_PROCESS_MIN_BYTES replacing a dataset are parsed
+# in a child process at a lower CPU priority (see _parse_upload_in_process),
+# so parsing neither holds this process's GIL nor takes the CPU from
+# request threads; DART_UPLOAD_PROCESS=0 parses them on the upload thread
+UPLOAD_PROCESS = os.environ.get('DART_UPLOAD_PROCESS', '1') != '0'
+UPLOAD_PROCESS_MIN_BYTES = 4 * 1024 * 1024
+UPLOAD_PROCESS_NICENESS = 10
+# Exports streamed at once per process; further /export requests are
+# answered 503 straight away (DART_EXPORT_CONCURRENCY=0: no limit)
+EXPORT_CONCURRENCY = int(os.environ.get('DART_EXPORT_CONCURRENCY', '2'))
+EXPORT_RETRY_AFTER_SECONDS = 5
+_export_slots = threading.BoundedSemaphore(EXPORT_CONCURRENCY) if EXPORT_CONCURRENCY > 0 else None
+
+# Upper bound on the page size a /search request may ask for
+MAX_SEARCH_PAGE_SIZE = 5000
+# /search result encodings: a list of row dicts, or one list per field with
+# facet values dictionary-encoded (see ColumnStore.to_columns)
+SEARCH_FORMATS = ('rows', 'columns')
+# JSON responses of these endpoints are gzip or brotli encoded when the client
+# accepts it and they are at least COMPRESS_MIN_BYTES long (see
+# compress_response); DART_COMPRESS_RESPONSES=0 leaves that to a proxy
+COMPRESS_RESPONSES = os.environ.get('DART_COMPRESS_RESPONSES', '1') != '0'
+COMPRESSED_ENDPOINTS = frozenset({'search', 'get_filters', 'lookup'})
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 4
+BROTLI_QUALITY = 5
+# /lookup: part numbers resolved per request, and rows returned per number
+# (by default, and at most)
+MAX_LOOKUP_NUMBERS = 1000
+LOOKUP_ROWS_PER_NUMBER = 20
+MAX_LOOKUP_ROWS_PER_NUMBER = 1000
+LOOKUP_MATCHES = ('exact', 'prefix')
+# Query results kept by result_cache (entries, and row ids across all entries);
+# DART_RESULT_CACHE_SIZE=0 disables the cache
+RESULT_CACHE_SIZE = int(os.environ.get('DART_RESULT_CACHE_SIZE', '256'))
+RESULT_CACHE_MAX_ROW_IDS = 4 * 1024 * 1024
+# A query refining a cached one (type-ahead) scans the cached rows instead of
+# using the search index when they are at most this fraction of the dataset
+REFINE_MAX_FRACTION = 1 / 16
+# Queries over datasets of at least PARALLEL_MIN_ROWS rows are split into row
+# ranges searched by a pool of this many processes (see _parallel_row_ids);
+# 0 or 1 keeps every search in the request thread
+SEARCH_PROCESSES = int(os.environ.get('DART_SEARCH_PROCESSES', '0'))
+PARALLEL_MIN_ROWS = int(os.environ.get('DART_PARALLEL_MIN_ROWS', '200000'))
+# With NumPy installed, filters are evaluated over the facet code arrays
+# (see _vectorized_filter); DART_VECTORIZED_FILTERS=0 uses the posting lists
+VECTORIZED_FILTERS = np is not None and os.environ.get('DART_VECTORIZED_FILTERS', '1') != '0'
+# Fuzzy searches (fuzzy=true, see _fuzzy_row_ids): keywords of at least
+# FUZZY_MIN_LENGTH characters found nowhere are replaced by up to
+# FUZZY_MAX_EXPANSIONS similar tokens each, in up to FUZZY_MAX_QUERIES queries
+FUZZY_MIN_LENGTH = 4
+FUZZY_MAX_EXPANSIONS = 5
+FUZZY_MAX_QUERIES = 25
+
+# Field order used for column storage and materialized rows. Keep order matching front-end expectations.
 FIELDS = [
     'item_no',
     'description',
@@ -37,6 +183,50 @@ FIELDS = [
 ]
 # Map field name -> index for fast access
 FIELD_IDX = {name: i for i, name in enumerate(FIELDS)}
+DESC_IDX = FIELD_IDX['description']
+ITEM_IDX = FIELD_IDX['item_no']
+
+# Normalized header each field is read from (see build_header_index)
+FIELD_HEADERS = {
+    'item_no': 'item',
+    'description': 'description',
+    'product_division': 'product division',
+    'material_group': 'material group',
+    'material_group_desc': 'material group desc',
+    'manufacturer_name': 'mfr name',
+    'manufacturer_item_no': 'mfr item',
+    'sales_status': 'sales status',
+    'product_manager': 'product mgr',
+    'sub_item': 'sub item',
+}
+
+# Fields matched by keyword search; the store keeps casefolded text for these.
+SEARCH_FIELDS = ('description', 'item_no', 'manufacturer_item_no')
+# Search fields holding part numbers, which /lookup resolves by their whole
+# (trimmed, casefolded) value or its start, and Best match ranks as such
+PART_NUMBER_FIELDS = ('item_no', 'manufacturer_item_no')
+
+# Request filter name -> row field it applies to
+FILTER_FIELDS = {
+    'manufacturer': 'manufacturer_name',
+    'product_division': 'product_division',
+    'sales_status': 'sales_status',
+    'material_group': 'material_group',
+    'material_group_desc': 'material_group_desc',
+    'product_manager': 'product_manager',
+    'sub_item': 'sub_item',
+}
+
+# Facet field -> key of its option list in the /filters response
+FACET_OPTION_KEYS = {
+    'manufacturer_name': 'manufacturers',
+    'product_division': 'product_divisions',
+    'sales_status': 'sales_statuses',
+    'product_manager': 'product_managers',
+    'sub_item': 'sub_items',
+    'material_group': 'material_groups',
+    'material_group_desc': 'material_group_descs',
+}
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
@@ -52,12 +242,82 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('dart_app')
 
 
+class Histogram:
+    """
+    Prometheus-style cumulative histogram, one series per label value.
+
+    Kept in process memory; with several worker processes each one serves
+    its own metrics.
+    """
+
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, name, help_text, label):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                # per-bucket counts (last one is +Inf), sum
+                series = self._series[label_value] = [[0] * (len(self.BUCKETS) + 1), 0.0]
+            series[0][bisect_left(self.BUCKETS, seconds)] += 1
+            series[1] += seconds
+
+    def exposition(self):
+        """Lines of the Prometheus text format."""
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((k, list(counts), total) for k, (counts, total) in self._series.items())
+        for value, counts, total in series:
+            label = f'{self.label}="{value}"'
+            for bound, count in zip(self.BUCKETS + ('+Inf',), accumulate(counts)):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_sum{{{label}}} {total:.6f}')
+            lines.append(f'{self.name}_count{{{label}}} {sum(counts)}')
+        return lines
+
+
+# Request latency and the per-phase breakdown (see timed_phase), for /metrics
+REQUEST_SECONDS = Histogram('dart_request_duration_seconds', 'Time to produce a response, by endpoint.', 'endpoint')
+PHASE_SECONDS = Histogram('dart_phase_duration_seconds',
+                          'Time spent per request phase (filter, search, materialize, serialize, export-write, ...).',
+                          'phase')
+UPLOAD_PHASE_SECONDS = Histogram('dart_upload_phase_duration_seconds', 'Time spent per upload job phase.', 'phase')
+# (endpoint, status) -> responses sent
+_response_counts = defaultdict(int)
+_response_counts_lock = threading.Lock()
+
+
+def record_phase(name, seconds):
+    """Add time spent in a phase to the current request's Server-Timing and to /metrics."""
+    PHASE_SECONDS.observe(name, seconds)
+    if has_request_context():
+        timings = g.setdefault('phase_timings', {})
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def timed_phase(name):
+    """Time the enclosed block as phase name (see record_phase)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - start)
+
+
 # Request/response logging middleware
 @app.before_request
 def start_request():
     # assign a request id
     rid = str(uuid.uuid4())
     g.request_id = rid
+    g.request_start = time.perf_counter()
     safe_headers = {}
     for h in ['Host', 'User-Agent', 'Content-Type', 'Accept', 'Content-Length']:
         v = request.headers.get(h)
@@ -69,6 +329,20 @@ def start_request():
 @app.after_request
 def after_request(response):
     rid = getattr(g, 'request_id', 'N/A')
+    try:
+        # Phase breakdown of this request (streamed bodies are written later
+        # and only show up in /metrics)
+        elapsed = time.perf_counter() - g.get('request_start', time.perf_counter())
+        timings = g.get('phase_timings', {})
+        response.headers['Server-Timing'] = ', '.join(
+            [f'{name};dur={seconds * 1000:.2f}' for name, seconds in timings.items()]
+            + [f'total;dur={elapsed * 1000:.2f}'])
+        endpoint = request.endpoint or 'unknown'
+        REQUEST_SECONDS.observe(endpoint, elapsed)
+        with _response_counts_lock:
+            _response_counts[endpoint, response.status_code] += 1
+    except Exception:
+        logger.exception(f"[RID:{rid}] recording request timings failed")
     try:
         status = response.status_code
         if status >= 400:
@@ -85,6 +359,37 @@ def after_request(response):
     return response
 
 
+def _response_encoding():
+    """The content coding the client prefers of those available ('br', 'gzip'), or None."""
+    return request.accept_encodings.best_match(('br', 'gzip') if brotli is not None else ('gzip',))
+
+
+# Registered after after_request, so it runs first and its time is part of
+# the Server-Timing header
+@app.after_request
+def compress_response(response):
+    """Encode large JSON responses of COMPRESSED_ENDPOINTS as the client accepts."""
+    if not COMPRESS_RESPONSES or request.endpoint not in COMPRESSED_ENDPOINTS:
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+            or not response.is_json):
+        return response
+    encoding = _response_encoding()
+    body = response.get_data()
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return response
+    with timed_phase('compress'):
+        if encoding == 'br':
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+        else:
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            body = compressor.compress(body) + compressor.flush()
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
 @app.errorhandler(Exception)
 def handle_exception(e):
     rid = getattr(g, 'request_id', str(uuid.uuid4()))
@@ -150,7 +455,911 @@ def build_header_index(header_row):
     
     return header_index, None
 
-def parse_excel_file(filepath):
+def _row_projection(header_index, text_only=False, extra_headers=()):
+    """
+    Precompute the header-mapped column projection for data rows.
+
+    Returns a function mapping a batch of raw rows (lists/tuples of cells) to
+    row tuples in FIELDS order, skipping rows without a description. Missing
+    columns, cells past the end of a short row and None cells become ''.
+    text_only=True (CSV) promises that every cell is a str, never None.
+
+    extra_headers names further (normalized) columns whose cells follow the
+    FIELDS values in each tuple; rows without a description are then kept,
+    for the caller to sort out.
+    """
+    positions = [header_index.get(h, -1) for h in [FIELD_HEADERS[f] for f in FIELDS] + list(extra_headers)]
+    present = [p for p in positions if p != -1]
+    missing = [i for i, p in enumerate(positions) if p == -1]
+    width = max(present) + 1
+    getter = itemgetter(*present)
+    if len(present) == 1:
+        getter = lambda r, _get=getter: (_get(r),)
+
+    def project(r):
+        if len(r) >= width:
+            vals = getter(r)
+        else:
+            vals = tuple(r[p] if p < len(r) else '' for p in present)
+        if missing:
+            vals = list(vals)
+            for i in missing:
+                vals.insert(i, '')
+            vals = tuple(vals)
+        if not text_only and None in vals:
+            vals = tuple('' if v is None else v for v in vals)
+        return vals
+
+    def project_batch(chunk):
+        if text_only and not missing and min(map(len, chunk)) >= width:
+            # Fast path: every column present in every row
+            rows = map(getter, chunk)
+        else:
+            rows = map(project, chunk)
+        if extra_headers:
+            return list(rows)
+        if text_only:
+            return [r for r in rows if r[DESC_IDX].strip()]
+        return [r for r in rows if r[DESC_IDX] and str(r[DESC_IDX]).strip()]
+
+    return project_batch
+
+
+def _progress_logger(label):
+    """Progress callback for DatasetBuilder that logs at most every few seconds."""
+    state = {'last': 0.0}
+
+    def report(rows_loaded, bytes_read, total_bytes):
+        now = time.time()
+        if now - state['last'] < 2.0:
+            return
+        state['last'] = now
+        if bytes_read and total_bytes:
+            logger.info(f"Loading {label}: {rows_loaded} rows ({100 * bytes_read / total_bytes:.0f}%)")
+        else:
+            logger.info(f"Loading {label}: {rows_loaded} rows")
+
+    return report
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Pause the cyclic garbage collector while loading.
+
+    Parsing allocates millions of long-lived objects, which would otherwise
+    trigger repeated full collections; reference counting still frees
+    temporaries as usual.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+class DatasetBuilder:
+    """
+    Streams parsed rows into a new ColumnStore and SearchIndex in batches.
+
+    Parsers call add_batch() with row tuples in FIELDS order; each batch is
+    appended column by column and indexed straight away, so no intermediate
+    row list is kept. The optional progress callback receives
+    (rows_loaded, bytes_read, total_bytes) after every batch; the optional
+    phase callback is called with 'index' when all rows are read and the
+    store and index are being finalized.
+    """
+
+    BATCH_ROWS = 10000
+    # Columns besides FIELDS the parsers pass on (see _row_projection)
+    EXTRA_HEADERS = ()
+
+    def __init__(self, progress=None, phase=None):
+        self.store = ColumnStore()
+        self.search_index = SearchIndex(self.store)
+        self.progress = progress
+        self.phase = phase
+
+    def add_batch(self, rows, bytes_read=None, total_bytes=None):
+        start = len(self.store)
+        texts = self.store.extend(rows)
+        self.search_index.add_batch(start, texts)
+        if self.progress:
+            self.progress(len(self.store), bytes_read, total_bytes)
+
+    def finish(self):
+        """Finalize the store and index; returns the store."""
+        if self.phase:
+            self.phase('index')
+        self.store.finalize()
+        self.search_index.finalize()
+        return self.store
+
+
+class TextColumn:
+    """
+    Strings stored back to back in a single str, delimited by an offsets array.
+
+    Costs roughly one byte per character plus 4 bytes per row, instead of a
+    separate Python object per value. Values are appended during parsing and
+    joined once by finalize().
+    """
+
+    CHUNK_ROWS = 4096
+
+    def __init__(self):
+        self.text = ''
+        self.offsets = array('I', [0])
+        self._chunks = []
+        self._pending = []
+        self._end = 0
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.text[self.offsets[i]:self.offsets[i + 1]]
+
+    def append(self, s):
+        self._pending.append(s)
+        self._end += len(s)
+        self.offsets.append(self._end)
+        if len(self._pending) >= self.CHUNK_ROWS:
+            self._chunks.append(''.join(self._pending))
+            self._pending = []
+
+    def extend(self, strings):
+        """Append a batch of strings."""
+        if self._pending:
+            self._chunks.append(''.join(self._pending))
+            self._pending = []
+        self._chunks.append(''.join(strings))
+        ends = accumulate(map(len, strings), initial=self._end)
+        next(ends)
+        self.offsets.extend(ends)
+        self._end = self.offsets[-1]
+
+    def finalize(self):
+        """Join buffered values into the backing string."""
+        if self._pending or self._chunks:
+            self._chunks.append(''.join(self._pending))
+            self.text = self.text + ''.join(self._chunks)
+            self._chunks = []
+            self._pending = []
+
+    def nbytes(self):
+        return sys.getsizeof(self.text) + self.offsets.itemsize * len(self.offsets)
+
+    def text_offsets(self):
+        """The column as (text, offsets): one str and the str offsets of its rows."""
+        return self.text, self.offsets
+
+    def strings(self):
+        """All rows as a list of str; much faster than indexing row by row."""
+        text, offsets = self.text_offsets()
+        return [text[a:b] for a, b in zip(offsets, islice(offsets, 1, None))]
+
+    @classmethod
+    def spliced(cls, parts):
+        """
+        New column of the rows start:stop of each (column, start, stop) in parts, in order.
+
+        Each run of rows is copied as one slice of the packed text, so splicing
+        a few changed rows into a large column costs about one copy of it.
+        """
+        col = cls()
+        sources = {}
+        pieces = []
+        for src, start, stop in parts:
+            if id(src) not in sources:
+                sources[id(src)] = src.text_offsets()
+            text, offsets = sources[id(src)]
+            lo = offsets[start]
+            pieces.append(text[lo:offsets[stop]])
+            shift = col._end - lo
+            run = offsets[start + 1:stop + 1]
+            if np is not None:
+                col.offsets.frombytes((np.asarray(run, np.int64) + shift).astype(np.uint32).tobytes())
+            else:
+                col.offsets.extend([o + shift for o in run])
+            col._end = col.offsets[-1]
+        col.text = ''.join(pieces)
+        return col
+
+    def _haystack(self):
+        """(text to search, where this column starts in it, word -> needle)."""
+        return self.text, 0, str
+
+    def find_rows(self, word, part=None, limit=None):
+        """
+        Ascending ids of the rows whose text contains word (within rows part = (start, stop)).
+
+        With a limit, stops after the first limit rows.
+        """
+        text, base, needle = self._haystack()
+        word = needle(word)
+        offsets = self.offsets
+        start, stop = part or (0, len(self))
+        end_all = base + offsets[stop]
+        rows = []
+        pos = text.find(word, base + offsets[start], end_all)
+        while pos != -1:
+            row = bisect_right(offsets, pos - base, start, stop + 1) - 1
+            end = base + offsets[row + 1]
+            if pos + len(word) <= end:
+                rows.append(row)
+                if len(rows) == limit:
+                    break
+                pos = text.find(word, end, end_all)
+            else:
+                # match straddles two rows; look further inside this one
+                pos = text.find(word, pos + 1, end_all)
+        return rows
+
+    def save(self, snap, name):
+        # Snapshots hold UTF-8 with byte offsets, so it can be searched mapped
+        data = self.text.encode('utf-8', 'surrogatepass')
+        offsets = self.offsets
+        if len(data) != len(self.text):
+            text = self.text
+            offsets = array('I', accumulate(
+                (len(text[offsets[i]:offsets[i + 1]].encode('utf-8', 'surrogatepass')) for i in range(len(self))),
+                initial=0))
+        snap.add_bytes(name + '.text', data)
+        snap.add_array(name + '.offsets', offsets)
+
+
+class MappedTextColumn(TextColumn):
+    """
+    Read-only TextColumn over a memory-mapped snapshot section.
+
+    The text stays UTF-8 encoded in the map, delimited by byte offsets; rows
+    are decoded on access and find_rows() searches the mapped bytes. Every
+    process mapping the same snapshot shares one copy through the page cache.
+    """
+
+    @classmethod
+    def load(cls, snap, name):
+        col = cls()
+        col._map, col._base, _ = snap.region(name + '.text')
+        col.buffer = snap.view(name + '.text')
+        col.offsets = snap.view(name + '.offsets')
+        return col
+
+    def __getitem__(self, i):
+        return str(self.buffer[self.offsets[i]:self.offsets[i + 1]], 'utf-8', 'surrogatepass')
+
+    def _haystack(self):
+        return self._map, self._base, partial(str.encode, encoding='utf-8', errors='surrogatepass')
+
+    def nbytes(self):
+        return self.buffer.nbytes + self.offsets.nbytes
+
+    def text_offsets(self):
+        text = str(self.buffer, 'utf-8', 'surrogatepass')
+        if len(text) == self.buffer.nbytes:
+            # ASCII: the byte offsets are str offsets
+            return text, self.offsets
+        if np is not None:
+            # a str offset is the byte offset less the UTF-8 continuation bytes before it
+            continuation = np.flatnonzero((np.frombuffer(self.buffer, np.uint8) & 0xC0) == 0x80)
+            offsets = np.asarray(self.offsets, np.int64)
+            return text, array('I', (offsets - np.searchsorted(continuation, offsets)).astype(np.uint32).tobytes())
+        return text, array('I', accumulate((len(self[i]) for i in range(len(self))), initial=0))
+
+    def save(self, snap, name):
+        snap.add_bytes(name + '.text', self.buffer)
+        snap.add_array(name + '.offsets', self.offsets)
+
+
+class ValueColumn(TextColumn):
+    """
+    TextColumn for raw cell values.
+
+    Numbers read from Excel are stored as text and restored on access through
+    a per-row kind byte, which is only allocated once a non-string value is seen.
+    """
+
+    KIND_STR, KIND_INT, KIND_FLOAT = 0, 1, 2
+
+    def __init__(self):
+        super().__init__()
+        self.kinds = None
+
+    def __getitem__(self, i):
+        s = super().__getitem__(i)
+        kind = self.kinds[i] if self.kinds is not None else self.KIND_STR
+        if kind == self.KIND_INT:
+            return int(s)
+        if kind == self.KIND_FLOAT:
+            return float(s)
+        return s
+
+    def _encode(self, v):
+        if v is None:
+            return '', self.KIND_STR
+        if isinstance(v, str):
+            return v, self.KIND_STR
+        if isinstance(v, int) and not isinstance(v, bool):
+            return str(v), self.KIND_INT
+        if isinstance(v, float):
+            return str(v), self.KIND_FLOAT
+        return str(v), self.KIND_STR
+
+    def append(self, v):
+        """Append a raw value and return its text form."""
+        s, kind = self._encode(v)
+        if kind != self.KIND_STR and self.kinds is None:
+            self.kinds = bytearray(len(self))
+        if self.kinds is not None:
+            self.kinds.append(kind)
+        super().append(s)
+        return s
+
+    def extend(self, values):
+        """Append a batch of raw values and return their text forms."""
+        if self.kinds is None and set(map(type, values)) <= {str}:
+            # Common case (CSV, text cells): values are stored as they are
+            super().extend(values)
+            return values
+        encoded = [self._encode(v) for v in values]
+        kinds = bytes(kind for _, kind in encoded)
+        if self.kinds is None and any(kinds):
+            self.kinds = bytearray(len(self))
+        if self.kinds is not None:
+            self.kinds.extend(kinds)
+        forms = [s for s, _ in encoded]
+        super().extend(forms)
+        return forms
+
+    def nbytes(self):
+        return super().nbytes() + (len(self.kinds) if self.kinds is not None else 0)
+
+    @classmethod
+    def spliced(cls, parts):
+        col = super().spliced(parts)
+        if any(src.kinds is not None for src, _, _ in parts):
+            col.kinds = bytearray()
+            for src, start, stop in parts:
+                col.kinds += src.kinds[start:stop] if src.kinds is not None else bytes(stop - start)
+        return col
+
+    def save(self, snap, name):
+        super().save(snap, name)
+        if self.kinds is not None:
+            snap.add_bytes(name + '.kinds', self.kinds)
+
+
+class MappedValueColumn(ValueColumn, MappedTextColumn):
+    """ValueColumn read from a memory-mapped snapshot (see MappedTextColumn)."""
+
+    @classmethod
+    def load(cls, snap, name):
+        col = super().load(snap, name)
+        if name + '.kinds' in snap:
+            col.kinds = snap.view(name + '.kinds')
+        return col
+
+
+class FacetColumn:
+    """
+    Dictionary-encoded column for low-cardinality facet values.
+
+    Each distinct raw value is stored once in `values`, with its stripped filter
+    key in `keys`; rows hold an integer code in a compact array whose item size
+    widens (1 -> 2 -> 4 bytes) only as the number of distinct values grows.
+    """
+
+    def __init__(self):
+        self.values = []
+        self.keys = []
+        self.lookup = {}
+        self.codes = array('B')
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return self.values[self.codes[i]]
+
+    def key(self, i):
+        """Stripped filter key of row i ('' when blank)."""
+        return self.keys[self.codes[i]]
+
+    def encode(self, v):
+        """Code for a raw value, adding it to the dictionary if needed."""
+        code = self.lookup.get(v)
+        if code is None:
+            code = len(self.values)
+            self.lookup[v] = code
+            self.values.append(v)
+            self.keys.append('' if v is None else str(v).strip())
+            if code == 256 and self.codes.typecode == 'B':
+                self.codes = array('H', self.codes)
+            elif code == 65536 and self.codes.typecode == 'H':
+                self.codes = array('I', self.codes)
+        return code
+
+    def append(self, v):
+        self.codes.append(self.encode(v))
+
+    def extend(self, values):
+        """Append a batch of raw values."""
+        lookup = self.lookup
+        # Register new values first (in first-seen order) so codes fit the array type
+        for v in dict.fromkeys(values):
+            if v not in lookup:
+                self.encode(v)
+        self.codes.extend(map(lookup.__getitem__, values))
+
+    def finalize(self):
+        pass
+
+    @classmethod
+    def spliced(cls, parts):
+        """New column of the rows start:stop of each (column, start, stop) in parts, in order."""
+        col = cls()
+        remaps = {}
+        for src, _, _ in parts:
+            if id(src) not in remaps:
+                remap = [col.encode(v) for v in src.values]
+                remaps[id(src)] = None if remap == list(range(len(remap))) else remap
+        # codes only widen while values are added, so take the array afterwards
+        codes = col.codes
+        for src, start, stop in parts:
+            remap = remaps[id(src)]
+            run = src.codes[start:stop]
+            if remap is None and run.itemsize == codes.itemsize:
+                codes.frombytes(run.tobytes())
+            else:
+                codes.extend([c if remap is None else remap[c] for c in run])
+        return col
+
+    def nbytes(self):
+        total = self.codes.itemsize * len(self.codes)
+        total += sys.getsizeof(self.values) + sys.getsizeof(self.keys) + sys.getsizeof(self.lookup)
+        for v, k in zip(self.values, self.keys):
+            total += sys.getsizeof(v) + (sys.getsizeof(k) if k is not v else 0)
+        return total
+
+    def save(self, snap, name):
+        snap.meta[name] = {'values': [_snapshot_value(v) for v in self.values], 'keys': self.keys}
+        snap.add_array(name + '.codes', self.codes)
+
+    @classmethod
+    def load(cls, snap, name):
+        col = cls()
+        col.values = [_restore_value(v) for v in snap.meta[name]['values']]
+        col.keys = snap.meta[name]['keys']
+        col.lookup = {v: code for code, v in enumerate(col.values)}
+        # read-only view of the mapped codes
+        col.codes = snap.view(name + '.codes')
+        return col
+
+
+# Columns with few distinct values are dictionary-encoded; the rest are text
+FACET_FIELDS = frozenset(FILTER_FIELDS.values())
+
+
+class ColumnStore:
+    """
+    Columnar, array-backed storage for a parsed DART sheet, keyed by FIELDS.
+
+    Besides the raw columns it keeps the normalized view used by search and
+    filters: casefolded Description, Item No and Manufacturer Item No text
+    (search_text) and the stripped facet keys (FacetColumn.keys). Rows are
+    only materialized as tuples or dicts for the results actually returned.
+    """
+
+    def __init__(self):
+        self.columns = {f: FacetColumn() if f in FACET_FIELDS else ValueColumn() for f in FIELDS}
+        self.search_text = {f: TextColumn() for f in SEARCH_FIELDS}
+        self._ordered = [self.columns[f] for f in FIELDS]
+        self._size = 0
+        # views of a memory-mapped snapshot (see load) rather than in-memory arrays
+        self.mapped = False
+
+    def __len__(self):
+        return self._size
+
+    def append(self, row):
+        """Append one row given as a tuple in FIELDS order."""
+        self.extend([row])
+
+    def extend(self, rows):
+        """
+        Append a batch of row tuples in FIELDS order, column by column.
+
+        Returns the casefolded search text of the batch per search field, so
+        callers can feed it to a SearchIndex without reading it back.
+        """
+        texts = {}
+        if not rows:
+            return {f: [] for f in SEARCH_FIELDS}
+        columns = list(zip(*rows))
+        forms = [col.extend(values) for col, values in zip(self._ordered, columns)]
+        for field in SEARCH_FIELDS:
+            idx = FIELD_IDX[field]
+            texts[field] = list(map(str.casefold, forms[idx]))
+            self.search_text[field].extend(texts[field])
+        self._size += len(rows)
+        return texts
+
+    def finalize(self):
+        """Finish loading; must be called before reading text columns."""
+        for col in self._ordered:
+            col.finalize()
+        for text_col in self.search_text.values():
+            text_col.finalize()
+
+    @classmethod
+    def spliced(cls, parts):
+        """
+        New store of the rows start:stop of each (store, start, stop) in parts, in order.
+
+        Every column is spliced from runs of rows (see TextColumn.spliced);
+        nothing is parsed or casefolded again.
+        """
+        store = cls()
+        for field in FIELDS:
+            kind = FacetColumn if field in FACET_FIELDS else ValueColumn
+            store.columns[field] = kind.spliced([(s.columns[field], a, b) for s, a, b in parts])
+        store.search_text = {f: TextColumn.spliced([(s.search_text[f], a, b) for s, a, b in parts])
+                             for f in SEARCH_FIELDS}
+        store._ordered = [store.columns[f] for f in FIELDS]
+        store._size = sum(b - a for _, a, b in parts)
+        return store
+
+    def row(self, i):
+        """Materialize row i as a tuple in FIELDS order."""
+        return tuple(col[i] for col in self._ordered)
+
+    def to_dict(self, i):
+        """Materialize row i as a dict keyed by FIELDS."""
+        return dict(zip(FIELDS, self.row(i)))
+
+    def to_columns(self, row_ids):
+        """
+        Materialize rows as ({field: values}, {field: dictionary}), in row_ids order.
+
+        Facet fields are dictionary-encoded: their values are indexes into the
+        field's dictionary, which lists the distinct values of these rows in
+        order of first appearance.
+        """
+        columns, dictionaries = {}, {}
+        for field, col in self.columns.items():
+            if field in FACET_FIELDS:
+                local = {}
+                codes = col.codes
+                columns[field] = [local.setdefault(c, len(local)) for c in map(codes.__getitem__, row_ids)]
+                dictionaries[field] = [col.values[c] for c in local]
+            else:
+                columns[field] = list(map(col.__getitem__, row_ids))
+        return columns, dictionaries
+
+    def memory_usage(self):
+        """Approximate bytes held per column, for sizing worker instances."""
+        columns = {f: col.nbytes() for f, col in self.columns.items()}
+        search_text = {f: col.nbytes() for f, col in self.search_text.items()}
+        # normalized view = casefolded search text + the facet key strings
+        normalized = sum(search_text.values()) + sum(
+            sum(sys.getsizeof(k) for k, v in zip(col.keys, col.values) if k is not v)
+            for col in self.columns.values() if isinstance(col, FacetColumn))
+        return {
+            'rows': self._size,
+            'columns': columns,
+            'search_text': search_text,
+            'normalized_bytes': normalized,
+            'total_bytes': sum(columns.values()) + sum(search_text.values()),
+        }
+
+    def save(self, snap, name):
+        snap.meta[name] = {'rows': self._size}
+        for field, col in self.columns.items():
+            col.save(snap, f'{name}.{field}')
+        for field, col in self.search_text.items():
+            col.save(snap, f'{name}.search.{field}')
+
+    @classmethod
+    def load(cls, snap, name):
+        """Read-only store over a memory-mapped snapshot."""
+        store = cls()
+        store.columns = {f: FacetColumn.load(snap, f'{name}.{f}') if f in FACET_FIELDS
+                         else MappedValueColumn.load(snap, f'{name}.{f}') for f in FIELDS}
+        store.search_text = {f: MappedTextColumn.load(snap, f'{name}.search.{f}') for f in SEARCH_FIELDS}
+        store._ordered = [store.columns[f] for f in FIELDS]
+        store._size = snap.meta[name]['rows']
+        store.mapped = True
+        return store
+
+
+class XlsxFormatError(Exception):
+    """The workbook is laid out in a way XlsxSheetReader does not handle."""
+
+
+class _ColumnNumbers(dict):
+    """Column letters -> 0-based column index, computed on first use."""
+
+    def __missing__(self, letters):
+        idx = 0
+        for ch in letters:
+            idx = idx * 26 + ord(ch) - 64
+        self[letters] = idx - 1
+        return idx - 1
+
+
+class XlsxSheetReader:
+    """
+    Streams one worksheet of an .xlsx file straight out of the zip archive.
+
+    The sheet XML is decompressed in chunks and fed to an expat parser, and
+    cell values are converted the way openpyxl's read-only mode converts them
+    (shared and inline strings, numbers, booleans, date-formatted numbers),
+    without building cell objects or an element tree. Cells outside the
+    requested columns are skipped unconverted.
+
+    Raises XlsxFormatError if the workbook parts cannot be located or read;
+    parse_excel_file() then falls back to openpyxl.
+    """
+
+    CHUNK_BYTES = 1 << 20
+
+    def __init__(self, filepath, sheet_name='DART'):
+        self.zip = zipfile.ZipFile(filepath)
+        try:
+            self._read_workbook(sheet_name)
+            self.shared_strings = self._read_shared_strings()
+            self.date_styles = self._read_date_styles()
+        except Exception as e:
+            self.zip.close()
+            raise XlsxFormatError(f"{type(e).__name__}: {e}") from e
+        self.total_bytes = self.zip.getinfo(self.sheet_path).file_size
+        self.bytes_read = 0
+
+    def close(self):
+        self.zip.close()
+
+    def _part_rels(self, part):
+        """{relationship id: (type, part path)} for a package part."""
+        folder, name = posixpath.split(part)
+        rels_path = posixpath.join(folder, '_rels', name + '.rels')
+        if rels_path not in self.zip.NameToInfo:
+            return {}
+        rels = {}
+        for rel in ElementTree.fromstring(self.zip.read(rels_path)):
+            target = rel.get('Target')
+            if rel.get('TargetMode') == 'External':
+                continue
+            if target.startswith('/'):
+                path = target[1:]
+            else:
+                path = posixpath.normpath(posixpath.join(folder, target))
+            rels[rel.get('Id')] = (rel.get('Type', '').rsplit('/', 1)[-1], path)
+        return rels
+
+    def _read_workbook(self, sheet_name):
+        workbook_path = next((path for rel_type, path in self._part_rels('').values()
+                              if rel_type == 'officeDocument'), None)
+        if workbook_path is None:
+            raise ValueError('no workbook part in the package')
+        workbook = ElementTree.fromstring(self.zip.read(workbook_path))
+        # Namespace of the SpreadsheetML elements, e.g. '{http://...}'
+        self.ns = workbook.tag[:workbook.tag.index('}') + 1]
+        ns = self.ns
+        rels = self._part_rels(workbook_path)
+        sheets = [(sheet.get('name'), next(v for k, v in sheet.attrib.items() if k.endswith('}id')))
+                  for sheet in workbook.iter(ns + 'sheet')]
+        names = [name for name, _ in sheets]
+        if sheet_name in names:
+            idx = names.index(sheet_name)
+        else:
+            # same choice as openpyxl's workbook.active
+            tabs = [view.get('activeTab') for view in workbook.iter(ns + 'workbookView')]
+            idx = int(next((t for t in tabs if t is not None), 0))
+        rel_type, self.sheet_path = rels[sheets[idx][1]]
+        if rel_type != 'worksheet':
+            raise ValueError(f"sheet {sheets[idx][0]!r} is a {rel_type}")
+        self.parts = {rel_type: path for rel_type, path in rels.values()}
+        props = workbook.find(ns + 'workbookPr')
+        date1904 = props is not None and props.get('date1904') in ('1', 'true')
+        self.epoch = MAC_EPOCH if date1904 else WINDOWS_EPOCH
+
+    def _parser(self):
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        return parser
+
+    def _tag_prefix(self, path):
+        """
+        Prefix ('' or e.g. 'x:') the part's root element is written with.
+
+        Element names are matched as written, which is cheaper than having
+        expat expand every name with its namespace URI.
+        """
+        names = []
+        parser = self._parser()
+        parser.StartElementHandler = lambda name, attrs: names.append(name)
+        with self.zip.open(path) as f:
+            while not names:
+                chunk = f.read(4096)
+                parser.Parse(chunk, not chunk)
+                if not chunk:
+                    break
+        root = names[0] if names else ''
+        return root[:root.index(':') + 1] if ':' in root else ''
+
+    def _read_shared_strings(self):
+        """The shared string table, with rich text runs joined and phonetic runs dropped."""
+        path = self.parts.get('sharedStrings')
+        if path is None:
+            return []
+        prefix = self._tag_prefix(path)
+        SI, T, RPH = prefix + 'si', prefix + 't', prefix + 'rPh'
+        strings = []
+        parts = []
+        in_text = in_phonetic = False
+
+        def start(name, attrs):
+            nonlocal in_text, in_phonetic
+            if name == T:
+                in_text = not in_phonetic
+            elif name == RPH:
+                in_phonetic = True
+
+        def end(name):
+            nonlocal in_text, in_phonetic
+            if name == T:
+                in_text = False
+            elif name == SI:
+                strings.append(''.join(parts).replace('x005F_', ''))
+                parts.clear()
+            elif name == RPH:
+                in_phonetic = False
+
+        def data(text):
+            if in_text:
+                parts.append(text)
+
+        parser = self._parser()
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        parser.CharacterDataHandler = data
+        with self.zip.open(path) as f:
+            parser.ParseFile(f)
+        return strings
+
+    def _read_date_styles(self):
+        """
+        Indices (as attribute strings) of the cell styles with a date number format.
+
+        Duration formats ([h]:mm:ss) count as date formats and are read as
+        times or datetimes, not timedeltas, as openpyxl's read-only mode does.
+        """
+        path = self.parts.get('styles')
+        if path is None:
+            return set()
+        ns = self.ns
+        styles = ElementTree.fromstring(self.zip.read(path))
+        custom = {int(fmt.get('numFmtId')): fmt.get('formatCode')
+                  for fmt in styles.iter(ns + 'numFmt')}
+        date_styles = set()
+        cell_xfs = styles.find(ns + 'cellXfs')
+        for idx, xf in enumerate(cell_xfs if cell_xfs is not None else ()):
+            fmt_id = int(xf.get('numFmtId', 0))
+            fmt = custom[fmt_id] if fmt_id in custom else builtin_format_code(fmt_id)
+            if is_date_format(fmt):
+                date_styles.add(str(idx))
+        return date_styles
+
+    def _rows(self, columns):
+        """Yield (row number, cell values) for each row element in the sheet."""
+        prefix = self._tag_prefix(self.sheet_path)
+        ROW, C, V, T, RPH = (prefix + tag for tag in ('row', 'c', 'v', 't', 'rPh'))
+        strings = self.shared_strings
+        date_styles, epoch = self.date_styles, self.epoch
+        col_numbers = _ColumnNumbers()
+        width = max(columns) + 1 if columns else 0
+        done = []
+        parts = []
+        row = None
+        row_number = col = 0
+        keep = capture = in_phonetic = False
+        cell_type = style = None
+
+        def start(name, attrs):
+            nonlocal row, row_number, col, keep, capture, in_phonetic, cell_type, style
+            if name == C:
+                ref = attrs.get('r')
+                col = col_numbers[ref.rstrip('0123456789')] if ref else col + 1
+                keep = columns is None or col in columns
+                if keep:
+                    cell_type = attrs.get('t')
+                    style = attrs.get('s')
+                    parts.clear()
+            elif keep and (name == V or name == T):
+                capture = not in_phonetic
+            elif name == ROW:
+                ref = attrs.get('r')
+                row_number = int(ref) if ref else row_number + 1
+                row = [None] * width
+                col = -1
+            elif name == RPH:
+                in_phonetic = True
+
+        def end(name):
+            nonlocal capture, in_phonetic
+            if name == C:
+                if not keep:
+                    return
+                text = ''.join(parts)
+                if cell_type == 'inlineStr':
+                    value = text
+                elif not text:
+                    value = None
+                elif cell_type == 's':
+                    value = strings[int(text)]
+                elif cell_type is None or cell_type == 'n':
+                    value = float(text) if ('.' in text or 'E' in text or 'e' in text) else int(text)
+                    if style in date_styles:
+                        try:
+                            value = from_excel(value, epoch)
+                        except (OverflowError, ValueError):
+                            value = '#VALUE!'
+                elif cell_type == 'b':
+                    value = bool(int(text))
+                elif cell_type == 'd':
+                    value = from_ISO8601(text)
+                else:
+                    # 'str' (formula result) and 'e' (error) cells hold text
+                    value = text
+                if col >= len(row):
+                    row.extend([None] * (col + 1 - len(row)))
+                row[col] = value
+            elif name == V or name == T:
+                capture = False
+            elif name == ROW:
+                done.append((row_number, row))
+            elif name == RPH:
+                in_phonetic = False
+
+        def data(text):
+            if capture:
+                parts.append(text)
+
+        parser = self._parser()
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        parser.CharacterDataHandler = data
+        with self.zip.open(self.sheet_path) as f:
+            while True:
+                chunk = f.read(self.CHUNK_BYTES)
+                parser.Parse(chunk, not chunk)
+                self.bytes_read += len(chunk)
+                yield from done
+                done.clear()
+                if not chunk:
+                    break
+
+    def header_row(self):
+        """Values of row 1 (empty if the sheet has no row 1)."""
+        for row_number, values in self._rows(None):
+            return values if row_number == 1 else []
+        return []
+
+    def iter_rows(self, columns=None):
+        """
+        Yield the rows after the header as lists indexed by column.
+
+        columns is a set of 0-based column indices to read (None reads all);
+        other positions are None. Rows absent from the sheet XML are skipped.
+        """
+        self.bytes_read = 0
+        return (values for row_number, values in self._rows(columns) if row_number > 1)
+
+
+def parse_excel_file(filepath, builder=None, reader=None):
     """
     Parse Excel file and extract data from DART sheet using header-based column mapping.
     
@@ -166,87 +1375,83 @@ def parse_excel_file(filepath):
     - Mfr Item
     - Sub Item
     - Product Mgr
+
+    Rows are streamed in batches into builder (a new DatasetBuilder if None),
+    which also builds the keyword search index as they arrive.
+
+    reader picks the .xlsx reader, 'stream' or 'openpyxl' (default
+    XLSX_READER). The streaming reader only converts the header-mapped
+    columns; workbooks it cannot open are read with openpyxl instead.
+
+    Returns (store, error): a finalized ColumnStore (None on failure) and an
+    error message or None.
     """
+    sheet = workbook = None
     try:
-        # Use read_only to reduce memory usage and speed up large files
-        workbook = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+        if (reader or XLSX_READER) == 'stream':
+            try:
+                sheet = XlsxSheetReader(filepath)
+            except XlsxFormatError as e:
+                logger.warning(f"Streaming .xlsx reader cannot open {filepath} ({e}); using openpyxl")
 
-        # Try to find 'DART' sheet, fallback to first sheet
-        if 'DART' in workbook.sheetnames:
-            worksheet = workbook['DART']
+        if sheet is not None:
+            header_row = sheet.header_row()
         else:
-            worksheet = workbook.active
+            # Use read_only to reduce memory usage and speed up large files
+            workbook = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
 
-        # Read header row (row 1)
-        header_row = None
-        for idx, row in enumerate(worksheet.iter_rows(min_row=1, max_row=1, values_only=True)):
-            header_row = row
-            break
+            # Try to find 'DART' sheet, fallback to first sheet
+            if 'DART' in workbook.sheetnames:
+                worksheet = workbook['DART']
+            else:
+                worksheet = workbook.active
+
+            # Read header row (row 1)
+            header_row = None
+            for idx, row in enumerate(worksheet.iter_rows(min_row=1, max_row=1, values_only=True)):
+                header_row = row
+                break
         
         if not header_row:
-            return [], "No header row found in Excel file"
+            return None, "No header row found in Excel file"
         
         # Build header → index mapping and validate required headers exist
         header_index, error = build_header_index(header_row)
         if error:
-            return [], error
+            return None, error
 
-        rows = []
-        # Process data rows starting from row 2
-        # We now read all columns since we use header-based indexing
-        for row in worksheet.iter_rows(min_row=2, values_only=True):
-            try:
-                # Skip empty rows (check if description is empty)
-                desc_idx = header_index['description']
-                short_desc = row[desc_idx] if len(row) > desc_idx else None
-                if not short_desc or not str(short_desc).strip():
-                    continue
-                
-                # Extract values using header-based index mapping
-                # Handle missing columns gracefully by returning empty string for missing values
-                def val_for(hdr_key):
-                    idx = header_index.get(hdr_key)
-                    if idx is None or idx == -1:
-                        return ''
-                    if len(row) <= idx:
-                        return ''
-                    v = row[idx]
-                    return '' if v is None else v
-
-                item_no = val_for('item')
-                product_div = val_for('product division')
-                material_group = val_for('material group')
-                material_group_desc = val_for('material group desc')
-                mfg_name = val_for('mfr name')
-                mfg_item_no = val_for('mfr item')
-                sales_status = val_for('sales status')
-                product_manager = val_for('product mgr')
-                sub_item = val_for('sub item')
-
-                # Store as compact tuple in FIELDS order
-                rows.append((
-                    item_no,
-                    short_desc,
-                    product_div,
-                    material_group,
-                    material_group_desc,
-                    mfg_name,
-                    mfg_item_no,
-                    sales_status,
-                    product_manager,
-                    sub_item
-                ))
-            except (IndexError, TypeError):
-                continue
+        builder = builder or DatasetBuilder()
+        project = _row_projection(header_index, extra_headers=builder.EXTRA_HEADERS)
+        # Process data rows starting from row 2, one batch at a time
+        if sheet is not None:
+            # Only the header-mapped columns are converted
+            headers = [FIELD_HEADERS[f] for f in FIELDS] + list(builder.EXTRA_HEADERS)
+            data_rows = sheet.iter_rows({header_index.get(h, -1) for h in headers} - {-1})
+        else:
+            data_rows = worksheet.iter_rows(min_row=2, values_only=True)
+        with _gc_paused():
+            while True:
+                chunk = list(islice(data_rows, builder.BATCH_ROWS))
+                if not chunk:
+                    break
+                if sheet is not None:
+                    builder.add_batch(project(chunk), sheet.bytes_read, sheet.total_bytes)
+                else:
+                    builder.add_batch(project(chunk))
 
-        workbook.close()
-        return rows, None
+        with _gc_paused():
+            return builder.finish(), None
 
     except Exception as e:
-        return [], f"Error parsing file: {str(e)}"
+        return None, f"Error parsing file: {str(e)}"
+    finally:
+        if sheet is not None:
+            sheet.close()
+        if workbook is not None:
+            workbook.close()
 
 
-def parse_csv_file(filepath):
+def parse_csv_file(filepath, builder=None):
     """
     Parse a CSV file using header-based column mapping.
     
@@ -262,186 +1467,1942 @@ def parse_csv_file(filepath):
     - Mfr Item
     - Sub Item
     - Product Mgr
-    """
-    import csv
 
-    rows = []
+    Rows are streamed in batches into builder (a new DatasetBuilder if None),
+    which also builds the keyword search index as they arrive.
+
+    Returns (store, error): a finalized ColumnStore (None on failure) and an
+    error message or None.
+    """
+    builder = builder or DatasetBuilder()
     try:
-        with open(filepath, newline='', encoding='utf-8') as csvfile:
+        total_bytes = os.path.getsize(filepath)
+        with open(filepath, 'rb') as raw, io.TextIOWrapper(raw, encoding='utf-8', newline='') as csvfile:
             reader = csv.reader(csvfile)
             
             # Read header row (first row)
             header_row = next(reader, None)
             if not header_row:
-                return [], "No header row found in CSV file"
+                return None, "No header row found in CSV file"
             
             # Build header → index mapping and validate required headers exist
             header_index, error = build_header_index(header_row)
             if error:
-                return [], error
-            
-            # Process data rows
-            for r in reader:
-                try:
-                    # Skip empty rows (check if description is empty)
-                    desc_idx = header_index['description']
-                    short_desc = r[desc_idx] if len(r) > desc_idx else None
-                    if not short_desc or not str(short_desc).strip():
-                        continue
-                    
-                    # Extract values using header-based index mapping
-                    def val_for(hdr_key):
-                        idx = header_index.get(hdr_key)
-                        if idx is None or idx == -1:
-                            return ''
-                        if len(r) <= idx:
-                            return ''
-                        v = r[idx]
-                        return '' if v is None else v
-
-                    item_no = val_for('item')
-                    product_div = val_for('product division')
-                    material_group = val_for('material group')
-                    material_group_desc = val_for('material group desc')
-                    mfg_name = val_for('mfr name')
-                    mfg_item_no = val_for('mfr item')
-                    sales_status = val_for('sales status')
-                    product_manager = val_for('product mgr')
-                    sub_item = val_for('sub item')
-
-                    rows.append((
-                        item_no,
-                        short_desc,
-                        product_div,
-                        material_group,
-                        material_group_desc,
-                        mfg_name,
-                        mfg_item_no,
-                        sales_status,
-                        product_manager,
-                        sub_item
-                    ))
-                except Exception:
-                    continue
+                return None, error
+
+            # Stream data rows in batches through the precomputed projection
+            project = _row_projection(header_index, text_only=True, extra_headers=builder.EXTRA_HEADERS)
+            with _gc_paused():
+                while True:
+                    chunk = list(islice(reader, builder.BATCH_ROWS))
+                    if not chunk:
+                        break
+                    builder.add_batch(project(chunk), raw.tell(), total_bytes)
         
-        return rows, None
+        with _gc_paused():
+            return builder.finish(), None
     except Exception as e:
-        return [], f"Error parsing CSV file: {str(e)}"
-
-
-def _compute_filters(rows):
-    """Compute unique filter options from parsed rows."""
-    manufacturers = set()
-    product_divs = set()
-    sales_statuses = set()
-    product_managers = set()
-    sub_items = set()
-    material_groups = set()
-    material_group_descs = set()
-
-    # rows are stored as tuples in FIELDS order; use FIELD_IDX mapping
-    for r in rows:
-        def get_val(field):
-            v = r[FIELD_IDX[field]] if len(r) > FIELD_IDX[field] else ''
-            return v
-
-        mn = get_val('manufacturer_name')
-        if mn:
-            manufacturers.add(str(mn).strip())
-        pd = get_val('product_division')
-        if pd:
-            product_divs.add(str(pd).strip())
-        ss = get_val('sales_status')
-        if ss is not None and str(ss).strip() != '':
-            sales_statuses.add(str(ss).strip())
-        else:
-            sales_statuses.add(BLANK_LABEL)
-        pm = get_val('product_manager')
-        if pm:
-            product_managers.add(str(pm).strip())
-        si = get_val('sub_item')
-        if si:
-            sub_items.add(str(si).strip())
-        mg = get_val('material_group')
-        if mg:
-            material_groups.add(str(mg).strip())
-        mgd = get_val('material_group_desc')
-        if mgd:
-            material_group_descs.add(str(mgd).strip())
+        return None, f"Error parsing CSV file: {str(e)}"
 
-    return {
-        'manufacturers': sorted([m for m in manufacturers if m]),
-        'product_divisions': sorted([p for p in product_divs if p]),
-        'sales_statuses': sorted([s for s in sales_statuses if s]),
-        'product_managers': sorted([pm for pm in product_managers if pm]),
-        'sub_items': sorted([si for si in sub_items if si]),
-        'material_groups': sorted([mg for mg in material_groups if mg]),
-        'material_group_descs': sorted([mgd for mgd in material_group_descs if mgd])
-    }
 
-def search_rows(keywords, rows):
+def build_facet_index(store):
     """
-    Search rows by Description and Item No fields (case-insensitive, partial matches allowed).
-    
-    Matching Rule:
-    ALL keywords must be found in EITHER:
-      - Description field, OR
-      - Item No field
-    
-    Keywords cannot be split across fields. Each field is evaluated independently.
-    
-    Examples:
-      Item: A12345-B, Description: "Steel Hex Bolt"
-      Search: "A123"        → MATCH (found in Item)
-      Search: "steel bolt"  → MATCH (found in Description)
-      Search: "A123 bolt"   → NO MATCH (keywords split across fields)
+    Build per-facet posting lists from the dictionary-encoded facet columns.
+
+    Returns:
+        dict: {facet field: {filter key: array of ascending row ids}}
+        Blank values are indexed under the '' key.
     """
-    if not keywords or not keywords.strip():
-        return []
-    
-    # Split keywords and convert to lowercase
-    search_words = keywords.lower().split()
-    
-    if not search_words:
-        return []
-    
-    results = []
+    index = {}
+    for field in FILTER_FIELDS.values():
+        col = store.columns[field]
+        by_code = [[] for _ in col.values]
+        for row_id, code in enumerate(col.codes):
+            by_code[code].append(row_id)
+        # Raw values that differ only by surrounding whitespace share a key
+        by_key = {}
+        for key, plist in zip(col.keys, by_code):
+            by_key.setdefault(key, []).append(plist)
+        # values no row uses any more (after an incremental update) get no key
+        index[field] = {
+            key: array('I', plists[0] if len(plists) == 1 else sorted(i for p in plists for i in p))
+            for key, plists in by_key.items() if any(plists)
+        }
+    return index
 
-    desc_idx = FIELD_IDX['description']
-    item_idx = FIELD_IDX['item_no']
 
-    for row in rows:
-        desc_text = ''
-        item_text = ''
-        try:
-            desc_val = row[desc_idx] if len(row) > desc_idx else ''
-            item_val = row[item_idx] if len(row) > item_idx else ''
-            desc_text = str(desc_val).lower() if desc_val is not None else ''
-            item_text = str(item_val).lower() if item_val is not None else ''
-        except Exception:
-            desc_text = ''
-            item_text = ''
+def index_nbytes(index):
+    """Approximate bytes held by a posting-list index ({field: {key: array}})."""
+    total = 0
+    for postings in index.values():
+        total += sys.getsizeof(postings)
+        for key, plist in postings.items():
+            total += sys.getsizeof(key) + len(plist) * plist.itemsize
+    return total
 
-        searchable_texts = [desc_text, item_text]
 
-        match_found = any(
-            all(word in text for word in search_words)
-            for text in searchable_texts
-        )
+def _filter_options(keys_by_field):
+    """Build the /filters option lists from the filter keys present per facet."""
+    filters = {}
+    for field, option_key in FACET_OPTION_KEYS.items():
+        keys = keys_by_field.get(field, ())
+        if field == 'sales_status':
+            # blank sales status is offered as its own selectable option
+            options = {k or BLANK_LABEL for k in keys}
+        else:
+            options = {k for k in keys if k}
+        filters[option_key] = sorted(options)
+    return filters
 
-        if match_found:
-            results.append(row)
 
-    return results
+def _compute_filters(facet_index):
+    """Compute unique filter options from the facet index built at upload."""
+    return _filter_options(facet_index)
 
-@app.route('/')
-def index():
-    """Render the main page"""
+
+def _facet_counts(store, row_ids):
+    """
+    Hit counts of each filter option within the given rows: {option key: {option: count}}.
+
+    One pass over each facet column's codes for the rows (np.bincount when
+    NumPy is installed); raw values sharing a filter key are counted
+    together. Options follow _filter_options, so an option is listed
+    exactly when it occurs in the rows.
+    """
+    counts = {}
+    all_rows = len(row_ids) == len(store)
+    for field, option_key in FACET_OPTION_KEYS.items():
+        col = store.columns[field]
+        if np is not None:
+            codes = np.asarray(col.codes)
+            if not all_rows:
+                codes = codes[np.asarray(row_ids, dtype=np.uint32)]
+            by_code = enumerate(np.bincount(codes, minlength=len(col.keys)).tolist())
+        else:
+            codes = col.codes
+            by_code = Counter(codes if all_rows else [codes[i] for i in row_ids]).items()
+        options = defaultdict(int)
+        for code, n in by_code:
+            key = col.keys[code]
+            if field == 'sales_status':
+                # blank sales status is offered as its own selectable option
+                key = key or BLANK_LABEL
+            if n and key:
+                options[key] += n
+        counts[option_key] = dict(options)
+    return counts
+
+def _one_typo_apart(a, b):
+    """Whether b is a with one character changed, left out or added, or two neighbours swapped."""
+    if a == b or abs(len(a) - len(b)) > 1:
+        return False
+    i = len(os.path.commonprefix((a, b)))
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (
+            a[i + 2:] == b[i + 2:] and a[i:i + 1] == b[i + 1:i + 2] and a[i + 1:i + 2] == b[i:i + 1])
+    if len(a) < len(b):
+        return a[i:] == b[i + 1:]
+    return a[i + 1:] == b[i:]
+
+
+def _bisect_key(ids, value, lo, hi, key, right=False):
+    """First position in ids[lo:hi] (ascending by key) whose key is not below value (right: above it)."""
+    while lo < hi:
+        mid = (lo + hi) // 2
+        k = key(ids[mid])
+        if k < value or (right and k == value):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class _SimilarTokens:
+    """
+    Finds the tokens of a search field one typo away from a keyword.
+
+    token(i) is the text of token i: a vocabulary word, or a row's Item No.
+    Token ids are kept in two orders, by length then text (forward) and by
+    length then reversed text (backward); bounds[n] is where the tokens of
+    length n start in both. A token one typo away from a keyword starts with
+    the keyword's first half or ends with its second half (or swaps its two
+    middle characters), so the only candidates are a few ranges of these
+    orders, found by bisection, and only those are compared with the keyword.
+    The forward order also finds the tokens equal to or starting with a
+    given text (see starting).
+    """
+
+    def __init__(self, token):
+        self.token = token
+        self.forward = array('I')
+        self.backward = array('I')
+        self.bounds = array('I', [0])
+
+    def _reversed(self, i):
+        return self.token(i)[::-1]
+
+    @classmethod
+    def build(cls, token, texts):
+        """Orders of the tokens texts (texts[i] is token(i))."""
+        similar = cls(token)
+        if not texts:
+            return similar
+        if np is not None:
+            lengths = np.fromiter(map(len, texts), np.int64, len(texts))
+            by_length = np.argsort(lengths, kind='stable')
+            bounds = np.searchsorted(lengths[by_length], np.arange(int(lengths.max()) + 2))
+            forward, backward = by_length.copy(), by_length.copy()
+            # Each length is sorted on its own, in an array exactly that wide:
+            # one long token does not widen the array of all the others
+            for n in np.flatnonzero(np.diff(bounds) > 1).tolist():
+                if n == 0:
+                    continue
+                lo, hi = int(bounds[n]), int(bounds[n + 1])
+                ids = by_length[lo:hi]
+                values = np.array([texts[i] for i in ids.tolist()], dtype=f'U{n}')
+                # the code points of each value reversed
+                reversed_values = np.ascontiguousarray(
+                    values.view(np.uint32).reshape(-1, n)[:, ::-1]).view(values.dtype).ravel()
+                forward[lo:hi] = ids[np.argsort(values, kind='stable')]
+                backward[lo:hi] = ids[np.argsort(reversed_values, kind='stable')]
+            similar.forward, similar.backward, similar.bounds = (
+                array('I', a.astype(np.uint32).tobytes()) for a in (forward, backward, bounds))
+            return similar
+        ids = range(len(texts))
+        similar.forward = array('I', sorted(ids, key=lambda i: (len(texts[i]), texts[i])))
+        similar.backward = array('I', sorted(ids, key=lambda i: (len(texts[i]), texts[i][::-1])))
+        lengths = [len(texts[i]) for i in similar.forward]
+        similar.bounds = array('I', (bisect_left(lengths, n) for n in range(lengths[-1] + 2)))
+        return similar
+
+    def near(self, word):
+        """Ids of the tokens one typo away from word (see _one_typo_apart)."""
+        token, bounds = self.token, self.bounds
+        size, half = len(word), len(word) // 2
+        found = set()
+        for order, key, part in ((self.forward, token, word[:half]),
+                                 (self.backward, self._reversed, word[half:][::-1])):
+            for n in range(max(size - 1, 1), min(size + 1, len(bounds) - 2) + 1):
+                hi = bounds[n + 1]
+                i = _bisect_key(order, part, bounds[n], hi, key)
+                while i < hi and key(order[i]).startswith(part):
+                    if _one_typo_apart(word, token(order[i])):
+                        found.add(order[i])
+                    i += 1
+        if half and word[half - 1] != word[half] and size + 1 < len(bounds):
+            # the two middle characters swapped: neither half is intact
+            swapped = word[:half - 1] + word[half] + word[half - 1] + word[half + 1:]
+            order, hi = self.forward, bounds[size + 1]
+            i = _bisect_key(order, swapped, bounds[size], hi, token)
+            while i < hi and token(order[i]) == swapped:
+                found.add(order[i])
+                i += 1
+        return found
+
+    def starting(self, prefix, whole=False):
+        """Ascending ids of the tokens starting with prefix, or equal to it if whole."""
+        token, bounds, order = self.token, self.bounds, self.forward
+        size = len(prefix)
+        last = min(size if whole else len(bounds) - 2, len(bounds) - 2)
+        found = []
+        for n in range(size, last + 1):
+            lo, hi = bounds[n], bounds[n + 1]
+            if lo == hi:
+                continue
+            # tokens of length n are sorted by text, so the ones starting with prefix are a range
+            lo = _bisect_key(order, prefix, lo, hi, lambda i: token(i)[:size])
+            hi = _bisect_key(order, prefix, lo, hi, lambda i: token(i)[:size], right=True)
+            found.extend(order[lo:hi])
+        return sorted(found)
+
+    def nbytes(self):
+        return sum(len(a) * a.itemsize for a in (self.forward, self.backward, self.bounds))
+
+    def remapped(self, token, new_ids, added):
+        """
+        These orders after an incremental update (see SearchIndex.remapped); needs NumPy.
+
+        token reads the updated tokens, new_ids maps each old token id to its
+        new id or -1 (removed), and added are the new ids of the added tokens.
+        The other tokens keep their order; the added ones are inserted at
+        positions found by bisection.
+        """
+        similar = _SimilarTokens(token)
+        removed_lengths = [len(self.token(i)) for i in np.flatnonzero(new_ids < 0).tolist()]
+        added_lengths = [len(token(i)) for i in added]
+        size = max(len(self.bounds) - 1, max(added_lengths, default=0) + 1)
+        counts = np.zeros(size, np.int64)
+        counts[:len(self.bounds) - 1] = np.diff(np.asarray(self.bounds, np.int64))
+        counts -= np.bincount(np.asarray(removed_lengths, np.int64), minlength=size)
+        kept_bounds = np.concatenate(([0], np.cumsum(counts))).tolist()
+        counts += np.bincount(np.asarray(added_lengths, np.int64), minlength=size)
+        similar.bounds = array('I', np.concatenate(([0], np.cumsum(counts))).astype(np.uint32).tobytes())
+        for attr, key in (('forward', token), ('backward', similar._reversed)):
+            kept = new_ids[np.asarray(getattr(self, attr))]
+            kept = array('I', kept[kept >= 0].astype(np.uint32).tobytes())
+            ids = sorted(added, key=lambda i: (len(token(i)), key(i)))
+            at = [_bisect_key(kept, key(i), kept_bounds[len(token(i))], kept_bounds[len(token(i)) + 1], key)
+                  for i in ids]
+            order = np.insert(np.asarray(kept, np.int64), at, np.asarray(ids, np.int64))
+            setattr(similar, attr, array('I', order.astype(np.uint32).tobytes()))
+        return similar
+
+    def save(self, snap, name):
+        for attr in ('forward', 'backward', 'bounds'):
+            snap.add_array(f'{name}.{attr}', getattr(self, attr))
+
+    def load(self, snap, name):
+        for attr in ('forward', 'backward', 'bounds'):
+            setattr(self, attr, snap.view(f'{name}.{attr}'))
+
+
+class _ColumnScan:
+    """
+    Keyword lookup straight over a field's casefolded TextColumn.
+
+    Used for near-unique fields such as Item No, where a token index would be
+    as large as the column itself: str.find runs over the packed text and
+    match positions are mapped back to rows through the offsets array.
+    """
+
+    def __init__(self, col):
+        self.col = col
+        self.similar = _SimilarTokens(self.token)
+
+    def add_batch(self, start, texts):
+        pass
+
+    def finalize(self):
+        self.similar = _SimilarTokens.build(self.token, [text.strip() for text in self.col.strings()])
+
+    def token(self, row):
+        """The text of token row for fuzzy matching: the row's whole (trimmed) text."""
+        return self.col[row].strip()
+
+    def contains(self, word):
+        """Whether any row's text contains word."""
+        return bool(self.col.find_rows(word, limit=1))
+
+    def similar_tokens(self, word):
+        """{token: rows having it} of the tokens one typo away from word (see _SimilarTokens)."""
+        # a value of several words cannot stand in for one keyword
+        return Counter(token for token in map(self.token, self.similar.near(word)) if len(token.split()) == 1)
+
+    def word_rows(self, word, part=None):
+        """Ascending ids of the rows whose text contains word."""
+        return self.col.find_rows(word, part)
+
+    def key_rows(self, key, prefix=False):
+        """Ascending ids of the rows whose trimmed text is key, or starts with it if prefix."""
+        return self.similar.starting(key, whole=not prefix)
+
+    def matching_rows(self, search_words, part=None):
+        """Set of row ids (within rows part = (start, stop)) whose text contains every word."""
+        # Look up the longest word, then check the others on its (few) matches
+        words = sorted(set(search_words), key=len, reverse=True)
+        return self._checked_rows(self.word_rows(words[0], part), words[1:])
+
+    def _checked_rows(self, rows, words):
+        """Set of the rows whose text contains every word."""
+        if not words:
+            return set(rows)
+        col = self.col
+        return {r for r in rows if all(w in col[r] for w in words)}
+
+    def nbytes(self):
+        # the text itself belongs to the column store
+        return self.similar.nbytes()
+
+    def remapped(self, col, new_ids, rows, texts):
+        """This field's index over col after an incremental update (see SearchIndex.remapped)."""
+        index = _ColumnScan(col)
+        index.similar = self.similar.remapped(index.token, new_ids, rows)
+        return index
+
+    def save(self, snap, name):
+        self.similar.save(snap, name + '.similar')
+
+    def load_index(self, snap, name):
+        self.similar.load(snap, name + '.similar')
+
+
+class _TokenIndex(_ColumnScan):
+    """
+    Token vocabulary and token -> rows postings for one search field.
+
+    While loading, postings are collected per token in a dict. finalize() packs the
+    vocabulary into one newline-separated string (tokens never contain
+    whitespace) and the postings into a flat array with per-token offsets.
+    """
+
+    def __init__(self, col):
+        super().__init__(col)
+        self._postings = defaultdict(partial(array, 'I'))
+        self.vocab = ''
+        self.starts = array('I', [0])
+        self.row_data = array('I')
+        self.row_offsets = array('I', [0])
+
+    def add_batch(self, start, texts):
+        """Index casefolded texts for row ids start, start + 1, ..."""
+        postings = self._postings
+        for row_id, text in enumerate(texts, start):
+            # a token repeated within a row is recorded twice; lookups use sets
+            for token in text.split():
+                postings[token].append(row_id)
+
+    def finalize(self):
+        tokens = list(self._postings)
+        self.vocab = '\n'.join(tokens)
+        # starts[tid] is the offset of token tid in vocab; the last entry is a sentinel
+        self.starts = array('I', accumulate((len(t) + 1 for t in tokens), initial=0))
+        plists = self._postings.values()
+        self.row_data = array('I', chain.from_iterable(plists))
+        self.row_offsets = array('I', accumulate(map(len, plists), initial=0))
+        self._postings = defaultdict(partial(array, 'I'))
+        self._build_similar(tokens)
+
+    def _build_similar(self, tokens):
+        self.similar = _SimilarTokens.build(self.token, [t.strip(string.punctuation) for t in tokens])
+
+    def token(self, tid):
+        """The text of token tid for fuzzy matching, without leading or trailing punctuation."""
+        starts = self.starts
+        return self.vocab[starts[tid]:starts[tid + 1] - 1].strip(string.punctuation)
+
+    def contains(self, word):
+        # tokens are separated by newlines, which keywords never contain
+        return word in self.vocab
+
+    def similar_tokens(self, word):
+        counts = Counter()
+        row_offsets = self.row_offsets
+        for tid in self.similar.near(word):
+            counts[self.token(tid)] += row_offsets[tid + 1] - row_offsets[tid]
+        return counts
+
+    def matching_tokens(self, word):
+        """Ids of the tokens that contain word (a substring search of the vocabulary)."""
+        vocab, starts = self.vocab, self.starts
+        tids = []
+        pos = vocab.find(word)
+        while pos != -1:
+            tid = bisect_right(starts, pos) - 1
+            tids.append(tid)
+            # continue after this token; each token is reported once
+            pos = vocab.find(word, starts[tid + 1])
+        return tids
+
+    def token_rows(self, tid, part=None):
+        return _posting_slice(self.row_data, part, self.row_offsets[tid], self.row_offsets[tid + 1])
+
+    def word_rows(self, word, part=None):
+        """Set of ids of the rows whose text contains word."""
+        return set().union(*(self.token_rows(t, part) for t in self.matching_tokens(word)))
+
+    def matching_rows(self, search_words, part=None):
+        # Look up the word in the fewest rows (by posting counts), then check
+        # the others on its matches
+        tids = {w: self.matching_tokens(w) for w in set(search_words)}
+        row_offsets = self.row_offsets
+        words = sorted(tids, key=lambda w: sum(row_offsets[t + 1] - row_offsets[t] for t in tids[w]))
+        matches = set().union(*(self.token_rows(t, part) for t in tids[words[0]]))
+        return self._checked_rows(matches, words[1:])
+
+    def nbytes(self):
+        return sys.getsizeof(self.vocab) + self.similar.nbytes() + sum(
+            len(a) * a.itemsize for a in (self.starts, self.row_data, self.row_offsets))
+
+    def remapped(self, col, new_ids, rows, texts):
+        # Postings stay ordered by (token id, row id): renumbering keeps the
+        # order, and the new postings are merged in by binary search
+        tokens = self.vocab.split('\n') if len(self.starts) > 1 else []
+        tids = {token: tid for tid, token in enumerate(tokens)}
+        add_tids, add_rows = [], []
+        for row, text in zip(rows, texts):
+            for token in text.split():
+                tid = tids.get(token)
+                if tid is None:
+                    tid = tids[token] = len(tokens)
+                    tokens.append(token)
+                add_tids.append(tid)
+                add_rows.append(row)
+        row_offsets = np.asarray(self.row_offsets, np.int64)
+        posting_tids = np.repeat(np.arange(len(row_offsets) - 1), np.diff(row_offsets))
+        posting_rows = new_ids[np.asarray(self.row_data)]
+        kept = posting_rows >= 0
+        posting_tids, posting_rows = posting_tids[kept], posting_rows[kept]
+        if add_rows:
+            add_tids, add_rows = np.asarray(add_tids, np.int64), np.asarray(add_rows, np.int64)
+            order = np.lexsort((add_rows, add_tids))
+            add_tids, add_rows = add_tids[order], add_rows[order]
+            stride = max(int(posting_rows.max(initial=0)), int(add_rows.max())) + 1
+            at = np.searchsorted(posting_tids * stride + posting_rows, add_tids * stride + add_rows)
+            posting_tids = np.insert(posting_tids, at, add_tids)
+            posting_rows = np.insert(posting_rows, at, add_rows)
+        # tokens no row contains any more leave the vocabulary
+        counts = np.bincount(posting_tids, minlength=len(tokens))
+        live = [tokens[tid] for tid in np.flatnonzero(counts).tolist()]
+        index = _TokenIndex(col)
+        index.vocab = '\n'.join(live)
+        index.starts = array('I', accumulate((len(t) + 1 for t in live), initial=0))
+        index.row_data = array('I', posting_rows.astype(np.uint32).tobytes())
+        index.row_offsets = array('I', np.concatenate(([0], np.cumsum(counts[counts > 0]))).astype(np.uint32).tobytes())
+        index._build_similar(live)
+        return index
+
+    def save(self, snap, name):
+        super().save(snap, name)
+        snap.add_text(name + '.vocab', self.vocab)
+        for attr in ('starts', 'row_data', 'row_offsets'):
+            snap.add_array(f'{name}.{attr}', getattr(self, attr))
+
+    def load_index(self, snap, name):
+        super().load_index(snap, name)
+        # the vocabulary is decoded (it is small); postings stay mapped
+        self.vocab = snap.text(name + '.vocab')
+        for attr in ('starts', 'row_data', 'row_offsets'):
+            setattr(self, attr, snap.view(f'{name}.{attr}'))
+
+
+# Search fields with a token index; the others (near-unique per row, like
+# item numbers) are searched directly in the store's text column
+TOKEN_INDEXED_FIELDS = frozenset({'description'})
+
+
+class SearchIndex:
+    """
+    Keyword index over the casefolded Description, Item No and Manufacturer Item No text.
+
+    Description keeps a vocabulary of whitespace-separated tokens and the
+    rows containing each token. Keywords never contain whitespace, so a
+    keyword occurs in a field exactly when it occurs inside one of its
+    tokens: a lookup searches the (much smaller) vocabulary instead of every
+    row. The item numbers are searched with str.find over their packed text.
+    Results are exact, and keywords are never matched across fields. Whole
+    part numbers, and their starts, are found by bisection in the sorted
+    rows of the item number fields (see part_number_rows).
+    """
+
+    def __init__(self, store):
+        self.fields = {f: (_TokenIndex if f in TOKEN_INDEXED_FIELDS else _ColumnScan)(store.search_text[f])
+                       for f in SEARCH_FIELDS}
+
+    def add_batch(self, start, texts):
+        """Index a batch of casefolded search text ({field: [text, ...]})."""
+        for field, field_texts in texts.items():
+            self.fields[field].add_batch(start, field_texts)
+
+    def finalize(self):
+        for field_index in self.fields.values():
+            field_index.finalize()
+
+    def lookup(self, search_words, part=None):
+        """Ascending row ids (within rows part = (start, stop)) where one field contains every keyword."""
+        matches = set()
+        for field_index in self.fields.values():
+            matches |= field_index.matching_rows(search_words, part)
+        return sorted(matches)
+
+    def part_number_rows(self, key, prefix=False):
+        """
+        {field: ascending row ids} of the PART_NUMBER_FIELDS rows whose value is key.
+
+        key is trimmed and casefolded like the search text; with prefix the
+        rows whose value starts with key are listed. Fields without such
+        rows are left out.
+        """
+        found = {}
+        for field in PART_NUMBER_FIELDS:
+            rows = self.fields[field].key_rows(key, prefix)
+            if rows:
+                found[field] = rows
+        return found
+
+    def expand(self, search_words):
+        """
+        Similar tokens for the keywords no field contains, as {keyword: [token, ...]}.
+
+        The tokens of any field one typo away from such a keyword are listed
+        by the number of rows having them, most first (at most
+        FUZZY_MAX_EXPANSIONS); keywords shorter than FUZZY_MIN_LENGTH get
+        none. Keywords found somewhere are left out.
+        """
+        expansions = {}
+        for word in dict.fromkeys(search_words):
+            if any(field_index.contains(word) for field_index in self.fields.values()):
+                continue
+            counts = Counter()
+            if len(word) >= FUZZY_MIN_LENGTH:
+                for field_index in self.fields.values():
+                    counts.update(field_index.similar_tokens(word))
+            best = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:FUZZY_MAX_EXPANSIONS]
+            expansions[word] = [token for token, _ in best]
+        return expansions
+
+    def nbytes(self):
+        return sum(field_index.nbytes() for field_index in self.fields.values())
+
+    def remapped(self, store, new_ids, rows, texts):
+        """
+        Index of store, spliced from this index's store by an incremental update.
+
+        new_ids maps each old row id to its id in store, or -1 for rows deleted
+        or changed; rows are the ascending ids in store of the changed and
+        inserted rows, texts their casefolded search text ({field: [text, ...]}).
+        Postings of the other rows are renumbered rather than rebuilt, and
+        only the given rows are tokenized. Needs NumPy.
+        """
+        index = SearchIndex(store)
+        index.fields = {f: field_index.remapped(store.search_text[f], new_ids, rows, texts[f])
+                        for f, field_index in self.fields.items()}
+        return index
+
+    def save(self, snap, name):
+        for field, field_index in self.fields.items():
+            field_index.save(snap, f'{name}.{field}')
+
+    @classmethod
+    def load(cls, snap, name, store):
+        """SearchIndex over store (loaded from the same snapshot)."""
+        index = cls(store)
+        for field, field_index in index.fields.items():
+            field_index.load_index(snap, f'{name}.{field}')
+        return index
+
+
+def _posting_slice(postings, part, lo=0, hi=None):
+    """
+    The ids of postings[lo:hi] (ascending row ids) inside rows part = (start, stop).
+
+    part=None keeps them all. Posting lists are sorted, so the range is
+    found by bisection without reading the rest of the list.
+    """
+    if hi is None:
+        hi = len(postings)
+    if part is not None:
+        lo = bisect_left(postings, part[0], lo, hi)
+        hi = bisect_left(postings, part[1], lo, hi)
+    return postings[lo:hi]
+
+
+def build_search_index(store):
+    """Build a SearchIndex over the store's casefolded search text (SEARCH_FIELDS)."""
+    index = SearchIndex(store)
+    index.add_batch(0, {f: [col[i] for i in range(len(col))] for f, col in store.search_text.items()})
+    index.finalize()
+    return index
+
+
+def search_rows(keywords, store, index=None, row_ids=None, part=None):
+    """
+    Search rows by Description, Item No and Manufacturer Item No fields (case-insensitive, partial matches allowed).
+    
+    Matching Rule:
+    ALL keywords must be found in ONE OF:
+      - Description field, OR
+      - Item No field, OR
+      - Manufacturer Item No field
+    
+    Keywords cannot be split across fields. Each field is evaluated independently.
+
+    Works on the store's casefolded search text and returns matching row ids
+    in file order. row_ids restricts the search to those rows, part = (start,
+    stop) to that range of rows. If a SearchIndex for the store is given,
+    matches come from the index instead of a scan; results are identical.
+    
+    Examples:
+      Item: A12345-B, Description: "Steel Hex Bolt", Mfr Item: HB-0612
+      Search: "A123"        → MATCH (found in Item)
+      Search: "hb-06"       → MATCH (found in Mfr Item)
+      Search: "steel bolt"  → MATCH (found in Description)
+      Search: "A123 bolt"   → NO MATCH (keywords split across fields)
+    """
+    if not keywords or not keywords.strip():
+        return []
+    
+    # Split keywords and casefold them like the normalized search text
+    search_words = keywords.casefold().split()
+    
+    if not search_words:
+        return []
+
+    if index is not None:
+        matches = index.lookup(search_words, part)
+        if row_ids is None:
+            return matches
+        allowed = set(row_ids)
+        return [i for i in matches if i in allowed]
+    if row_ids is None:
+        row_ids = range(*(part or (0, len(store))))
+    elif part is not None:
+        row_ids = [i for i in row_ids if part[0] <= i < part[1]]
+
+    columns = [store.search_text[f] for f in SEARCH_FIELDS]
+
+    results = []
+    for row_id in row_ids:
+        if any(all(word in text for word in search_words) for text in (col[row_id] for col in columns)):
+            results.append(row_id)
+
+    return results
+
+
+def lookup_part_numbers(keys, store, index=None, prefix=False):
+    """
+    Resolve whole part numbers, as {key: {field: ascending row ids}}.
+
+    keys are trimmed and casefolded; a row matches a key when its value in
+    one of PART_NUMBER_FIELDS is the key (with prefix: starts with it).
+    Keys without matches are left out. With the store's SearchIndex each
+    key takes a few bisections (see SearchIndex.part_number_rows); without
+    one every row is read once for all keys. Results are identical.
+    """
+    if index is not None:
+        found = {key: index.part_number_rows(key, prefix) for key in keys}
+        return {key: rows for key, rows in found.items() if rows}
+    wanted = set(keys)
+    starts = tuple(wanted)
+    found = defaultdict(dict)
+    for field in PART_NUMBER_FIELDS:
+        col = store.search_text[field]
+        for row in range(len(store)):
+            value = col[row].strip()
+            if prefix:
+                matched = [key for key in wanted if value.startswith(key)] if value.startswith(starts) else ()
+            else:
+                matched = (value,) if value in wanted else ()
+            for key in matched:
+                found[key].setdefault(field, []).append(row)
+    return dict(found)
+
+# Relevance ranking (sort=relevance on /search and /export). A row scores
+# for each kind of hit below, plus its sales status; ties keep file order.
+RANK_ITEM_EXACT = 1000      # the query is the row's Item No or Manufacturer Item No
+RANK_ITEM_PREFIX = 100      # one of those starts with a keyword
+RANK_WORD_EXACT = 20        # per keyword that is a whole description word
+RANK_WORD_PREFIX = 10       # per keyword that starts a description word
+RANK_PROXIMITY = 10         # at most, for keywords next to each other in the description
+# Casefolded sales status -> score; other statuses score 0
+SALES_STATUS_RANK = {'active': 5, 'obsolete': -5, 'discontinued': -10}
+SEARCH_SORTS = ('file', 'relevance')
+
+
+def _keyword_span(text, words):
+    """Fewest consecutive words of text that contain every keyword, or None."""
+    hits = [(pos, k) for pos, token in enumerate(text.split()) for k, w in enumerate(words) if w in token]
+    need = len(words)
+    seen = Counter()
+    best = None
+    left = 0
+    for pos, k in hits:
+        seen[k] += 1
+        while len(seen) == need:
+            first = hits[left][0]
+            if best is None or pos - first + 1 < best:
+                best = pos - first + 1
+            left_k = hits[left][1]
+            seen[left_k] -= 1
+            if not seen[left_k]:
+                del seen[left_k]
+            left += 1
+    return best
+
+
+def _item_hits(store, words, row_ids):
+    """{row id: points} of the rows whose item number is the query or starts with a keyword."""
+    query = ' '.join(words)
+    hits = {}
+    for field in PART_NUMBER_FIELDS:
+        col = store.search_text[field]
+        text, base, needle = col._haystack()
+        offsets = col.offsets
+        seen = set()
+        for w in sorted(words, key=len):
+            start, size = needle(w), len(needle(w))
+            # rows whose text starts with the keyword, straight from the packed text
+            # (find within bounds, as a mapped column's text is an mmap)
+            for row in [r for r in row_ids if text.find(start, base + offsets[r], base + offsets[r] + size) >= 0]:
+                if row not in seen:
+                    seen.add(row)
+                    item = col[row].strip()
+                    if item == query:
+                        hits[row] = RANK_ITEM_EXACT
+                    elif all(v in item for v in words):
+                        hits[row] = max(hits.get(row, 0), RANK_ITEM_PREFIX)
+    return hits
+
+
+def _word_postings(tokens, w):
+    """Posting slices of the vocabulary tokens that are keyword w, and of those that start with it."""
+    vocab, starts = tokens.vocab, tokens.starts
+    exact, prefix = [], []
+    for tid in tokens.matching_tokens(w):
+        token = vocab[starts[tid]:starts[tid + 1] - 1].strip(string.punctuation)
+        if token == w:
+            exact.append(tokens.token_rows(tid))
+        elif token.startswith(w):
+            prefix.append(tokens.token_rows(tid))
+    return exact, prefix
+
+
+def _base_scores(store, index, words, row_ids):
+    """
+    Scores of the rows before keyword proximity, as {row id: score}.
+
+    Word hits come from the description token postings when the index has
+    them (no description is read), else from each row's text.
+    """
+    status = store.columns['sales_status']
+    status_rank = [SALES_STATUS_RANK.get(key.casefold(), 0) for key in status.keys]
+    codes = status.codes
+    scores = dict(zip(row_ids, [status_rank[codes[r]] for r in row_ids]))
+    for row, points in _item_hits(store, words, row_ids).items():
+        scores[row] += points
+    tokens = index.fields.get('description') if index is not None else None
+    if isinstance(tokens, _TokenIndex):
+        for w in words:
+            exact, prefix = _word_postings(tokens, w)
+            exact = set().union(*exact)
+            for rows, points in ((exact, RANK_WORD_EXACT), (set().union(*prefix) - exact, RANK_WORD_PREFIX)):
+                for row in rows:
+                    if row in scores:
+                        scores[row] += points
+        return scores
+    desc_col = store.search_text['description']
+    for row in scores:
+        stripped = [t.strip(string.punctuation) for t in desc_col[row].split()]
+        for w in words:
+            if w in stripped:
+                scores[row] += RANK_WORD_EXACT
+            elif any(t.startswith(w) for t in stripped):
+                scores[row] += RANK_WORD_PREFIX
+    return scores
+
+
+def _score_buckets(store, index, words, row_ids):
+    """
+    (score, ascending row ids) of the rows before keyword proximity, best score first.
+
+    Lazy, so only the buckets the ranking visits are collected. With NumPy
+    the scores are a vector over row_ids, and word hits are looked up in
+    per-keyword masks built from the token postings.
+    """
+    tokens = index.fields.get('description') if index is not None else None
+    if np is None or not isinstance(tokens, _TokenIndex):
+        by_score = defaultdict(list)
+        for row, score in _base_scores(store, index, words, row_ids).items():
+            by_score[score].append(row)
+        for score in sorted(by_score, reverse=True):
+            yield score, by_score[score]
+        return
+    rows = np.asarray(row_ids, np.int64)
+    status = store.columns['sales_status']
+    status_rank = np.array([SALES_STATUS_RANK.get(key.casefold(), 0) for key in status.keys], np.int64)
+    scores = status_rank[np.asarray(status.codes)[rows]]
+    hits = _item_hits(store, words, row_ids)
+    if hits:
+        scores[np.searchsorted(rows, list(hits))] += list(hits.values())
+    for w in words:
+        exact, prefix = _word_postings(tokens, w)
+        masks = []
+        for postings in (exact, prefix):
+            mask = np.zeros(len(store), bool)
+            for plist in postings:
+                mask[np.asarray(plist)] = True
+            masks.append(mask[rows])
+        scores += np.where(masks[0], RANK_WORD_EXACT, np.where(masks[1], RANK_WORD_PREFIX, 0))
+    for score in np.unique(scores)[::-1].tolist():
+        yield score, rows[scores == score].tolist()
+
+
+def rank_rows(keywords, store, row_ids, index=None, k=None):
+    """
+    Order matching rows by relevance, best first; only the best k if k is given.
+
+    row_ids are ascending. Hits on the item numbers, whole-word and word-prefix
+    hits in the description and the sales status are scored for every row.
+    Keyword proximity needs the row's description, so it is only worked out
+    for rows that can still reach the top k: rows are visited from the
+    highest score down and a heap keeps the best k, stopping once the rest
+    could not beat them even with the full proximity bonus. Equal scores
+    keep file order.
+    """
+    words = list(dict.fromkeys(keywords.casefold().split()))
+    if k is None:
+        k = len(row_ids)
+    if not words or not k:
+        return list(row_ids[:k])
+
+    bonus = RANK_PROXIMITY if len(words) > 1 else 0
+    desc_col = store.search_text['description']
+    # min-heap of the best (score, -row id) so far
+    top = []
+    for score, rows in _score_buckets(store, index, words, row_ids):
+        if len(top) == k and (score + bonus, 0) < top[0]:
+            break
+        for row in rows:
+            if len(top) == k and (score + bonus, -row) < top[0]:
+                # rows come in file order: the rest of this score cannot get in either
+                break
+            score_row = score
+            if bonus:
+                span = _keyword_span(desc_col[row], words)
+                if span is not None:
+                    score_row += RANK_PROXIMITY * min(len(words), span) // span
+            if len(top) < k:
+                heapq.heappush(top, (score_row, -row))
+            elif (score_row, -row) > top[0]:
+                heapq.heapreplace(top, (score_row, -row))
+    return [-row for _, row in sorted(top, reverse=True)]
+
+
+# Incremental updates: a full file or a delta of changed rows is compared
+# with the loaded dataset on Item No, and the next generation is spliced
+# from the loaded one (see apply_update) instead of parsing everything again.
+
+# Upload modes: replace the dataset, update it from a complete file, or apply a delta
+UPLOAD_MODES = ('replace', 'full', 'delta')
+# Values of a delta file's Action column that remove the row's item
+DELETE_ACTIONS = frozenset({'delete', 'deleted', 'remove', 'd'})
+
+
+def _item_key(value):
+    """The key rows are matched on in incremental updates: the Item No text, stripped."""
+    return ('' if value is None else str(value)).strip()
+
+
+def _cell_text(value):
+    return '' if value is None else str(value)
+
+
+class ChangeSetBuilder(DatasetBuilder):
+    """
+    Collects the rows of an incremental update file, keyed on Item No.
+
+    Rows go to a ColumnStore without a search index; apply_update() only
+    indexes the ones that differ from the loaded dataset. In a delta file
+    (delta=True) an Action column of "delete" removes the row's item, and a
+    later row for an item replaces an earlier one. A full file must list
+    each item once: duplicates and rows without an Item No are counted, so
+    the caller can load such a file as a plain replacement instead.
+    """
+
+    def __init__(self, delta=False, progress=None, phase=None):
+        super().__init__(progress, phase)
+        self.search_index = None
+        self.delta = delta
+        self.EXTRA_HEADERS = ('action',) if delta else ()
+        # item key -> row of the store, or None when the item is deleted
+        self.items = {}
+        self.duplicates = 0
+        self.unkeyed = 0
+
+    def add_batch(self, rows, bytes_read=None, total_bytes=None):
+        start = len(self.store)
+        if self.delta:
+            rows = self._delta_rows(rows, start)
+        else:
+            keys = [_item_key(row[ITEM_IDX]) for row in rows]
+            size = len(self.items)
+            self.items.update(zip(keys, count(start)))
+            self.unkeyed += keys.count('')
+            self.duplicates += len(keys) - (len(self.items) - size)
+        self.store.extend(rows)
+        if self.progress:
+            self.progress(len(self.store), bytes_read, total_bytes)
+
+    def _delta_rows(self, rows, start):
+        """Record a batch of delta rows (with their Action cell); returns the rows to store."""
+        kept = []
+        for row in rows:
+            key = _item_key(row[ITEM_IDX])
+            row, action = row[:-1], row[-1]
+            if _cell_text(action).strip().lower() in DELETE_ACTIONS:
+                if key:
+                    self.items[key] = None
+                else:
+                    self.unkeyed += 1
+            elif str(row[DESC_IDX]).strip():
+                if key:
+                    self.items[key] = start + len(kept)
+                else:
+                    self.unkeyed += 1
+                kept.append(row)
+        return kept
+
+    def finish(self):
+        self.store.finalize()
+        return self.store
+
+
+def _column_texts(col):
+    """Text of every row of a store column, as a list."""
+    if isinstance(col, FacetColumn):
+        texts = [_cell_text(v) for v in col.values]
+        return [texts[c] for c in col.codes]
+    return col.strings()
+
+
+def diff_update(store, changes):
+    """
+    Compare the rows collected by a ChangeSetBuilder with a loaded store.
+
+    Returns (plan, error). The plan lists the store rows to delete, the
+    store rows to update ({row id: row of changes.store}) and the rows of
+    changes.store to insert, with counts of the unchanged items and of
+    deletions naming items that are not loaded. Cells are compared as text,
+    so a number read from Excel equals the same number read from a CSV.
+    The error is set for changes that cannot be applied by Item No.
+    """
+    old_keys = [k.strip() for k in store.columns['item_no'].strings()]
+    positions = dict(zip(old_keys, range(len(old_keys))))
+    ambiguous = set()
+    if len(positions) != len(old_keys):
+        ambiguous = {k for k, n in Counter(old_keys).items() if n > 1}
+    if not changes.delta and (changes.duplicates or changes.unkeyed or ambiguous or '' in positions):
+        return None, 'some items have no Item number or occur more than once'
+    if changes.delta and changes.unkeyed:
+        return None, f'{changes.unkeyed} rows of the changes have no Item'
+
+    # matched items: old_rows[k] of the store against new_rows[k] of the changes
+    deleted, old_rows, new_rows, inserted, not_found = [], [], [], [], 0
+    if changes.delta:
+        for key, j in changes.items.items():
+            if key in ambiguous:
+                return None, f'Item {key} occurs more than once in the loaded dataset'
+            i = positions.get(key)
+            if j is None:
+                if i is None:
+                    not_found += 1
+                else:
+                    deleted.append(i)
+            elif i is None:
+                inserted.append(j)
+            else:
+                old_rows.append(i)
+                new_rows.append(j)
+    else:
+        # every item is listed once; the loaded items the file leaves out are deleted
+        matches = list(map(positions.get, changes.items))
+        rows = list(changes.items.values())
+        inserted = [j for i, j in zip(matches, rows) if i is None]
+        new_rows = [j for i, j in zip(matches, rows) if i is not None]
+        old_rows = [i for i in matches if i is not None]
+        deleted = set(range(len(store))).difference(old_rows)
+
+    # Rows differing in any column are updates
+    updated = set()
+    for field in FIELDS:
+        old_col, new_col = store.columns[field], changes.store.columns[field]
+        if len(old_rows) > len(store) // 16:
+            old_texts, new_texts = _column_texts(old_col), _column_texts(new_col)
+        else:
+            old_texts = {i: _cell_text(old_col[i]) for i in old_rows}
+            new_texts = {j: _cell_text(new_col[j]) for j in new_rows}
+        updated.update(compress(old_rows, map(ne, map(old_texts.__getitem__, old_rows),
+                                              map(new_texts.__getitem__, new_rows))))
+    return {
+        'deleted': sorted(deleted),
+        'updated': {i: j for i, j in zip(old_rows, new_rows) if i in updated},
+        'inserted': sorted(inserted),
+        'unchanged': len(old_rows) - len(updated),
+        'not_found': not_found,
+    }, None
+
+
+def _remap_facet_index(facet_index, store, new_ids, rows):
+    """Facet index of store after an incremental update (see SearchIndex.remapped)."""
+    index = {}
+    rows = np.asarray(rows, np.int64)
+    for field, postings in facet_index.items():
+        col = store.columns[field]
+        added = defaultdict(list)
+        for row, code in zip(rows.tolist(), np.asarray(col.codes)[rows].tolist()):
+            added[col.keys[code]].append(row)
+        index[field] = {}
+        for key in dict.fromkeys(chain(postings, added)):
+            plist = new_ids[np.asarray(postings[key])] if key in postings else np.zeros(0, np.int64)
+            plist = plist[plist >= 0]
+            if key in added:
+                plist = np.insert(plist, np.searchsorted(plist, added[key]), added[key])
+            # keys left without rows are dropped, and with them their filter option
+            if len(plist):
+                index[field][key] = array('I', plist.astype(np.uint32).tobytes())
+    return index
+
+
+def apply_update(dataset, changes, plan):
+    """
+    Build the dataset's next store and indexes from a diff_update() plan.
+
+    Rows keep their place: updated rows are replaced where they are, deleted
+    rows close up and inserted rows are appended, in the order of the file.
+    The store is spliced from runs of unchanged rows; with NumPy the search
+    and facet posting lists are renumbered and only the changed rows are
+    indexed, otherwise the indexes are built again from the new store.
+    Returns (store, search_index, facet_index).
+    """
+    old, new = dataset['store'], changes.store
+    deleted, updated, inserted = plan['deleted'], plan['updated'], plan['inserted']
+    parts = []
+    prev = 0
+    for i in sorted(set(deleted).union(updated)):
+        parts.append((old, prev, i))
+        if i in updated:
+            parts.append((new, updated[i], updated[i] + 1))
+        prev = i + 1
+    parts.append((old, prev, len(old)))
+    parts.extend((new, j, j + 1) for j in inserted)
+    # one part per run of consecutive rows
+    runs = []
+    for src, start, stop in parts:
+        if start == stop:
+            continue
+        if runs and runs[-1][0] is src and runs[-1][2] == start:
+            runs[-1] = (src, runs[-1][1], stop)
+        else:
+            runs.append((src, start, stop))
+    store = ColumnStore.spliced(runs)
+    if np is None:
+        return store, build_search_index(store), build_facet_index(store)
+
+    # old row id -> new row id, -1 for deleted and updated rows
+    dead = np.zeros(len(old), np.int64)
+    dead[deleted] = 1
+    new_ids = np.arange(len(old)) - (np.cumsum(dead) - dead)
+    changed_old = np.fromiter(updated, np.int64, len(updated))
+    rows = sorted(new_ids[changed_old].tolist() + list(range(len(store) - len(inserted), len(store))))
+    new_ids[dead == 1] = -1
+    new_ids[changed_old] = -1
+    texts = {f: [col[r] for r in rows] for f, col in store.search_text.items()}
+    search_index = dataset['search_index'].remapped(store, new_ids, rows, texts)
+    return store, search_index, _remap_facet_index(dataset['facet_index'], store, new_ids, rows)
+
+
+# Snapshots: the parsed dataset saved under UPLOAD_FOLDER, reloaded on startup.
+# Bump SNAPSHOT_VERSION whenever the layout of any saved structure changes;
+# snapshots written by another version are ignored and the next upload
+# replaces them.
+SNAPSHOT_MAGIC = b'DARTSNAP'
+SNAPSHOT_VERSION = 4
+SNAPSHOT_FILENAME = 'dataset.snapshot'
+
+
+class SnapshotError(Exception):
+    """The file is not a snapshot this version of the app can load."""
+
+
+def _snapshot_value(v):
+    """JSON form of a raw cell value (facet dictionaries hold numbers and dates too)."""
+    if v is None or isinstance(v, (str, bool, int, float)):
+        return v
+    if isinstance(v, datetime.timedelta):
+        return {'timedelta': v.total_seconds()}
+    for kind in (datetime.datetime, datetime.date, datetime.time):
+        if isinstance(v, kind):
+            return {kind.__name__: v.isoformat()}
+    return str(v)
+
+
+def _restore_value(v):
+    if not isinstance(v, dict):
+        return v
+    (kind, value), = v.items()
+    if kind == 'timedelta':
+        return datetime.timedelta(seconds=value)
+    return getattr(datetime, kind).fromisoformat(value)
+
+
+class SnapshotWriter:
+    """
+    Builds a snapshot file: a JSON header followed by named binary sections.
+
+    Arrays are written in native byte order and text as UTF-8, each section
+    aligned to 8 bytes so it can be used straight from a memory map. Small
+    structures go in the header (meta). Arrays may be given as memoryviews of
+    a mapped snapshot, so a loaded dataset can be written out again.
+    """
+
+    ALIGN = 8
+
+    def __init__(self):
+        self.meta = {}
+        self._sections = {}
+        self._buffers = []
+        self._size = 0
+
+    def _add(self, name, data, typecode):
+        buf = memoryview(data).cast('B')
+        self._sections[name] = [self._size, buf.nbytes, typecode]
+        self._buffers.append(buf)
+        pad = -buf.nbytes % self.ALIGN
+        if pad:
+            self._buffers.append(bytes(pad))
+        self._size += buf.nbytes + pad
+
+    def add_array(self, name, arr):
+        self._add(name, arr, arr.typecode if isinstance(arr, array) else arr.format)
+
+    def add_bytes(self, name, data):
+        self._add(name, data, 'B')
+
+    def add_text(self, name, text):
+        self._add(name, text.encode('utf-8', 'surrogatepass'), 'text')
+
+    def write(self, path):
+        """Write the snapshot to path, replacing any existing file atomically."""
+        header = dict(self.meta, version=SNAPSHOT_VERSION, byteorder=sys.byteorder,
+                      sections=self._sections)
+        header = json.dumps(header).encode('utf-8')
+        prefix = SNAPSHOT_MAGIC + struct.pack('<I', len(header)) + header
+        prefix += bytes(-len(prefix) % self.ALIGN)
+        # Other processes may be writing or mapping the previous snapshot: the
+        # file is written under a unique name and renamed over it
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(prefix)
+                for buf in self._buffers:
+                    f.write(buf)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return len(prefix) + self._size
+
+
+class SnapshotReader:
+    """
+    Memory-maps a snapshot file and reads its header and sections.
+
+    Sections are exposed as memoryviews of the map (view, region), which stay
+    valid after the file is replaced or removed; the map is released once the
+    last view is dropped. file_key identifies the file that was mapped.
+    """
+
+    def __init__(self, path):
+        self._map = None
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            self.file_key = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, header_len = struct.unpack_from('<8sI', self._map, 0)
+            if magic != SNAPSHOT_MAGIC:
+                raise SnapshotError('not a dataset snapshot')
+            start = len(magic) + 4
+            self.meta = json.loads(self._map[start:start + header_len])
+            if self.meta.get('version') != SNAPSHOT_VERSION:
+                raise SnapshotError(f"snapshot version {self.meta.get('version')}, expected {SNAPSHOT_VERSION}")
+            if self.meta.get('byteorder') != sys.byteorder:
+                raise SnapshotError('snapshot written on a machine with another byte order')
+        except Exception:
+            self.close()
+            raise
+        end = start + header_len
+        self._data_start = end + (-end % SnapshotWriter.ALIGN)
+
+    def close(self):
+        """Unmap the file; only valid while no section views are in use."""
+        if self._map is not None:
+            self._map.close()
+
+    def __contains__(self, name):
+        return name in self.meta['sections']
+
+    def region(self, name):
+        """(map, offset of the section in the map, section length in bytes)."""
+        offset, nbytes, _ = self.meta['sections'][name]
+        return self._map, self._data_start + offset, nbytes
+
+    def view(self, name):
+        """Read-only memoryview of a section, cast to its array typecode."""
+        _, start, nbytes = self.region(name)
+        typecode = self.meta['sections'][name][2]
+        view = memoryview(self._map)[start:start + nbytes]
+        return view if typecode in ('B', 'text') else view.cast(typecode)
+
+    def text(self, name):
+        """Copy of a text section as str."""
+        return str(self.view(name), 'utf-8', 'surrogatepass')
+
+
+def _save_facet_index(snap, index, name):
+    """Posting lists of each facet as one array plus per-key offsets."""
+    for field, postings in index.items():
+        snap.meta[f'{name}.{field}'] = list(postings)
+        snap.add_array(f'{name}.{field}.rows', array('I', chain.from_iterable(postings.values())))
+        snap.add_array(f'{name}.{field}.offsets', array('I', accumulate(map(len, postings.values()), initial=0)))
+
+
+def _load_facet_index(snap, name):
+    index = {}
+    for field in FILTER_FIELDS.values():
+        # posting lists are slices of the mapped rows array
+        rows, offsets = snap.view(f'{name}.{field}.rows'), snap.view(f'{name}.{field}.offsets')
+        index[field] = {key: rows[offsets[i]:offsets[i + 1]]
+                        for i, key in enumerate(snap.meta[f'{name}.{field}'])}
+    return index
+
+
+def file_sha256(filepath):
+    """Hex SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(partial(f.read, 1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _snapshot_path(dataset_id=DEFAULT_DATASET):
+    """Snapshot file of a dataset: dataset.snapshot for the default one, dataset.<id>.snapshot otherwise."""
+    if dataset_id == DEFAULT_DATASET:
+        return os.path.join(app.config['UPLOAD_FOLDER'], SNAPSHOT_FILENAME)
+    base, ext = os.path.splitext(SNAPSHOT_FILENAME)
+    return os.path.join(app.config['UPLOAD_FOLDER'], f'{base}.{dataset_id}{ext}')
+
+
+def _snapshot_dataset_ids():
+    """Ids of the datasets that have a snapshot file under UPLOAD_FOLDER."""
+    base, ext = os.path.splitext(SNAPSHOT_FILENAME)
+    try:
+        names = os.listdir(app.config['UPLOAD_FOLDER'])
+    except OSError:
+        return []
+    ids = []
+    for name in sorted(names):
+        if name == SNAPSHOT_FILENAME:
+            ids.append(DEFAULT_DATASET)
+        elif name.startswith(base + '.') and name.endswith(ext):
+            dataset_id = name[len(base) + 1:-len(ext)]
+            if DATASET_ID_RE.fullmatch(dataset_id) and dataset_id != DEFAULT_DATASET:
+                ids.append(dataset_id)
+    return ids
+
+
+def save_snapshot(path, dataset, source_sha256):
+    """
+    Save a loaded dataset (store, indexes, filter options) to path.
+
+    source_sha256 identifies the uploaded file the dataset was parsed from.
+    Returns the snapshot size in bytes.
+    """
+    snap = SnapshotWriter()
+    snap.meta.update(source_sha256=source_sha256, filename=dataset['filename'],
+                     created=time.time(), filters=dataset['filters'])
+    dataset['store'].save(snap, 'store')
+    dataset['search_index'].save(snap, 'search')
+    _save_facet_index(snap, dataset['facet_index'], 'facets')
+    return snap.write(path)
+
+
+def load_snapshot(path, source_sha256=None):
+    """
+    Map a dataset saved by save_snapshot().
+
+    The store and indexes are read-only views of the mapped file, not copies.
+    Returns a dict of dataset state keys (see _empty_dataset), including
+    'source_sha256' and 'snapshot_key' (SnapshotReader.file_key), or None
+    if there is no snapshot at path, it was written by another
+    SNAPSHOT_VERSION, or (when source_sha256 is given) it was parsed from a
+    different file.
+    """
+    try:
+        snap = SnapshotReader(path)
+    except FileNotFoundError:
+        return None
+    except (SnapshotError, ValueError, struct.error) as e:
+        logger.warning(f"Ignoring snapshot {path}: {e}")
+        return None
+    if source_sha256 is not None and snap.meta['source_sha256'] != source_sha256:
+        snap.close()
+        return None
+    store = ColumnStore.load(snap, 'store')
+    return {
+        'store': store,
+        'filename': snap.meta['filename'],
+        'filters': snap.meta['filters'],
+        'search_index': SearchIndex.load(snap, 'search', store),
+        'facet_index': _load_facet_index(snap, 'facets'),
+        'source_sha256': snap.meta['source_sha256'],
+        'snapshot_key': snap.file_key,
+    }
+
+
+def _snapshot_file_key(path):
+    """SnapshotReader.file_key of the file currently at path, or None."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _sync_shared_dataset(dataset_id):
+    """
+    Serve the dataset generation currently in the dataset's shared snapshot file.
+
+    With SHARED_DATASET every worker process maps the same snapshots, and an
+    upload in any of them publishes by replacing the file. Each request
+    compares the file's identity with the one this process has mapped (one
+    stat call) and remaps it when another worker replaced it, or drops the
+    dataset when it was removed by /clear. An evicted dataset is mapped
+    again the same way.
+    """
+    path = _snapshot_path(dataset_id)
+    key = _snapshot_file_key(path)
+    state = datasets.get(dataset_id) or _empty_dataset(dataset_id)
+    if key == state['snapshot_key'] and not state['evicted']:
+        return
+    with _sync_lock:
+        key = _snapshot_file_key(path)
+        state = datasets.get(dataset_id) or _empty_dataset(dataset_id)
+        if key == state['snapshot_key'] and not state['evicted']:
+            return
+        if key is None:
+            # only a dataset that came from the shared file is dropped here
+            if state['store'] is not None:
+                logger.info(f"Shared dataset {dataset_id} was cleared")
+            _publish_dataset(dataset_id, store=None, filename=None, search_index=None, facet_index=None,
+                             snapshot_key=None, in_snapshot=False, evicted=False)
+            return
+        start = time.time()
+        try:
+            dataset = load_snapshot(path)
+        except Exception:
+            logger.exception(f"Could not map the shared snapshot of dataset {dataset_id}")
+            dataset = None
+        if dataset is None:
+            # unusable file: keep serving what we have until it is replaced
+            _publish_dataset(dataset_id, snapshot_key=key, in_snapshot=False)
+            return
+        _publish_dataset(dataset_id, **dataset, in_snapshot=True, evicted=False)
+        logger.info(f"Mapped shared dataset {dataset_id}: {dataset['filename']} ({len(dataset['store'])} rows) "
+                    f"in {time.time() - start:.2f}s")
+
+
+def _restore_dataset(dataset_id):
+    """Map an evicted dataset (of this process only) from its snapshot again."""
+    with _sync_lock:
+        state = datasets.get(dataset_id)
+        if state is None or not state['evicted']:
+            return
+        start = time.time()
+        try:
+            dataset = load_snapshot(_snapshot_path(dataset_id))
+        except Exception:
+            logger.exception(f"Could not load the snapshot of evicted dataset {dataset_id}")
+            dataset = None
+        if dataset is None:
+            logger.warning(f"Snapshot of evicted dataset {dataset_id} is gone; dataset dropped")
+            _publish_dataset(dataset_id, filename=None, snapshot_key=None, evicted=False)
+            return
+        _publish_dataset(dataset_id, **dataset, in_snapshot=True, evicted=False)
+        logger.info(f"Restored evicted dataset {dataset_id} ({len(dataset['store'])} rows) "
+                    f"in {time.time() - start:.2f}s")
+
+
+def _evict_dataset(dataset_id):
+    """
+    Release a loaded dataset's memory, keeping it on disk as its snapshot.
+
+    A dataset not yet saved (the snapshot failed at upload, or it was
+    replaced since) is saved first. Returns False if it could not be.
+    """
+    state = datasets.get(dataset_id)
+    if state is None or state['store'] is None:
+        return False
+    state = dict(state)
+    path = _snapshot_path(dataset_id)
+    if not state['in_snapshot']:
+        try:
+            save_snapshot(path, state, state['source_sha256'])
+        except Exception:
+            logger.exception(f"Could not save dataset {dataset_id} for eviction; keeping it loaded")
+            return False
+    # a dataset replaced meanwhile is left alone
+    with _data_lock:
+        if datasets[dataset_id]['generation'] != state['generation']:
+            return False
+    _publish_dataset(dataset_id, store=None, search_index=None, facet_index=None, in_snapshot=False, evicted=True,
+                     # shared: unset, so _sync_shared_dataset maps the file again
+                     snapshot_key=None if app.config['SHARED_DATASET'] else _snapshot_file_key(path))
+    _eviction_counts[dataset_id] += 1
+    logger.info(f"Evicted idle dataset {dataset_id} ({state['filename']}) to its snapshot")
+    return True
+
+
+def _enforce_memory_budget(keep):
+    """
+    Evict least recently used datasets until all fit in DATASET_MEMORY_BUDGET.
+
+    The dataset keep (the one just published or used) is never evicted.
+    """
+    budget = app.config['DATASET_MEMORY_BUDGET']
+    if not budget:
+        return
+    with _budget_lock:
+        while True:
+            with _data_lock:
+                loaded = [dict(state) for state in datasets.values() if state['store'] is not None]
+            total = sum(sum(_dataset_memory(state).values()) for state in loaded)
+            idle = [state['dataset_id'] for state in loaded if state['dataset_id'] != keep]
+            if total <= budget or not idle:
+                return
+            if not any(_evict_dataset(dataset_id) for dataset_id in idle):
+                return
+
+
+def _load_startup_snapshot():
+    """Serve the last uploaded datasets again after a restart, if they were snapshotted."""
+    for dataset_id in _snapshot_dataset_ids():
+        start = time.time()
+        try:
+            dataset = load_snapshot(_snapshot_path(dataset_id))
+        except Exception:
+            logger.exception(f"Could not load snapshot of dataset {dataset_id}")
+            continue
+        if dataset is None:
+            continue
+        _publish_dataset(dataset_id, **dataset, in_snapshot=True)
+        logger.info(f"Loaded snapshot of {dataset['filename']} ({len(dataset['store'])} rows) "
+                    f"as dataset {dataset_id} in {time.time() - start:.2f}s")
+
+
+@app.route('/')
+def index():
+    """Render the main page"""
     return render_template('index.html')
 
+def _current_dataset(dataset_id=DEFAULT_DATASET):
+    """
+    Consistent snapshot of a dataset's state (see _empty_dataset).
+
+    Requests work on the snapshot, so an upload finishing in the background
+    cannot hand them the store of one dataset and the indexes of another.
+    With SHARED_DATASET, a generation published by another worker is picked
+    up first; an evicted dataset is mapped again. Marks the dataset as
+    recently used.
+    """
+    if app.config['SHARED_DATASET']:
+        _sync_shared_dataset(dataset_id)
+    elif datasets.get(dataset_id, {}).get('evicted'):
+        _restore_dataset(dataset_id)
+    with _data_lock:
+        state = datasets.get(dataset_id)
+        if state is None:
+            return _empty_dataset(dataset_id)
+        datasets.move_to_end(dataset_id)
+        return dict(state)
+
+
+def _publish_dataset(dataset_id, **values):
+    """Swap new values into a dataset's state atomically, starting a new generation."""
+    with _data_lock:
+        state = datasets.setdefault(dataset_id, _empty_dataset(dataset_id))
+        # cached results belong to the previous generation
+        result_cache.clear(state['generation'])
+        state.update(values)
+        state['generation'] = next(_generations)
+        datasets.move_to_end(dataset_id)
+        loaded = state['store'] is not None
+    if loaded:
+        _enforce_memory_budget(dataset_id)
+
+
+INVALID_DATASET_MESSAGE = 'Dataset ids may only contain letters, digits, "-" and "_" (at most 64)'
+
+
+def _request_dataset_id(data=None):
+    """
+    Dataset named by the request: 'dataset' in data (the JSON body or form), else
+    in the query string, else DEFAULT_DATASET. None if it is not a valid id.
+    """
+    dataset_id = (data or {}).get('dataset') or request.args.get('dataset') or DEFAULT_DATASET
+    if isinstance(dataset_id, str) and DATASET_ID_RE.fullmatch(dataset_id):
+        return dataset_id
+    return None
+
+
+def _new_upload_job(filename, dataset_id=DEFAULT_DATASET, mode='replace'):
+    job = {
+        'job_id': uuid.uuid4().hex,
+        'filename': filename,
+        'dataset': dataset_id,
+        'state': 'running',   # while saving; then queued -> running -> done | error
+        'phase': 'save',      # save -> parse -> index -> filters -> snapshot
+                              # (updates: save -> parse -> diff -> apply -> filters -> snapshot)
+        'mode': mode,         # see UPLOAD_MODES
+        'update': None,       # what an update changed (see _parse_update)
+        'rows_parsed': 0,
+        'progress': None,     # percent of the file read while parsing, if known
+        'from_snapshot': False,
+        'timings': {},
+        'message': f'Uploading "{filename}"...',
+        'started': time.time(),
+        'finished': None,
+    }
+    with _jobs_lock:
+        upload_jobs[job['job_id']] = job
+        # Forget the oldest finished jobs
+        finished = [j['job_id'] for j in upload_jobs.values() if j['finished']]
+        for job_id in finished[:max(len(upload_jobs) - MAX_UPLOAD_JOBS, 0)]:
+            del upload_jobs[job_id]
+            try:
+                os.remove(_job_status_path(job_id))
+            except OSError:
+                pass
+    return job
+
+
+def _job_status_path(job_id):
+    return os.path.join(app.config['UPLOAD_FOLDER'], 'jobs', f'{job_id}.json')
+
+
+def _share_job_status(job):
+    """
+    Write the job's status where other worker processes can read it.
+
+    With SHARED_DATASET, status polls may reach a worker other than the one
+    running the job; upload_status() falls back to this file.
+    """
+    if not app.config['SHARED_DATASET']:
+        return
+    path = _job_status_path(job['job_id'])
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(_job_status(job), f)
+        os.replace(path + '.tmp', path)
+    except OSError:
+        logger.exception(f"Could not share status of upload job {job['job_id']}")
+
+
+def _set_job_phase(job, phase):
+    """Move job to phase, recording how long the previous phase took."""
+    now = time.time()
+    job['timings'][job['phase']] = round(now - job.get('phase_started', job['started']), 3)
+    UPLOAD_PHASE_SECONDS.observe(job['phase'], now - job.get('phase_started', job['started']))
+    job['phase_started'] = now
+    job['phase'] = phase
+    _share_job_status(job)
+
+
+def _job_status(job):
+    """JSON-ready view of an upload job."""
+    status = {k: v for k, v in job.items() if k not in ('started', 'finished', 'phase_started')}
+    status['success'] = job['state'] != 'error'
+    status['elapsed'] = round((job['finished'] or time.time()) - job['started'], 3)
+    return status
+
+
+def _job_progress(job):
+    """DatasetBuilder progress callback recording parsing progress on job."""
+    log_progress = _progress_logger(job['filename'])
+
+    def progress(rows_loaded, bytes_read, total_bytes):
+        job['rows_parsed'] = rows_loaded
+        if bytes_read and total_bytes:
+            job['progress'] = round(100 * bytes_read / total_bytes)
+        log_progress(rows_loaded, bytes_read, total_bytes)
+        _share_job_status(job)
+
+    return progress
+
+
+def _parse_upload(filepath, filename, progress=None, phase=None):
+    """
+    Parse and index a saved upload; returns (store, search_index, facet_index, error).
+
+    progress and phase are the DatasetBuilder callbacks (see _job_progress).
+    """
+    # Parse file depending on extension (timing logged); rows stream into
+    # the column store and keyword search index as they are read
+    ext = filename.rsplit('.', 1)[1].lower()
+    parse_start = time.time()
+    builder = DatasetBuilder(progress=progress, phase=phase)
+    if ext == 'csv':
+        store, error = parse_csv_file(filepath, builder)
+    else:
+        store, error = parse_excel_file(filepath, builder)
+    parse_end = time.time()
+    if error:
+        return None, None, None, error
+    logger.info(f"Parsed and indexed file {filename} in {parse_end - parse_start:.2f}s, rows={len(store)}")
+
+    # Facet posting lists; filter options are derived from the same pass
+    return store, builder.search_index, build_facet_index(store), None
+
+
+def _upload_process_main(conn, filepath, filename, snapshot_path, source_sha256):
+    """
+    Body of the upload process started by _parse_upload_in_process.
+
+    Parses and indexes the file and saves it as the snapshot at
+    snapshot_path. Progress and phase changes are sent over conn as
+    ('progress', (rows, bytes read, total bytes)) and ('phase', name), then
+    the outcome: ('done', None), ('error', message) for a file that cannot
+    be loaded, or ('failed', message) if the process itself failed.
+    """
+    if hasattr(os, 'nice'):
+        os.nice(UPLOAD_PROCESS_NICENESS)
+    try:
+        store, search_index, facet_index, error = _parse_upload(
+            filepath, filename, progress=lambda *args: conn.send(('progress', args)),
+            phase=lambda phase: conn.send(('phase', phase)))
+        if error:
+            conn.send(('error', error))
+            return
+        conn.send(('phase', 'filters'))
+        dataset = dict(store=store, filename=filename, filters=_compute_filters(facet_index),
+                       search_index=search_index, facet_index=facet_index)
+        conn.send(('phase', 'snapshot'))
+        size = save_snapshot(snapshot_path, dataset, source_sha256)
+        logger.info(f"Saved snapshot of {filename} ({size / (1024 * 1024):.1f}MB)")
+        conn.send(('done', None))
+    except Exception as e:
+        logger.exception(f"Upload process for {filename} failed")
+        conn.send(('failed', str(e)))
+    finally:
+        conn.close()
+
+
+def _parse_upload_in_process(job, filepath, snapshot_path, source_sha256):
+    """
+    Parse a dataset replacement in a child process; returns (snapshot, error).
+
+    The child (see _upload_process_main) runs at a lower CPU priority and
+    saves the dataset as its snapshot, which this process then maps like
+    the snapshot of an earlier upload: meanwhile request threads keep the
+    GIL, and the CPU goes to them first. The child's progress is recorded
+    on job. snapshot is None without an error if the child could not load
+    the file for another reason (e.g. the snapshot could not be written);
+    the caller then parses it in this process.
+    """
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_upload_process_main, daemon=True,
+                              args=(sender, filepath, job['filename'], snapshot_path, source_sha256))
+    process.start()
+    sender.close()
+    progress = _job_progress(job)
+    outcome = ('failed', 'the upload process exited')
+    try:
+        while True:
+            try:
+                kind, value = receiver.recv()
+            except EOFError:
+                break
+            if kind == 'progress':
+                progress(*value)
+            elif kind == 'phase':
+                _set_job_phase(job, value)
+            else:
+                outcome = (kind, value)
+                break
+    finally:
+        receiver.close()
+        process.join()
+    kind, value = outcome
+    if kind == 'error':
+        return None, value
+    snapshot = load_snapshot(snapshot_path, source_sha256) if kind == 'done' else None
+    if snapshot is None:
+        logger.error(f"Could not parse {job['filename']} in an upload process ({value or 'unreadable snapshot'}); "
+                     f"parsing it here")
+    return snapshot, None
+
+
+def _parse_update(job, filepath, base):
+    """
+    Apply an update upload (mode 'full' or 'delta') to the loaded dataset base.
+
+    Returns (store, search_index, facet_index, error) like _parse_upload,
+    with store None when the file changes nothing; job['update'] reports
+    what changed. A full file whose items cannot be matched one to one is
+    loaded as a plain replacement instead.
+    """
+    filename = job['filename']
+    builder = ChangeSetBuilder(delta=job['mode'] == 'delta', progress=_job_progress(job))
+    parse_start = time.time()
+    if filename.rsplit('.', 1)[1].lower() == 'csv':
+        changes, error = parse_csv_file(filepath, builder)
+    else:
+        changes, error = parse_excel_file(filepath, builder)
+    if error:
+        return None, None, None, error
+    logger.info(f"Parsed update file {filename} in {time.time() - parse_start:.2f}s, rows={len(changes)}")
+
+    _set_job_phase(job, 'diff')
+    plan, error = diff_update(base['store'], builder)
+    if error and not builder.delta:
+        logger.info(f"Loading {filename} as a replacement: {error}")
+        job['update'] = {'mode': 'replace', 'reason': error}
+        _set_job_phase(job, 'index')
+        return changes, build_search_index(changes), build_facet_index(changes), None
+    if error:
+        return None, None, None, error
+    job['update'] = {
+        'mode': job['mode'],
+        'inserted': len(plan['inserted']),
+        'updated': len(plan['updated']),
+        'deleted': len(plan['deleted']),
+        'unchanged': plan['unchanged'],
+        'not_found': plan['not_found'],
+        'rows_before': len(base['store']),
+        'rows_after': len(base['store']),
+    }
+    if not (plan['inserted'] or plan['updated'] or plan['deleted']):
+        return None, None, None, None
+
+    _set_job_phase(job, 'apply')
+    apply_start = time.time()
+    store, search_index, facet_index = apply_update(base, builder, plan)
+    job['update']['rows_after'] = len(store)
+    logger.info(f"Applied {filename}: {len(plan['inserted'])} inserted, {len(plan['updated'])} updated, "
+                f"{len(plan['deleted'])} deleted in {time.time() - apply_start:.2f}s, rows={len(store)}")
+    return store, search_index, facet_index, None
+
+
+def _run_upload_job(job, filepath):
+    """Parse, index and publish a saved upload, recording progress on job."""
+    filename, dataset_id = job['filename'], job['dataset']
+    snapshot_path = _snapshot_path(dataset_id)
+    job['state'] = 'running'
+    _set_job_phase(job, 'parse')
+    job['message'] = f'Parsing "{filename}"...'
+    try:
+        source_sha256 = file_sha256(filepath)
+        snapshot = base = None
+        if job['mode'] != 'replace':
+            base = _current_dataset(dataset_id)
+            if base['store'] is None:
+                if job['mode'] == 'delta':
+                    job['state'], job['message'] = 'error', 'No dataset is loaded to apply the changes to'
+                    return
+                # a full file for an empty dataset is simply loaded
+                base = None
+        if base is not None:
+            store, search_index, facet_index, error = _parse_update(job, filepath, base)
+            if error:
+                job['state'], job['message'] = 'error', error
+                return
+            if store is None:
+                job.update({'state': 'done', 'row_count': len(base['store']),
+                            'message': f'"{filename}" has no changes ({len(base["store"])} rows loaded)'})
+                return
+            # the content no longer comes from one file: never reused for a plain upload
+            source_sha256 = hashlib.sha256(
+                f"{base['source_sha256']}+{job['mode']}:{source_sha256}".encode()).hexdigest()
+            if job['mode'] == 'delta':
+                filename = base['filename']
+        else:
+            # A snapshot of the same file content skips parsing altogether
+            snapshot = load_snapshot(snapshot_path, source_sha256)
+            job['from_snapshot'] = snapshot is not None
+            if snapshot is not None:
+                store, search_index, facet_index = snapshot['store'], snapshot['search_index'], snapshot['facet_index']
+                logger.info(f"Loaded {filename} from snapshot, rows={len(store)}")
+            else:
+                error = None
+                if UPLOAD_PROCESS and os.path.getsize(filepath) >= UPLOAD_PROCESS_MIN_BYTES:
+                    snapshot, error = _parse_upload_in_process(job, filepath, snapshot_path, source_sha256)
+                if snapshot is not None:
+                    store, search_index, facet_index = (snapshot['store'], snapshot['search_index'],
+                                                        snapshot['facet_index'])
+                elif not error:
+                    store, search_index, facet_index, error = _parse_upload(
+                        filepath, filename, _job_progress(job), partial(_set_job_phase, job))
+                if error:
+                    job['state'], job['message'] = 'error', error
+                    return
+        job['rows_parsed'] = len(store)
+
+        # Memory held by the column store, including the normalized view
+        memory = store.memory_usage()
+        memory['search_index_bytes'] = search_index.nbytes()
+        memory['facet_index_bytes'] = index_nbytes(facet_index)
+        logger.info(f"Column store for {filename} uses {memory['total_bytes'] / (1024 * 1024):.1f}MB "
+                    f"(normalized view {memory['normalized_bytes'] / (1024 * 1024):.1f}MB)")
+
+        _set_job_phase(job, 'filters')
+        filters = snapshot['filters'] if snapshot is not None else _compute_filters(facet_index)
+
+        dataset = dict(store=store, filename=filename, filters=filters, source_sha256=source_sha256,
+                       search_index=search_index, facet_index=facet_index)
+        reused = snapshot is not None and snapshot['filename'] == filename
+        saved = reused
+        if base is not None and _current_dataset(dataset_id)['source_sha256'] != base['source_sha256']:
+            # another upload replaced the dataset the changes were applied to
+            job['state'] = 'error'
+            job['message'] = f'The dataset changed while "{job["filename"]}" was applied; upload it again'
+            return
+        if not saved:
+            # Saved for restarts (and shared with the other workers); a
+            # failure here leaves the upload itself intact
+            _set_job_phase(job, 'snapshot')
+            try:
+                size = save_snapshot(snapshot_path, dataset, source_sha256)
+                saved = True
+                logger.info(f"Saved snapshot of {filename} ({size / (1024 * 1024):.1f}MB)")
+            except Exception:
+                logger.exception(f"Could not save snapshot of {filename}")
+
+        # The previous dataset keeps serving searches until this point
+        if not (app.config['SHARED_DATASET'] and saved):
+            # this process only; a snapshot from another worker replaces it
+            # once it changes again
+            _publish_dataset(dataset_id, **dataset, snapshot_key=_snapshot_file_key(snapshot_path),
+                             in_snapshot=saved, evicted=False)
+        elif reused:
+            _publish_dataset(dataset_id, **dataset, snapshot_key=snapshot['snapshot_key'], in_snapshot=True,
+                             evicted=False)
+        else:
+            # served from the new snapshot like in every other worker; the
+            # parsed copy is released
+            _sync_shared_dataset(dataset_id)
+
+        message = f'File "{filename}" uploaded successfully! ({len(store)} rows loaded)'
+        if base is not None and job['update']['mode'] != 'replace':
+            update = job['update']
+            message = (f'"{job["filename"]}" applied: {update["inserted"]} added, {update["updated"]} changed, '
+                       f'{update["deleted"]} removed ({len(store)} rows loaded)')
+        job.update({
+            'state': 'done',
+            'message': message,
+            'row_count': len(store),
+            'normalized_bytes': memory['normalized_bytes'],
+            'memory': memory
+        })
+    except Exception as e:
+        logger.exception(f"Upload job {job['job_id']} for {filename} failed")
+        job['state'], job['message'] = 'error', f'Upload failed: {str(e)}'
+    finally:
+        job['finished'] = time.time()
+        # record how long the last phase took
+        _set_job_phase(job, job['phase'])
+        try:
+            os.remove(filepath)
+        except OSError:
+            pass
+
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    """Handle file upload"""
+    """
+    Handle file upload.
+
+    The file is saved during the request; parsing, indexing and filter
+    computation run on a background worker. The response (202) carries a
+    job_id to poll at /upload/status/<job_id>. With wait=1 (query string or
+    form field) the job runs inline and the finished job status is returned.
+    The dataset field (form or query string) names the dataset the file
+    replaces; by default it is DEFAULT_DATASET. mode=full compares the file
+    with the loaded dataset by Item No and applies only the differences;
+    mode=delta applies a file of changed rows, where an Action column of
+    "delete" removes an item (see UPLOAD_MODES).
+    """
     try:
         if 'file' not in request.files:
             return jsonify({'success': False, 'message': 'No file provided'}), 400
@@ -453,148 +3414,512 @@ def upload_file():
         
         if not allowed_file(file.filename):
             return jsonify({'success': False, 'message': 'Only .xlsx files are allowed'}), 400
+
+        dataset_id = _request_dataset_id(request.form)
+        if dataset_id is None:
+            return jsonify({'success': False, 'message': INVALID_DATASET_MESSAGE}), 400
+        mode = request.values.get('mode') or 'replace'
+        if mode not in UPLOAD_MODES:
+            return jsonify({'success': False, 'message': f'Unknown upload mode: {mode}'}), 400
         
         # Save file
         filename = secure_filename(file.filename)
         # Ensure uploads folder exists (create just before saving)
         os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        job = _new_upload_job(filename, dataset_id, mode)
+        # Saved under the job id so a queued upload of the same name cannot overwrite it
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{job['job_id']}-{filename}")
         t0 = time.time()
-        file.save(filepath)
+        try:
+            file.save(filepath)
+        except Exception as e:
+            job.update({'state': 'error', 'message': f'Upload failed: {str(e)}', 'finished': time.time()})
+            _share_job_status(job)
+            raise
         t1 = time.time()
-        print(f"Saved uploaded file to {filepath} in {t1 - t0:.2f}s")
-
-        # Parse file depending on extension
-        ext = filename.rsplit('.', 1)[1].lower()
-        # Parse file depending on extension (timing logged)
-        parse_start = time.time()
-        if ext == 'csv':
-            rows, error = parse_csv_file(filepath)
-        else:
-            rows, error = parse_excel_file(filepath)
-        parse_end = time.time()
-        if error is None:
-            print(f"Parsed file {filename} in {parse_end - parse_start:.2f}s, rows={len(rows)}")
-        
-        if error:
-            return jsonify({'success': False, 'message': error}), 400
-        
-        # Store in memory (rows are tuples) and compute filter options
-        loaded_data['rows'] = rows
-        loaded_data['filename'] = filename
-        loaded_data['filters'] = _compute_filters(rows)
-        
-        return jsonify({
-            'success': True,
-            'message': f'File "{filename}" uploaded successfully! ({len(rows)} rows loaded)',
-            'row_count': len(rows)
-        })
+        logger.info(f"[RID:{getattr(g, 'request_id', 'N/A')}] Saved uploaded file to {filepath} in {t1 - t0:.2f}s "
+                    f"(upload job {job['job_id']})")
+
+        if request.values.get('wait') in ('1', 'true'):
+            _run_upload_job(job, filepath)
+            status = _job_status(job)
+            return jsonify(status), (200 if status['success'] else 400)
+
+        job['state'] = 'queued'
+        job['message'] = f'"{filename}" received, waiting to be processed...'
+        _share_job_status(job)
+        _upload_executor.submit(_run_upload_job, job, filepath)
+        status = _job_status(job)
+        status['status_url'] = f"/upload/status/{job['job_id']}"
+        return jsonify(status), 202
     
     except Exception as e:
         return jsonify({'success': False, 'message': f'Upload failed: {str(e)}'}), 500
 
 
+@app.route('/upload/status/<job_id>', methods=['GET'])
+def upload_status(job_id):
+    """Progress of a background upload: state, phase, rows parsed and elapsed time."""
+    with _jobs_lock:
+        job = upload_jobs.get(job_id)
+    if job is not None:
+        return jsonify(_job_status(job))
+    if app.config['SHARED_DATASET'] and len(job_id) == 32 and job_id.isalnum():
+        # a job running in another worker process
+        try:
+            with open(_job_status_path(job_id)) as f:
+                return jsonify(json.load(f))
+        except (OSError, ValueError):
+            pass
+    return jsonify({'success': False, 'message': 'Unknown upload job'}), 404
+
+
 @app.route('/filters', methods=['GET'])
 def get_filters():
-    """Return computed filter options for the currently loaded file."""
-    if not loaded_data.get('rows'):
+    """Return computed filter options for the dataset's loaded file."""
+    dataset_id = _request_dataset_id()
+    if dataset_id is None:
+        return jsonify({'success': False, 'message': INVALID_DATASET_MESSAGE, 'filters': {}}), 400
+    dataset = _current_dataset(dataset_id)
+    if not dataset.get('store'):
         return jsonify({'success': False, 'message': 'No file loaded', 'filters': {}}), 400
 
-    return jsonify({'success': True, 'filters': loaded_data.get('filters', {})})
+    return jsonify({'success': True, 'filters': dataset.get('filters') or {}})
 
 
-def _apply_filters(rows, filters):
-    """Filter rows by provided filter values. Filters are strings or empty."""
-    if not filters:
-        return rows
-    # Filters can be single string or list of strings. When list: match any (OR) within that filter.
-    mf = filters.get('manufacturer')
-    pd = filters.get('product_division')
-    ss = filters.get('sales_status')
-    pm = filters.get('product_manager')
-    si = filters.get('sub_item')
-    mg = filters.get('material_group')
-    mgd = filters.get('material_group_desc')
-
-    def _matches_value(row_val, filter_val):
-        if not filter_val:
-            return True
-        def _is_blank(v):
-            return v is None or str(v).strip() == ''
-
-        # If filter is a list, match any item in the list (OR). Support special '(blank)' token.
-        if isinstance(filter_val, (list, tuple)):
-            for f in filter_val:
-                if f is None:
-                    continue
-                fstr = str(f).strip()
-                if fstr == BLANK_LABEL and _is_blank(row_val):
-                    return True
-                if (row_val is not None) and str(row_val).strip() == fstr:
-                    return True
-            return False
+def _filter_keys(filter_val):
+    """
+    Translate a request filter value into the set of normalized keys it accepts.
 
-        # Single filter value
-        fstr = str(filter_val).strip()
-        if fstr == BLANK_LABEL:
-            return _is_blank(row_val)
-        if row_val is None:
-            return False
-        return str(row_val).strip() == fstr
+    Lists match any of their items (OR). The special '(blank)' token matches
+    blank values; inside a list it also matches a literal '(blank)' value.
+    """
+    if isinstance(filter_val, (list, tuple)):
+        keys = set()
+        for f in filter_val:
+            if f is None:
+                continue
+            fstr = str(f).strip()
+            if fstr == BLANK_LABEL:
+                keys.add('')
+            keys.add(fstr)
+        return keys
+    fstr = str(filter_val).strip()
+    return {''} if fstr == BLANK_LABEL else {fstr}
+
+
+def _active_filters(filters):
+    """[(facet field, accepted keys)] for the filters that constrain the result."""
+    # Only filters with a value constrain the result
+    return [(field, _filter_keys(filters[name]))
+            for name, field in FILTER_FIELDS.items() if filters and filters.get(name)]
+
+
+def _facet_row_ids(postings, keys, part=None):
+    """Union of the posting lists for the accepted keys of one facet (OR)."""
+    plists = [_posting_slice(postings[k], part) for k in keys if k in postings]
+    if len(plists) == 1:
+        return plists[0]
+    return set().union(*plists)
+
+
+def _accepted_codes(col, keys):
+    """Boolean lookup table over a facet column's codes: True where the code's key is accepted."""
+    table = np.zeros(len(col.keys), dtype=bool)
+    table[[c for c, k in enumerate(col.keys) if k in keys]] = True
+    return table
+
+
+def _vectorized_filter(store, active, row_ids=None, part=None):
+    """
+    _apply_filters over the facet code arrays with NumPy, as array('I') of row ids.
+
+    Each filter is translated once into a lookup table over its column's
+    dictionary codes, so a row is checked by indexing the table with the
+    row's code; filters are ANDed as boolean masks. Without row_ids the whole
+    range part (default: every row) is masked at once; with row_ids only
+    the codes of the rows still selected are gathered for each filter.
+    """
+    checks = [(np.asarray(store.columns[field].codes), _accepted_codes(store.columns[field], keys))
+              for field, keys in active]
+    if row_ids is None:
+        start, stop = part or (0, len(store))
+        mask = None
+        for codes, table in checks:
+            matched = table[codes[start:stop]]
+            mask = matched if mask is None else np.logical_and(mask, matched, out=mask)
+        selected = np.flatnonzero(mask)
+        if start:
+            selected += start
+    else:
+        selected = np.asarray(row_ids, dtype=np.uint32)
+        if part is not None:
+            selected = selected[(selected >= part[0]) & (selected < part[1])]
+        for codes, table in checks:
+            if not len(selected):
+                break
+            selected = selected[table[codes[selected]]]
+    result = array('I')
+    result.frombytes(selected.astype(np.uint32, copy=False).tobytes())
+    return result
 
-    def matches(row):
-        # rows are tuples
-        if not _matches_value(row[FIELD_IDX['manufacturer_name']] if len(row) > FIELD_IDX['manufacturer_name'] else None, mf):
-            return False
-        if not _matches_value(row[FIELD_IDX['product_division']] if len(row) > FIELD_IDX['product_division'] else None, pd):
-            return False
-        if not _matches_value(row[FIELD_IDX['sales_status']] if len(row) > FIELD_IDX['sales_status'] else None, ss):
-            return False
-        if not _matches_value(row[FIELD_IDX['material_group']] if len(row) > FIELD_IDX['material_group'] else None, mg):
-            return False
-        if not _matches_value(row[FIELD_IDX['material_group_desc']] if len(row) > FIELD_IDX['material_group_desc'] else None, mgd):
-            return False
-        if not _matches_value(row[FIELD_IDX['product_manager']] if len(row) > FIELD_IDX['product_manager'] else None, pm):
-            return False
-        if not _matches_value(row[FIELD_IDX['sub_item']] if len(row) > FIELD_IDX['sub_item'] else None, si):
-            return False
-        return True
 
-    return [r for r in rows if matches(r)]
+def _apply_filters(store, filters, row_ids=None, facet_index=None, part=None):
+    """
+    Filter rows by provided filter values and return matching row ids in order.
+
+    Filters are strings or lists of strings (lists match any value). Comparisons
+    use the stripped filter keys of the store's facet columns. row_ids restricts the
+    rows considered, and so does part = (start, stop); by default every row is.
+
+    With a facet_index from build_facet_index, each filter becomes a union of
+    posting lists and filters are intersected (AND) without scanning rows.
+    With VECTORIZED_FILTERS the codes are checked by NumPy instead (see
+    _vectorized_filter); the result is the same.
+    """
+    active = _active_filters(filters)
+    if active and VECTORIZED_FILTERS:
+        return _vectorized_filter(store, active, row_ids, part)
+    if row_ids is None:
+        row_ids_given = False
+        row_ids = range(*(part or (0, len(store))))
+    else:
+        row_ids_given = True
+        if part is not None:
+            row_ids = [i for i in row_ids if part[0] <= i < part[1]]
+    if not active:
+        return list(row_ids)
+
+    if facet_index is None:
+        # Translate accepted keys into dictionary codes once per request
+        checks = []
+        for field, keys in active:
+            col = store.columns[field]
+            checks.append((col.codes, {c for c, k in enumerate(col.keys) if k in keys}))
+        return [i for i in row_ids
+                if all(codes[i] in accepted for codes, accepted in checks)]
+
+    # Intersect from the most selective facet so the working set stays small
+    matches = sorted((_facet_row_ids(facet_index[field], keys, part) for field, keys in active), key=len)
+    selected = set(matches[0])
+    for ids in matches[1:]:
+        if not selected:
+            break
+        selected.intersection_update(ids)
+
+    if not row_ids_given:
+        return sorted(selected)
+    return [i for i in row_ids if i in selected]
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of query results (ascending row ids) per dataset generation.
+
+    Keys are built by key(): the dataset generation plus the query in
+    normalized form, so equivalent requests (keyword case, order or
+    repetition, filter order, empty filters) share an entry and a new
+    dataset never matches an old entry. clear() drops a generation's
+    entries when its dataset is replaced. Results are stored as compact arrays and bounded
+    both by entry count and by the total number of row ids held.
+    """
+
+    def __init__(self, maxsize, max_row_ids):
+        self.maxsize = maxsize
+        self.max_row_ids = max_row_ids
+        self._entries = OrderedDict()
+        self._row_ids = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self.refinements = 0
+
+    @staticmethod
+    def key(generation, keywords, filters):
+        words = tuple(sorted(set(keywords.casefold().split()))) if keywords else ()
+        facets = tuple((field, tuple(sorted(keys))) for field, keys in _active_filters(filters))
+        return generation, words, facets
+
+    def get(self, key):
+        with self._lock:
+            row_ids = self._entries.get(key)
+            if row_ids is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return row_ids
+
+    def refinable(self, key, max_rows):
+        """
+        Smallest cached result (of at most max_rows ids) that is a superset of key's result.
+
+        A query refines a cached one of the same generation and filters when
+        every cached keyword occurs inside one of its keywords, as when typing
+        "steel hex b" -> "steel hex bol": a field containing all its keywords
+        then contains all the cached ones, so its matches are among the
+        cached rows. Returns None when no entry qualifies.
+        """
+        generation, words, facets = key
+        best = None
+        with self._lock:
+            for (gen, old_words, old_facets), row_ids in self._entries.items():
+                if (gen == generation and old_facets == facets and old_words != words
+                        and len(row_ids) <= max_rows and (best is None or len(row_ids) < len(best))
+                        and all(any(old in w for w in words) for old in old_words)):
+                    best = row_ids
+            if best is not None:
+                self.refinements += 1
+        return best
+
+    def put(self, key, row_ids):
+        """Cache row_ids under key; returns them as stored (an array)."""
+        row_ids = array('I', row_ids)
+        if not self.maxsize or len(row_ids) > self.max_row_ids:
+            return row_ids
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._row_ids -= len(old)
+            self._entries[key] = row_ids
+            self._row_ids += len(row_ids)
+            while len(self._entries) > self.maxsize or self._row_ids > self.max_row_ids:
+                _, evicted = self._entries.popitem(last=False)
+                self._row_ids -= len(evicted)
+                self.evictions += 1
+        return row_ids
+
+    def clear(self, generation=None):
+        """Drop the entries of one dataset generation, or all entries."""
+        with self._lock:
+            stale = [key for key in self._entries if generation is None or key[0] == generation]
+            if stale:
+                self.invalidations += 1
+            for key in stale:
+                self._row_ids -= len(self._entries.pop(key))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.maxsize,
+                'row_ids': self._row_ids,
+                'max_row_ids': self.max_row_ids,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'refinements': self.refinements,
+            }
+
+
+# Results of /search and /export queries (see _query_row_ids)
+result_cache = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_MAX_ROW_IDS)
+
+# Process pool for _parallel_row_ids, started on first use
+_search_pool = None
+_search_pool_lock = threading.Lock()
+# In a search pool process: {snapshot path: dataset last mapped from it}
+_partition_datasets = {}
+
+
+def _search_partition(path, snapshot_key, keywords, filters, part):
+    """
+    Matching row ids within rows part = (start, stop); runs in a search pool process.
+
+    The process maps the snapshot at path itself (the pages are shared with
+    every other process mapping it) and keeps it for the following queries.
+    Returns None if the file there is no longer the expected generation.
+    """
+    dataset = _partition_datasets.get(path)
+    if dataset is None or dataset['snapshot_key'] != snapshot_key:
+        _partition_datasets.pop(path, None)
+        dataset = load_snapshot(path)
+        if dataset is None or dataset['snapshot_key'] != snapshot_key:
+            return None
+        _partition_datasets[path] = dataset
+    store = dataset['store']
+    row_ids = None
+    if keywords:
+        row_ids = search_rows(keywords, store, dataset['search_index'], part=part)
+    return array('I', _apply_filters(store, filters, row_ids, dataset['facet_index'], part=part))
+
+
+def _parallel_row_ids(keywords, filters, dataset):
+    """
+    Run a query as SEARCH_PROCESSES row ranges on the search process pool.
+
+    Each range is searched with the same indexes, restricted to its rows
+    (posting lists are cut by bisection), so the set work of large queries
+    is spread over the cores; the ranges' ascending results are joined in
+    file order. Only for datasets served from the snapshot file, which the
+    pool processes map. Returns None if that is not possible, and the caller
+    searches in-process instead.
+    """
+    global _search_pool
+    if not dataset['in_snapshot']:
+        return None
+    with _search_pool_lock:
+        if _search_pool is None:
+            # spawn: forking a threaded server process is unsafe
+            _search_pool = ProcessPoolExecutor(max_workers=SEARCH_PROCESSES,
+                                               mp_context=multiprocessing.get_context('spawn'))
+        pool = _search_pool
+    n_rows = len(dataset['store'])
+    bounds = [n_rows * i // SEARCH_PROCESSES for i in range(SEARCH_PROCESSES + 1)]
+    try:
+        path = _snapshot_path(dataset['dataset_id'])
+        futures = [pool.submit(_search_partition, path, dataset['snapshot_key'], keywords, filters, part)
+                   for part in zip(bounds, bounds[1:])]
+        parts = [future.result() for future in futures]
+    except Exception:
+        logger.exception("Parallel search failed; searching in-process")
+        return None
+    if any(part is None for part in parts):
+        return None
+    row_ids = parts[0]
+    for part in parts[1:]:
+        row_ids.extend(part)
+    return row_ids
+
+
+def _query_row_ids(keywords, filters, dataset):
+    """
+    Run the indexed keyword search (if any) and filters over a dataset snapshot.
+
+    Results are served from result_cache when the same query already ran on
+    this dataset generation, e.g. an /export right after its /search. A query
+    refining a recent one (see ResultCache.refinable) only searches that
+    query's results, when they are few enough to scan. Large datasets may be
+    searched in parallel (see _parallel_row_ids).
+    """
+    with timed_phase('cache'):
+        key = ResultCache.key(dataset['generation'], keywords, filters)
+        row_ids = result_cache.get(key)
+        if row_ids is not None:
+            return row_ids
+        store = dataset['store']
+        candidates = result_cache.refinable(key, int(len(store) * REFINE_MAX_FRACTION))
+    if candidates is not None:
+        # the candidates already passed the (same) filters
+        with timed_phase('search'):
+            row_ids = search_rows(keywords, store, row_ids=candidates)
+        return result_cache.put(key, row_ids)
+    if SEARCH_PROCESSES > 1 and len(store) >= PARALLEL_MIN_ROWS:
+        with timed_phase('parallel'):
+            row_ids = _parallel_row_ids(keywords, filters, dataset)
+        if row_ids is not None:
+            return result_cache.put(key, row_ids)
+    row_ids = None
+    if keywords:
+        with timed_phase('search'):
+            row_ids = search_rows(keywords, store, dataset.get('search_index'))
+    with timed_phase('filter'):
+        row_ids = _apply_filters(store, filters, row_ids, dataset.get('facet_index'))
+    return result_cache.put(key, row_ids)
+
+def _fuzzy_row_ids(keywords, filters, dataset):
+    """
+    _query_row_ids() tolerating typos: (row ids, {keyword: similar tokens searched instead}).
+
+    Keywords found in no search field are replaced by their similar tokens
+    (see SearchIndex.expand). Each combination of replacements, up to
+    FUZZY_MAX_QUERIES, runs as a normal query (cached like any other), and
+    their results are joined.
+    """
+    words = list(dict.fromkeys(keywords.casefold().split()))
+    with timed_phase('fuzzy'):
+        expansions = dataset['search_index'].expand(words) if words else {}
+    if not expansions:
+        return _query_row_ids(keywords, filters, dataset), {}
+    queries = list(islice(product(*(expansions.get(w, [w]) for w in words)), FUZZY_MAX_QUERIES))
+    if len(queries) == 1:
+        return _query_row_ids(' '.join(queries[0]), filters, dataset), expansions
+    results = set()
+    for query in queries:
+        results.update(_query_row_ids(' '.join(query), filters, dataset))
+    return array('I', sorted(results)), expansions
+
+
+def _expanded_keywords(keywords, expansions):
+    """keywords with each expanded keyword replaced by its first similar token (for ranking)."""
+    return ' '.join(expansions[w][0] if expansions.get(w) else w for w in keywords.casefold().split())
+
 
 @app.route('/search', methods=['POST'])
 def search():
-    """Handle search request"""
+    """
+    Handle search request.
+
+    Matches come in file order; with sort=relevance they are ranked (see
+    rank_rows), and with a limit only the rows up to the page are ranked.
+    With fuzzy=true, keywords found nowhere are searched as the similar
+    tokens listed in the response's expanded (see _fuzzy_row_ids).
+    With format=columns the page comes as fields, columns and dictionaries
+    (see ColumnStore.to_columns) instead of results.
+    """
     try:
-        if not loaded_data['rows']:
+        data = request.get_json() or {}
+        dataset_id = _request_dataset_id(data)
+        if dataset_id is None:
+            return jsonify({'success': False, 'message': INVALID_DATASET_MESSAGE, 'results': []}), 400
+        dataset = _current_dataset(dataset_id)
+        if not dataset['store']:
             return jsonify({
                 'success': False,
                 'message': 'No file loaded. Please upload a file first.',
                 'results': []
             }), 400
-        
-        data = request.get_json() or {}
+
         keywords = data.get('keywords', '').strip()
         filters = data.get('filters', {})
+        fuzzy = bool(data.get('fuzzy'))
+        sort = data.get('sort') or 'file'
+        if sort not in SEARCH_SORTS:
+            return jsonify({
+                'success': False,
+                'message': f"Unknown sort; use one of {', '.join(SEARCH_SORTS)}",
+                'results': []
+            }), 400
+        result_format = data.get('format') or 'rows'
+        if result_format not in SEARCH_FORMATS:
+            return jsonify({
+                'success': False,
+                'message': f"Unknown format; use one of {', '.join(SEARCH_FORMATS)}",
+                'results': []
+            }), 400
 
-        # Apply filters first (if any)
-        filtered_rows = _apply_filters(loaded_data['rows'], filters)
+        # Optional paging: without a limit every match is returned
+        try:
+            offset = max(int(data.get('offset') or 0), 0)
+            limit = data.get('limit')
+            if limit is not None:
+                limit = min(max(int(limit), 1), MAX_SEARCH_PAGE_SIZE)
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'message': 'offset and limit must be integers',
+                'results': []
+            }), 400
 
-        # If keywords provided, perform keyword search on filtered rows
-        if keywords:
-            results = search_rows(keywords, filtered_rows)
-        else:
-            # No keywords => return filtered rows (or message prompting keywords if no filters)
-            if filters:
-                results = filtered_rows
+        # Keyword search (indexed) and filters run on the store's normalized columns
+        expansions = {}
+        if keywords or filters:
+            if fuzzy:
+                results, expansions = _fuzzy_row_ids(keywords, filters, dataset)
             else:
-                return jsonify({
-                    'success': True,
-                    'message': 'Please enter search keywords or apply filters',
-                    'results': [],
-                    'count': 0
-                })
+                results = _query_row_ids(keywords, filters, dataset)
+        else:
+            # No keywords and no filters => prompt for keywords
+            return jsonify({
+                'success': True,
+                'message': 'Please enter search keywords or apply filters',
+                'results': [],
+                'count': 0,
+                'total': 0
+            })
         
         if not results:
             return jsonify({
@@ -602,21 +3927,50 @@ def search():
                 'message': 'No Match Found',
                 'results': [],
                 'count': 0,
+                'total': 0,
+                'expanded': expansions,
                 'no_match': True
             })
         
-        # Convert matched tuple rows to dicts for response (do not convert entire dataset)
-        def to_dict(tpl):
-            return {k: (tpl[i] if i < len(tpl) else '') for i, k in enumerate(FIELDS)}
-
-        result_dicts = [to_dict(r) for r in results]
-
-        return jsonify({
+        # Materialize only the rows of the requested page as dicts
+        store = dataset['store']
+        total = len(results)
+        ordered = results
+        if sort == 'relevance' and keywords:
+            with timed_phase('rank'):
+                ordered = rank_rows(_expanded_keywords(keywords, expansions), store, results,
+                                    dataset['search_index'], None if limit is None else offset + limit)
+        page = ordered[offset:] if limit is None else ordered[offset:offset + limit]
+        response = {
             'success': True,
-            'message': f'Found {len(result_dicts)} result(s)',
-            'results': result_dicts,
-            'count': len(result_dicts)
-        })
+            'message': f'Found {total} result(s)',
+            'count': len(page),
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'sort': sort,
+            'format': result_format,
+            'expanded': expansions,
+            'has_more': offset + len(page) < total
+        }
+        with timed_phase('materialize'):
+            if result_format == 'columns':
+                response['fields'] = FIELDS
+                response['columns'], response['dictionaries'] = store.to_columns(page)
+            else:
+                response['results'] = [store.to_dict(i) for i in page]
+        if offset == 0:
+            # Filter options narrowed to the whole result, not just this page,
+            # with the number of results having each (with format=columns the
+            # options are left to be read from the counts' keys)
+            with timed_phase('facets'):
+                counts = _facet_counts(store, results)
+                if result_format == 'rows':
+                    response['result_filters'] = {option_key: sorted(options)
+                                                  for option_key, options in counts.items()}
+                response['facet_counts'] = counts
+        with timed_phase('serialize'):
+            return jsonify(response)
     
     except Exception as e:
         return jsonify({
@@ -626,79 +3980,522 @@ def search():
         }), 500
 
 
+def _lookup_numbers(data):
+    """
+    The part numbers of a /lookup request, in order and without repeats, or None.
+
+    numbers may be a list, or text pasted from a spreadsheet column: one
+    number per line (commas, semicolons and tabs separate them as well).
+    Numbers differing only in case or surrounding spaces are the same.
+    """
+    numbers = data.get('numbers', data.get('text', ''))
+    if isinstance(numbers, str):
+        numbers = re.split(r'[\r\n,;\t]+', numbers)
+    elif not isinstance(numbers, list):
+        return None
+    unique = {}
+    for number in numbers:
+        if isinstance(number, (dict, list)):
+            return None
+        number = _cell_text(number).strip()
+        if number:
+            unique.setdefault(number.casefold(), number)
+    return unique
+
+
+@app.route('/lookup', methods=['POST'])
+def lookup():
+    """
+    Resolve a list of part numbers in one request.
+
+    Each number is matched against the whole Item No and Manufacturer Item
+    No of every row (trimmed, case-insensitive), or with match=prefix
+    against their start. Results follow the order of the numbers; each
+    lists its matching rows in file order (at most limit) and the fields
+    they matched on. Numbers without a match are listed in not_found.
+    """
+    try:
+        data = request.get_json() or {}
+        dataset_id = _request_dataset_id(data)
+        if dataset_id is None:
+            return jsonify({'success': False, 'message': INVALID_DATASET_MESSAGE, 'results': []}), 400
+        dataset = _current_dataset(dataset_id)
+        if not dataset['store']:
+            return jsonify({
+                'success': False,
+                'message': 'No file loaded. Please upload a file first.',
+                'results': []
+            }), 400
+
+        numbers = _lookup_numbers(data)
+        if numbers is None:
+            return jsonify({
+                'success': False,
+                'message': 'numbers must be a list of part numbers or text with one per line',
+                'results': []
+            }), 400
+        if len(numbers) > MAX_LOOKUP_NUMBERS:
+            return jsonify({
+                'success': False,
+                'message': f'At most {MAX_LOOKUP_NUMBERS} part numbers can be looked up at once',
+                'results': []
+            }), 400
+        match = data.get('match') or 'exact'
+        if match not in LOOKUP_MATCHES:
+            return jsonify({
+                'success': False,
+                'message': f"Unknown match; use one of {', '.join(LOOKUP_MATCHES)}",
+                'results': []
+            }), 400
+        try:
+            limit = data.get('limit')
+            limit = LOOKUP_ROWS_PER_NUMBER if limit is None else min(max(int(limit), 1), MAX_LOOKUP_ROWS_PER_NUMBER)
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'limit must be an integer', 'results': []}), 400
+
+        store = dataset['store']
+        with timed_phase('lookup'):
+            found = lookup_part_numbers(list(numbers), store, dataset['search_index'], match == 'prefix')
+        results, not_found = [], []
+        with timed_phase('materialize'):
+            for key, number in numbers.items():
+                fields = found.get(key)
+                if not fields:
+                    not_found.append(number)
+                    continue
+                rows = sorted(set().union(*fields.values()))
+                results.append({
+                    'number': number,
+                    'matched_fields': list(fields),
+                    'total': len(rows),
+                    'results': [store.to_dict(i) for i in rows[:limit]],
+                })
+        with timed_phase('serialize'):
+            return jsonify({
+                'success': True,
+                'message': f'Found {len(results)} of {len(numbers)} part number(s)',
+                'match': match,
+                'results': results,
+                'count': len(results),
+                'not_found': not_found,
+            })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Lookup failed: {str(e)}',
+            'results': []
+        }), 500
+
+
+# Export: results are written row chunk by row chunk and streamed to the
+# client, so only one chunk of rows is materialized at a time
+EXPORT_HEADERS = ['Item No', 'Description', 'Product Division', 'Material Group', 'Material Group Desc',
+                  'Manufacturer Name', 'Manufacturer Item No', 'Sales Status', 'Product Manager', 'Sub Item']
+EXPORT_CHUNK_ROWS = 2000
+# format -> (download name, mimetype)
+EXPORT_FORMATS = {
+    'xlsx': ('search_results.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('search_results.csv', 'text/csv'),
+    'csv.gz': ('search_results.csv.gz', 'application/gzip'),
+}
+
+XLSX_EXPORT_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Search Results" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'),
+    # cell styles 1-4 format datetimes, dates, times and durations
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd h:mm:ss"/></numFmts>'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="5"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="21" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="46" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'),
+}
+XLSX_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+XLSX_SHEET_TAIL = '</sheetData></worksheet>'
+# Date/time value type -> cell style index in XLSX_EXPORT_PARTS' styles.xml
+XLSX_DATE_STYLES = {datetime.datetime: 1, datetime.date: 2, datetime.time: 3, datetime.timedelta: 4}
+XLSX_COLUMN_LETTERS = [chr(ord('A') + i) for i in range(len(EXPORT_HEADERS))]
+
+
+class _StreamSink:
+    """Write-only, unseekable file object collecting what ZipFile writes, for streaming."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        """Everything written since the last call."""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _xlsx_cell(ref, v):
+    """SpreadsheetML for one cell; '' for an empty one."""
+    if v is None or v == '':
+        return ''
+    if isinstance(v, str):
+        v = xml_escape(ILLEGAL_CHARACTERS_RE.sub('', v))
+        return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{v}</t></is></c>'
+    if isinstance(v, bool):
+        return f'<c r="{ref}" t="b"><v>{int(v)}</v></c>'
+    if isinstance(v, int) or (isinstance(v, float) and v == v and abs(v) != float('inf')):
+        return f'<c r="{ref}"><v>{v!r}</v></c>'
+    style = XLSX_DATE_STYLES.get(type(v))
+    if style is not None:
+        return f'<c r="{ref}" s="{style}"><v>{to_excel(v)!r}</v></c>'
+    return _xlsx_cell(ref, str(v))
+
+
+def _xlsx_rows(rows, first_row):
+    """SpreadsheetML <row> elements for rows (tuples in EXPORT_HEADERS order)."""
+    parts = []
+    for r, row in enumerate(rows, first_row):
+        cells = ''.join([_xlsx_cell(f'{col}{r}', v) for col, v in zip(XLSX_COLUMN_LETTERS, row)])
+        parts.append(f'<row r="{r}">{cells}</row>')
+    return ''.join(parts).encode('utf-8')
+
+
+def _export_row_chunks(store, row_ids):
+    """Export rows (tuples in FIELDS order, which EXPORT_HEADERS follows), a chunk at a time."""
+    for start in range(0, len(row_ids), EXPORT_CHUNK_ROWS):
+        yield [store.row(i) for i in row_ids[start:start + EXPORT_CHUNK_ROWS]]
+
+
+def export_xlsx(store, row_ids):
+    """
+    Generate an .xlsx workbook of the given rows as byte chunks.
+
+    The sheet XML is written directly (inline strings, so no shared string
+    table has to be built first) and the zip archive is produced as it is
+    written, instead of building an openpyxl workbook in memory.
+    """
+    sink = _StreamSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, data in XLSX_EXPORT_PARTS.items():
+            zf.writestr(name, data)
+        with zf.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(XLSX_SHEET_HEAD.encode('utf-8'))
+            sheet.write(_xlsx_rows([EXPORT_HEADERS], 1))
+            next_row = 2
+            for rows in _export_row_chunks(store, row_ids):
+                sheet.write(_xlsx_rows(rows, next_row))
+                next_row += len(rows)
+                data = sink.take()
+                if data:
+                    yield data
+            sheet.write(XLSX_SHEET_TAIL.encode('utf-8'))
+    yield sink.take()
+
+
+def export_csv(store, row_ids):
+    """Generate a CSV file of the given rows as UTF-8 byte chunks (with a BOM, for Excel)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write('\ufeff')
+    writer.writerow(EXPORT_HEADERS)
+    for rows in _export_row_chunks(store, row_ids):
+        writer.writerows(rows)
+        yield buf.getvalue().encode('utf-8')
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode('utf-8')
+
+
+def _timed_chunks(chunks, phase):
+    """Pass chunks through, recording the time spent producing them as phase."""
+    elapsed = 0.0
+    chunks = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        elapsed += time.perf_counter() - start
+        if chunk is None:
+            break
+        yield chunk
+    record_phase(phase, elapsed)
+
+
+def export_csv_gz(store, row_ids):
+    """export_csv() compressed as a gzip stream."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for data in export_csv(store, row_ids):
+        data = compressor.compress(data)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+EXPORT_WRITERS = {'xlsx': export_xlsx, 'csv': export_csv, 'csv.gz': export_csv_gz}
+
+
 @app.route('/export', methods=['POST'])
 def export_results():
-    """Export search results (same logic as /search) to an Excel file and return as attachment."""
+    """
+    Export search results (same logic as /search) as an attachment.
+
+    The format field selects xlsx (default), csv or csv.gz, and dataset the
+    dataset searched; sort=relevance writes the rows ranked as /search does,
+    and fuzzy=true searches similar tokens for keywords found nowhere.
+    The file is streamed to the client while it is written. At most
+    EXPORT_CONCURRENCY exports stream at once; beyond that the request is
+    answered 503 with a Retry-After header before any work is done.
+    """
+    if _export_slots is not None and not _export_slots.acquire(blocking=False):
+        return jsonify({'success': False, 'message': 'Too many exports are running; please try again shortly.'}), \
+            503, {'Retry-After': str(EXPORT_RETRY_AFTER_SECONDS)}
+    # the slot is given back when the response is closed, or here if none streams
+    release = _export_slots.release if _export_slots is not None else None
     try:
-        if not loaded_data['rows']:
+        data = request.get_json() or {}
+        dataset_id = _request_dataset_id(data)
+        if dataset_id is None:
+            return jsonify({'success': False, 'message': INVALID_DATASET_MESSAGE}), 400
+        dataset = _current_dataset(dataset_id)
+        if not dataset['store']:
             return jsonify({'success': False, 'message': 'No file loaded. Please upload a file first.'}), 400
 
-        data = request.get_json() or {}
         keywords = data.get('keywords', '').strip()
         filters = data.get('filters', {})
+        export_format = data.get('format') or 'xlsx'
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'success': False,
+                            'message': f"Unknown export format; use one of {', '.join(EXPORT_FORMATS)}"}), 400
+        sort = data.get('sort') or 'file'
+        if sort not in SEARCH_SORTS:
+            return jsonify({'success': False, 'message': f"Unknown sort; use one of {', '.join(SEARCH_SORTS)}"}), 400
 
-        # Apply filters
-        filtered_rows = _apply_filters(loaded_data['rows'], filters)
-
-        # Apply keyword search if provided
-        if keywords:
-            results = search_rows(keywords, filtered_rows)
-        else:
-            if filters:
-                results = filtered_rows
+        # Apply keyword search (indexed) and filters
+        expansions = {}
+        if keywords or filters:
+            if data.get('fuzzy'):
+                row_ids, expansions = _fuzzy_row_ids(keywords, filters, dataset)
             else:
-                return jsonify({'success': False, 'message': 'Please enter search keywords or apply filters to export.'}), 400
+                row_ids = _query_row_ids(keywords, filters, dataset)
+        else:
+            return jsonify({'success': False, 'message': 'Please enter search keywords or apply filters to export.'}), 400
 
-        if not results:
+        if not row_ids:
             return jsonify({'success': True, 'message': 'No Match Found', 'results': [], 'count': 0}), 200
+        if sort == 'relevance' and keywords:
+            with timed_phase('rank'):
+                row_ids = rank_rows(_expanded_keywords(keywords, expansions), dataset['store'], row_ids,
+                                    dataset['search_index'])
 
-        # Create an Excel workbook in-memory
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = 'Search Results'
-
-        headers = ['Item No', 'Description', 'Product Division', 'Material Group', 'Material Group Desc', 'Manufacturer Name', 'Manufacturer Item No', 'Sales Status', 'Product Manager', 'Sub Item']
-        ws.append(headers)
-
-        # results are tuples; map by FIELD_IDX to the output column order
-        for r in results:
-            def gv(field):
-                return (r[FIELD_IDX[field]] if len(r) > FIELD_IDX[field] else '')
-
-            ws.append([
-                gv('item_no'),
-                gv('description'),
-                gv('product_division'),
-                gv('material_group'),
-                gv('material_group_desc'),
-                gv('manufacturer_name'),
-                gv('manufacturer_item_no'),
-                gv('sales_status'),
-                gv('product_manager'),
-                gv('sub_item')
-            ])
-
-        bio = io.BytesIO()
-        wb.save(bio)
-        bio.seek(0)
-
-        filename = 'search_results.xlsx'
+        filename, mimetype = EXPORT_FORMATS[export_format]
+        chunks = _timed_chunks(EXPORT_WRITERS[export_format](dataset['store'], row_ids), 'export-write')
         # Return file as attachment
-        return send_file(bio,
-                 as_attachment=True,
-                 download_name=filename,
-                 mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        response = Response(stream_with_context(chunks), mimetype=mimetype,
+                            headers={'Content-Disposition': f'attachment; filename={filename}',
+                                     'X-Export-Rows': str(len(row_ids))})
+        if release is not None:
+            response.call_on_close(release)
+            release = None
+        return response
 
     except Exception as e:
         return jsonify({'success': False, 'message': f'Export failed: {str(e)}'}), 500
+    finally:
+        if release is not None:
+            release()
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Query result cache counters (hits, misses, evictions, invalidations) and size."""
+    dataset_id = _request_dataset_id() or DEFAULT_DATASET
+    return jsonify(dict(result_cache.stats(), generation=_current_dataset(dataset_id)['generation']))
+
+# generation -> _dataset_memory() of that generation
+_dataset_memory_cache = {}
+
+
+def _dataset_memory(dataset):
+    """Bytes held by a loaded dataset, by part (computed once per generation)."""
+    memory = _dataset_memory_cache.get(dataset['generation'])
+    if memory is not None:
+        return memory
+    usage = dataset['store'].memory_usage()
+    memory = {
+        'columns': sum(usage['columns'].values()),
+        'search_text': sum(usage['search_text'].values()),
+        'search_index': dataset['search_index'].nbytes(),
+        'facet_index': index_nbytes(dataset['facet_index']),
+    }
+    # keep only the generations still served
+    with _data_lock:
+        live = {state['generation'] for state in datasets.values()}
+    for generation in [g for g in _dataset_memory_cache if g not in live]:
+        _dataset_memory_cache.pop(generation, None)
+    _dataset_memory_cache[dataset['generation']] = memory
+    return memory
+
+
+def _dataset_state_name(dataset):
+    """How a dataset is held: 'memory', 'mapped' (from its snapshot), 'evicted' or 'empty'."""
+    if dataset['store'] is not None:
+        return 'mapped' if dataset['store'].mapped else 'memory'
+    return 'evicted' if dataset['evicted'] else 'empty'
+
+
+@app.route('/datasets', methods=['GET'])
+def list_datasets():
+    """
+    The datasets of this process (and, with SHARED_DATASET, those on disk).
+
+    For each: id, file name, rows, how it is held (see _dataset_state_name)
+    and approximate memory; plus the memory budget and the total held.
+    """
+    with _data_lock:
+        states = {dataset_id: dict(state) for dataset_id, state in datasets.items()}
+    listed = []
+    for dataset_id in sorted(set(states) | set(_snapshot_dataset_ids())):
+        state = states.get(dataset_id)
+        if state is None:
+            # saved by another worker or before a restart, not mapped here yet
+            listed.append({'dataset': dataset_id, 'state': 'saved'})
+            continue
+        if state['store'] is None and not state['evicted']:
+            continue
+        listed.append({
+            'dataset': dataset_id,
+            'filename': state['filename'],
+            'rows': len(state['store']) if state['store'] is not None else None,
+            'state': _dataset_state_name(state),
+            'memory_bytes': sum(_dataset_memory(state).values()) if state['store'] is not None else 0,
+        })
+    return jsonify({
+        'success': True,
+        'datasets': listed,
+        'default': DEFAULT_DATASET,
+        'memory_bytes': sum(d.get('memory_bytes') or 0 for d in listed),
+        'memory_budget_bytes': app.config['DATASET_MEMORY_BUDGET'] or None,
+    })
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus text-format metrics of this process.
+
+    Request latency per endpoint and per phase (the Server-Timing phases),
+    upload phases, response counts, each loaded dataset's size and memory
+    footprint, evictions, and the query result cache counters.
+    """
+    with _data_lock:
+        states = [dict(state) for state in datasets.values()]
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.extend([f'# HELP {name} {help_text}', f'# TYPE {name} {kind}'])
+        lines.extend(f'{name}{labels} {value}' for labels, value in samples)
+
+    for histogram in (REQUEST_SECONDS, PHASE_SECONDS, UPLOAD_PHASE_SECONDS):
+        lines.extend(histogram.exposition())
+    with _response_counts_lock:
+        counts = sorted(_response_counts.items())
+    metric('dart_responses_total', 'counter', 'Responses sent, by endpoint and status.',
+           [(f'{{endpoint="{endpoint}",status="{status}"}}', n) for (endpoint, status), n in counts])
+
+    loaded = [state for state in states if state['store'] is not None]
+    metric('dart_dataset_rows', 'gauge', 'Rows in each loaded dataset.',
+           [(f'{{dataset="{state["dataset_id"]}"}}', len(state['store'])) for state in loaded])
+    metric('dart_dataset_generation', 'gauge', 'Dataset generation served by this process.',
+           [(f'{{dataset="{state["dataset_id"]}"}}', state['generation']) for state in states])
+    metric('dart_dataset_memory_bytes', 'gauge', 'Approximate bytes held by each loaded dataset, by part.',
+           [(f'{{dataset="{state["dataset_id"]}",part="{part}"}}', n)
+            for state in loaded for part, n in _dataset_memory(state).items()])
+    metric('dart_dataset_mapped', 'gauge', 'Whether the dataset is served from its snapshot file.',
+           [(f'{{dataset="{state["dataset_id"]}"}}', int(_dataset_state_name(state) == 'mapped'))
+            for state in loaded])
+    metric('dart_dataset_evictions_total', 'counter', 'Datasets evicted to their snapshot to stay in the memory budget.',
+           [(f'{{dataset="{dataset_id}"}}', n) for dataset_id, n in sorted(_eviction_counts.items())])
+    if app.config['DATASET_MEMORY_BUDGET']:
+        metric('dart_dataset_memory_budget_bytes', 'gauge', 'Memory budget of the loaded datasets.',
+               [('', app.config['DATASET_MEMORY_BUDGET'])])
+
+    cache = result_cache.stats()
+    for counter in ('hits', 'misses', 'evictions', 'invalidations', 'refinements'):
+        metric(f'dart_result_cache_{counter}_total', 'counter', f'Query result cache {counter}.',
+               [('', cache[counter])])
+    metric('dart_result_cache_entries', 'gauge', 'Queries held by the result cache.', [('', cache['entries'])])
+    metric('dart_result_cache_row_ids', 'gauge', 'Row ids held by the result cache.', [('', cache['row_ids'])])
+
+    try:
+        with open('/proc/self/statm') as f:
+            rss = int(f.read().split()[1]) * mmap.PAGESIZE
+        metric('process_resident_memory_bytes', 'gauge', 'Resident memory size in bytes.', [('', rss)])
+    except (OSError, ValueError, IndexError):
+        pass
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
 
 @app.route('/clear', methods=['POST'])
 def clear():
-    """Clear loaded file and search results"""
-    loaded_data['rows'] = []
-    loaded_data['filename'] = None
+    """Clear a dataset's loaded file and search results (dataset in the JSON body or query string)"""
+    dataset_id = _request_dataset_id(request.get_json(silent=True))
+    if dataset_id is None:
+        return jsonify({'success': False, 'message': INVALID_DATASET_MESSAGE}), 400
+    # a restart (or another worker) should not bring the cleared data back
+    try:
+        os.remove(_snapshot_path(dataset_id))
+    except OSError:
+        pass
+    _publish_dataset(dataset_id, store=None, filename=None, filters=None, search_index=None, facet_index=None,
+                     source_sha256=None, snapshot_key=None, in_snapshot=False, evicted=False)
     return jsonify({'success': True, 'message': 'Data cleared. Ready for new upload.'})
 
+if multiprocessing.parent_process() is not None:
+    # a search or upload process: it maps the snapshots it is given itself
+    pass
+elif app.config['LOAD_SNAPSHOT']:
+    _load_startup_snapshot()
+elif app.config['SHARED_DATASET']:
+    # start empty: the existing snapshots are only served once an upload replaces them
+    for _dataset_id in _snapshot_dataset_ids():
+        _publish_dataset(_dataset_id, snapshot_key=_snapshot_file_key(_snapshot_path(_dataset_id)))
+
 if __name__ == '__main__':
     # Create uploads folder if it doesn't exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
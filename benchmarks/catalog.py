@@ -0,0 +1,197 @@
+"""
+Synthetic DART catalogs for the benchmarks.
+
+catalog_rows() produces rows shaped like a real DART export: descriptions
+drawn from a product vocabulary with a skewed (Zipf-like) word frequency,
+sizes and part numbers mixed in, unique item numbers, and facet columns
+with realistic cardinalities (a few hundred manufacturers and material
+groups, a handful of divisions and sales statuses, some blank). The
+writers lay files out the way Excel and typical CSV exports do.
+"""
+
+import csv
+import random
+import zipfile
+from itertools import accumulate
+from xml.sax.saxutils import escape
+
+HEADERS = ['Item', 'Description', 'Product Division', 'Sales Status', 'Mfr Name',
+           'Mfr Item', 'Sub Item', 'Product Mgr', 'Material Group', 'Material Group Desc']
+
+NOUNS = ['bolt', 'screw', 'nut', 'washer', 'glove', 'gauze', 'pad', 'tape', 'syringe', 'needle',
+         'catheter', 'kit', 'tray', 'drape', 'gown', 'mask', 'tube', 'connector', 'valve', 'filter',
+         'sponge', 'dressing', 'bandage', 'suture', 'blade', 'scalpel', 'clamp', 'forceps', 'swab',
+         'container', 'bag', 'bottle', 'cap', 'lid', 'label', 'sleeve', 'cover', 'strap', 'clip', 'pin']
+MATERIALS = ['steel', 'stainless', 'nitrile', 'latex', 'vinyl', 'cotton', 'polyester', 'silicone',
+             'plastic', 'paper', 'foam', 'rubber', 'aluminum', 'brass', 'nylon', 'polypropylene']
+ADJECTIVES = ['sterile', 'non-sterile', 'disposable', 'reusable', 'small', 'medium', 'large', 'x-large',
+              'blue', 'white', 'clear', 'black', 'red', 'green', 'pediatric', 'adult', 'latex-free',
+              'powder-free', 'hex', 'round', 'flat', 'straight', 'curved', 'long', 'short', 'soft']
+UNITS = ['MM', 'CM', 'IN', 'ML', 'L', 'G', 'FR', 'GA']
+PACKS = ['BX/100', 'CS/500', 'EA', 'PK/10', 'BG/50', 'CS/12', 'BX/50']
+DIVISIONS = ['DIV1', 'DIV2', 'DIV3', 'DIV4', 'MEDICAL', 'SURGICAL', 'LAB', 'PHARMA', 'DENTAL',
+             'INDUSTRIAL', 'OFFICE', 'FACILITIES']
+SALES_STATUSES = ['Active', 'Active', 'Active', 'Obsolete', 'Discontinued', 'Pending', '(blank)', None]
+
+N_MANUFACTURERS = 800
+N_MATERIAL_GROUPS = 300
+N_PRODUCT_MANAGERS = 60
+N_SUB_ITEMS = 30
+
+
+def _zipf_weights(n, s=1.1):
+    """Cumulative weights of a Zipf-like distribution over n items."""
+    return list(accumulate(1 / (k ** s) for k in range(1, n + 1)))
+
+
+def _vocabulary(rng):
+    """Description words: the base vocabulary plus generated trade words."""
+    words = NOUNS + MATERIALS + ADJECTIVES
+    syllables = ['ac', 'ro', 'me', 'dix', 'ul', 'tra', 'flex', 'pro', 'ex', 'vi', 'on', 'sur', 'ge', 'max']
+    words += sorted({''.join(rng.choice(syllables) for _ in range(rng.randint(2, 3))) for _ in range(1500)})
+    return words
+
+
+def catalog_rows(n_rows, seed=1):
+    """Yield the header row, then n_rows synthetic DART rows (None marks an empty cell)."""
+    rng = random.Random(seed)
+    words = _vocabulary(rng)
+    word_weights = _zipf_weights(len(words))
+    manufacturers = [f'{rng.choice(["Acme", "Medi", "Cardi", "Steri", "Ortho", "Flex", "Pro"])}'
+                     f'{rng.choice(["line", "tech", "care", "med", "source", "supply"])} {i}'
+                     for i in range(N_MANUFACTURERS)]
+    mfr_weights = _zipf_weights(N_MANUFACTURERS, 0.9)
+    groups = [(f'MG{i:04d}', f'{rng.choice(MATERIALS).title()} {rng.choice(NOUNS)}s group {i}')
+              for i in range(N_MATERIAL_GROUPS)]
+    group_weights = _zipf_weights(N_MATERIAL_GROUPS, 0.8)
+    managers = [f'PM {i:02d}' for i in range(N_PRODUCT_MANAGERS)]
+    sub_items = [f'S{i}' for i in range(N_SUB_ITEMS)]
+
+    yield list(HEADERS)
+    for i in range(n_rows):
+        desc = rng.choices(words, cum_weights=word_weights, k=rng.randint(2, 7))
+        if rng.random() < 0.6:
+            desc.insert(rng.randrange(len(desc) + 1), f'{rng.randint(1, 500)}{rng.choice(UNITS)}')
+        if rng.random() < 0.4:
+            desc.append(rng.choice(PACKS))
+        if rng.random() < 0.5:
+            desc = [w.upper() for w in desc]
+        group, group_desc = rng.choices(groups, cum_weights=group_weights)[0]
+        mfr_item = rng.randint(1000, 9999999) if rng.random() < 0.3 else f'{rng.choice("ABCDKMX")}{rng.randint(0, 999999):06d}'
+        yield [
+            f'{i % 26 + 10:X}{i:07d}-{rng.choice("ABC")}',
+            ' '.join(desc),
+            rng.choice(DIVISIONS) if rng.random() < 0.95 else None,
+            rng.choice(SALES_STATUSES),
+            rng.choices(manufacturers, cum_weights=mfr_weights)[0] if rng.random() < 0.97 else None,
+            mfr_item,
+            rng.choice(sub_items) if rng.random() < 0.3 else None,
+            rng.choice(managers) if rng.random() < 0.9 else None,
+            group,
+            group_desc,
+        ]
+
+
+def write_csv(path, rows):
+    """Write rows (header first) as a UTF-8 CSV file."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        for row in rows:
+            writer.writerow(['' if v is None else v for v in row])
+
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>')
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>')
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="DART" sheetId="1" r:id="rId1"/></sheets></workbook>')
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>'
+    '<Relationship Id="rId3" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>')
+# Style 1 is a date format and style 2 a duration ([h]:mm:ss); cells given
+# as ('date', serial) or ('duration', serial) use them
+STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+    '<borders count="1"><border/></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="46" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>')
+SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def column_letter(idx):
+    """0-based column index -> spreadsheet column letters."""
+    letters = ''
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def write_xlsx(path, rows):
+    """
+    Write rows (header first) as a one-sheet DART workbook the way Excel lays it out.
+
+    Strings go to the shared string table and empty cells are left out.
+    A value given as ('date', serial) or ('duration', serial) is written as a
+    number in that format.
+    """
+    strings = {}
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        with zf.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(SHEET_HEAD.encode())
+            for r, row in enumerate(rows, 1):
+                cells = []
+                for c, value in enumerate(row):
+                    ref = f'{column_letter(c)}{r}'
+                    if value is None:
+                        continue
+                    if isinstance(value, tuple):
+                        style = 2 if value[0] == 'duration' else 1
+                        cells.append(f'<c r="{ref}" s="{style}"><v>{value[1]}</v></c>')
+                    elif isinstance(value, str):
+                        sid = strings.setdefault(value, len(strings))
+                        cells.append(f'<c r="{ref}" t="s"><v>{sid}</v></c>')
+                    else:
+                        cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+                sheet.write(f'<row r="{r}">{"".join(cells)}</row>'.encode())
+            sheet.write(SHEET_TAIL.encode())
+        shared = ''.join(f'<si><t xml:space="preserve">{escape(s)}</t></si>' for s in strings)
+        zf.writestr('xl/sharedStrings.xml',
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                    '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                    f'count="{len(strings)}" uniqueCount="{len(strings)}">{shared}</sst>')
+        zf.writestr('[Content_Types].xml', CONTENT_TYPES)
+        zf.writestr('_rels/.rels', ROOT_RELS)
+        zf.writestr('xl/workbook.xml', WORKBOOK)
+        zf.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+        zf.writestr('xl/styles.xml', STYLES)
@@ -0,0 +1,128 @@
+"""
+Latency of typo-tolerant searches (fuzzy=true), one request per keystroke.
+
+Loads a synthetic catalog (500,000 rows by default, see catalog.py) like an
+upload, then types mistyped description words and item numbers into /search
+one character at a time from the FUZZY_MIN_LENGTH-th on, as a
+search-as-you-type box would, with the query result cache off so every
+request does the full work. Prints p50/p99 latency of those requests and of
+SearchIndex.expand alone, and how often the intended word was among the
+similar tokens searched. The exit status is 1 if a latency target is missed.
+
+Usage:
+    python benchmarks/fuzzy_search.py                        # 500,000 rows
+    python benchmarks/fuzzy_search.py --rows 100000 --words 50
+    python benchmarks/fuzzy_search.py --p50-ms 20 --p99-ms 100
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from suite import catalog_file, latency_stats  # noqa: E402
+
+
+def mistype(word, rng):
+    """word with one typo: a character left out, added, changed, or two neighbours swapped."""
+    i = rng.randrange(len(word) - 1)
+    kind = rng.randrange(4)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + rng.choice(string.ascii_lowercase) + word[i:]
+    if kind == 2:
+        return word[:i] + rng.choice(string.ascii_lowercase.replace(word[i], '')) + word[i + 1:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:] if word[i] != word[i + 1] else word[:i] + word[i + 1:]
+
+
+def typed_words(app, store, index, n, rng):
+    """(intended word, mistyped word, other keywords typed before it) for n random rows."""
+    words = []
+    while len(words) < n:
+        row = store.row(rng.randrange(len(store)))
+        if rng.random() < 0.3:
+            intended, before = row[0].casefold(), ''
+        else:
+            tokens = [t.strip(string.punctuation) for t in row[1].casefold().split()]
+            tokens = [t for t in tokens if len(t) > app.FUZZY_MIN_LENGTH and t.isalpha()]
+            if not tokens:
+                continue
+            intended = rng.choice(tokens)
+            before = rng.choice(tokens) if rng.random() < 0.5 and len(tokens) > 1 else ''
+        typo = mistype(intended, rng)
+        if app.search_rows(typo, store, index):
+            # still found as it is: not a miss to recover from
+            continue
+        words.append((intended, typo, before))
+    return words
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500000, help='rows in the generated catalog')
+    parser.add_argument('--words', type=int, default=100, help='mistyped words typed')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'dart_benchmarks'),
+                        help='where generated catalogs are kept between runs')
+    parser.add_argument('--p50-ms', type=float, default=25.0, help='target median per-keystroke latency')
+    parser.add_argument('--p99-ms', type=float, default=100.0, help='target 99th percentile per-keystroke latency')
+    args = parser.parse_args()
+
+    # A private dataset without result cache, so every keystroke searches
+    os.environ['DART_LOAD_SNAPSHOT'] = '0'
+    os.environ['DART_SHARED_DATASET'] = '0'
+    os.environ['DART_RESULT_CACHE_SIZE'] = '0'
+    import logging
+    logging.disable(logging.INFO)
+    import app
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    path = catalog_file(args.data_dir, args.rows, 'csv', args.seed)
+    builder = app.DatasetBuilder()
+    start = time.perf_counter()
+    store, error = app.parse_csv_file(path, builder)
+    if error:
+        raise SystemExit(f'{path}: {error}')
+    print(f'Loaded {len(store)} rows in {time.perf_counter() - start:.1f}s')
+    facet_index = app.build_facet_index(store)
+    app._publish_dataset(app.DEFAULT_DATASET, store=store, filename=os.path.basename(path),
+                         filters=app._compute_filters(facet_index), search_index=builder.search_index,
+                         facet_index=facet_index)
+    client = app.app.test_client()
+
+    rng = random.Random(args.seed)
+    keystrokes, expand_times, recovered = [], [], 0
+    for intended, typo, before in typed_words(app, store, builder.search_index, args.words, rng):
+        for end in range(app.FUZZY_MIN_LENGTH, len(typo) + 1):
+            keywords = f'{before} {typo[:end]}'.strip()
+            start = time.perf_counter()
+            response = client.post('/search', json={'keywords': keywords, 'fuzzy': True, 'limit': 200})
+            keystrokes.append(time.perf_counter() - start)
+            data = response.get_json()
+        start = time.perf_counter()
+        builder.search_index.expand(keywords.split())
+        expand_times.append(time.perf_counter() - start)
+        recovered += intended in data['expanded'].get(typo, ())
+
+    stats = latency_stats(keystrokes)
+    print(f"/search per keystroke: {stats['calls']} requests, p50 {stats['p50_ms']}ms, p99 {stats['p99_ms']}ms, "
+          f"max {stats['max_ms']}ms")
+    expand = latency_stats(expand_times)
+    print(f"SearchIndex.expand: p50 {expand['p50_ms']}ms, p99 {expand['p99_ms']}ms")
+    print(f'intended word among the similar tokens: {recovered}/{args.words}')
+    missed = [f'{name} {stats[key]}ms > {target}ms' for name, key, target in
+              (('p50', 'p50_ms', args.p50_ms), ('p99', 'p99_ms', args.p99_ms)) if stats[key] > target]
+    if missed:
+        print('Latency target missed: ' + ', '.join(missed))
+        sys.exit(1)
+    print('Latency targets met')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""
+Latency of /search under mixed load: uploads and exports running beside it.
+
+Starts the app in a server process (Werkzeug's threaded server, or gunicorn
+with gunicorn.conf.py), uploads a synthetic catalog (see catalog.py) and
+sends searches from several client threads at a steady rate: on their
+own, while a second catalog is uploaded over and over, and while exports
+are requested by several clients at once as well. The query result cache
+is off, so every search does the full work. Each server configuration is
+measured in turn: by default the earlier behaviour (uploads parsed on a
+thread of the server process, exports unlimited) against the current one.
+Prints p50/p99 search latency per configuration and load, and how many
+uploads and exports went through or were turned away with a 503.
+
+Usage:
+    python benchmarks/load_test.py                       # 200,000 rows, 20s per load and configuration
+    python benchmarks/load_test.py --rows 100000 --seconds 10
+    python benchmarks/load_test.py --server gunicorn --configs default
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import catalog_rows  # noqa: E402
+from suite import ROOT, catalog_file, latency_stats  # noqa: E402
+
+# Server environment per configuration (on top of a private upload folder)
+CONFIGS = {
+    'in-thread': {'DART_UPLOAD_PROCESS': '0', 'DART_EXPORT_CONCURRENCY': '0'},
+    'default': {},
+}
+SERVERS = {
+    'werkzeug': [sys.executable, '-c', 'import sys, app; from werkzeug.serving import run_simple; '
+                                       'run_simple("127.0.0.1", int(sys.argv[1]), app.app, threaded=True)'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app', '--bind'],
+}
+# Loads searches are measured under: (name, with exports)
+LOADS = (('alone', False), ('uploads', False), ('uploads+exports', True))
+EXPORT_BODY = {'keywords': '', 'filters': {'sales_status': ['Active']}, 'format': 'csv'}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def request(port, method, path, body=None, headers=None, timeout=300):
+    """(status, response headers, body bytes) of one request on a new connection."""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        if isinstance(body, dict):
+            body, headers = json.dumps(body), {'Content-Type': 'application/json'}
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+def upload(port, path):
+    """Upload a catalog file (replacing the dataset) and wait for it to load; returns the status."""
+    boundary = uuid.uuid4().hex
+    with open(path, 'rb') as f:
+        content = f.read()
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{os.path.basename(path)}"\r\n'
+            f'Content-Type: text/csv\r\n\r\n').encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    status, _, _ = request(port, 'POST', '/upload?wait=1', body,
+                           {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    return status
+
+
+def search_queries(seed, n, rng):
+    """Keyword queries drawn from the first rows of a catalog: words, word prefixes and item number prefixes."""
+    # the first rows of a catalog do not depend on its size
+    rows = list(catalog_rows(20000, seed))[1:]
+    queries = []
+    for _ in range(n):
+        row = rng.choice(rows)
+        if rng.random() < 0.1:
+            queries.append(row[0][:rng.randint(4, 8)])
+            continue
+        words = row[1].split()
+        picked = rng.sample(words, min(len(words), rng.randint(1, 3)))
+        picked[-1] = picked[-1][:rng.randint(2, max(2, len(picked[-1])))]
+        queries.append(' '.join(picked))
+    return queries
+
+
+class Load:
+    """Background uploads and exports against a server, counted by outcome."""
+
+    def __init__(self, port, upload_paths, export_clients):
+        self.port = port
+        self.upload_paths = upload_paths
+        self.export_clients = export_clients
+        self.stop = threading.Event()
+        self.counts = {'uploads': 0, 'exports': 0, 'exports_503': 0}
+        self.rejections = []
+        self.threads = [threading.Thread(target=self._uploads)]
+        self.threads += [threading.Thread(target=self._exports) for _ in range(export_clients)]
+
+    def _uploads(self):
+        i = 0
+        while not self.stop.is_set():
+            if upload(self.port, self.upload_paths[i % len(self.upload_paths)]) == 200:
+                self.counts['uploads'] += 1
+            i += 1
+
+    def _exports(self):
+        while not self.stop.is_set():
+            start = time.perf_counter()
+            status, headers, _ = request(self.port, 'POST', '/export', EXPORT_BODY)
+            if status == 503:
+                self.counts['exports_503'] += 1
+                self.rejections.append(time.perf_counter() - start)
+                self.stop.wait(float(headers.get('Retry-After', 1)) / 5)
+            elif status == 200:
+                self.counts['exports'] += 1
+
+    def __enter__(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        for thread in self.threads:
+            thread.join()
+
+
+def run_searches(port, queries, clients, rate, seconds):
+    """Per-request /search latencies of clients threads, each sending rate requests per second."""
+    samples = []
+    deadline = time.perf_counter() + seconds
+
+    def client(k):
+        rng = random.Random(k)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            request(port, 'POST', '/search', {'keywords': rng.choice(queries), 'limit': 50})
+            elapsed = time.perf_counter() - start
+            samples.append(elapsed)
+            time.sleep(max(0.0, 1 / rate - elapsed) * rng.uniform(0.5, 1.5))
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def measure(config, args, paths, queries):
+    """Search latency alone and under load for one server configuration."""
+    port = free_port()
+    env = dict(os.environ, DART_UPLOAD_FOLDER=tempfile.mkdtemp(prefix='dart_load_'), DART_LOAD_SNAPSHOT='0',
+               DART_RESULT_CACHE_SIZE='0', **CONFIGS[config])
+    log = open(os.path.join(env['DART_UPLOAD_FOLDER'], 'server.log'), 'w')
+    command = SERVERS[args.server] + [str(port) if args.server == 'werkzeug' else f'127.0.0.1:{port}']
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        for _ in range(300):
+            try:
+                request(port, 'GET', '/datasets', timeout=1)
+                break
+            except OSError:
+                time.sleep(0.1)
+        if upload(port, paths[0]) != 200:
+            raise SystemExit(f'{config}: upload of {paths[0]} failed (see {log.name})')
+        result = {}
+        for load_name, export_clients in LOADS:
+            if load_name == 'alone':
+                samples = run_searches(port, queries, args.clients, args.rate, args.seconds)
+                result[load_name] = latency_stats(samples)
+                continue
+            with Load(port, paths[::-1], export_clients and args.export_clients) as load:
+                samples = run_searches(port, queries, args.clients, args.rate, args.seconds)
+            result[load_name] = dict(latency_stats(samples), **load.counts)
+            if load.rejections:
+                result[load_name]['export_503_p50_ms'] = latency_stats(load.rejections)['p50_ms']
+        return result
+    finally:
+        server.terminate()
+        server.wait()
+        log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000, help='rows in the generated catalogs')
+    parser.add_argument('--seconds', type=float, default=20.0, help='duration of each load')
+    parser.add_argument('--clients', type=int, default=4, help='search clients')
+    parser.add_argument('--rate', type=float, default=5.0, help='searches per second per client')
+    parser.add_argument('--export-clients', type=int, default=4, help='clients requesting exports under load')
+    parser.add_argument('--server', choices=sorted(SERVERS), default='werkzeug')
+    parser.add_argument('--configs', default=','.join(CONFIGS),
+                        help=f"server configurations to compare, of: {', '.join(CONFIGS)}")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'dart_benchmarks'),
+                        help='where generated catalogs are kept between runs')
+    parser.add_argument('--out', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    # two catalogs, so every upload under load is parsed rather than reused from its snapshot
+    paths = [catalog_file(args.data_dir, args.rows, 'csv', seed) for seed in (1, 2)]
+    queries = search_queries(1, 500, random.Random(1))
+    results = {}
+    print(f"{'config':<10} {'load':<16} {'p50 ms':>8} {'p99 ms':>8}  background")
+    for config in args.configs.split(','):
+        results[config] = measure(config, args, paths, queries)
+        for load_name, stats in results[config].items():
+            background = ''
+            if 'uploads' in stats:
+                background = f"{stats['uploads']} uploads, {stats['exports']} exports"
+            if stats.get('exports_503'):
+                background += f", {stats['exports_503']} turned away in {stats['export_503_p50_ms']}ms"
+            print(f"{config:<10} {load_name:<16} {stats['p50_ms']:>8} {stats['p99_ms']:>8}  {background}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
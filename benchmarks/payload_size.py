@@ -0,0 +1,83 @@
+"""
+Size and server time of /search responses per result format and content coding.
+
+Loads a synthetic catalog (100,000 rows by default, see catalog.py) like an
+upload and requests result pages of a few searches as row dicts
+(format=rows) and as dictionary-encoded columns (format=columns), each
+uncompressed, gzip encoded and, with the brotli module installed, brotli
+encoded. Prints the bytes sent per page against uncompressed rows and the
+median server time from the Server-Timing header.
+
+Usage:
+    python benchmarks/payload_size.py                        # 100,000 rows, pages of 200 and 5,000
+    python benchmarks/payload_size.py --rows 1000000 --limits 5000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from suite import catalog_file  # noqa: E402
+
+# (keywords, filters) of the searches measured
+SEARCHES = (('steel', {}), ('bolt', {}), ('', {'sales_status': ['Active']}))
+
+
+def server_ms(response):
+    """Total server time of a response, from its Server-Timing header."""
+    timings = dict(part.split(';dur=') for part in response.headers['Server-Timing'].split(', '))
+    return float(timings['total'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000, help='rows in the generated catalog')
+    parser.add_argument('--limits', default='200,5000', help='page sizes requested')
+    parser.add_argument('--repeat', type=int, default=5, help='requests per case (the median time is shown)')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'dart_benchmarks'),
+                        help='where generated catalogs are kept between runs')
+    args = parser.parse_args()
+
+    os.environ['DART_LOAD_SNAPSHOT'] = '0'
+    os.environ['DART_SHARED_DATASET'] = '0'
+    import logging
+    logging.disable(logging.INFO)
+    import app
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    path = catalog_file(args.data_dir, args.rows, 'csv', 1)
+    builder = app.DatasetBuilder()
+    store, error = app.parse_csv_file(path, builder)
+    if error:
+        raise SystemExit(f'{path}: {error}')
+    facet_index = app.build_facet_index(store)
+    app._publish_dataset(app.DEFAULT_DATASET, store=store, filename=os.path.basename(path),
+                         filters=app._compute_filters(facet_index), search_index=builder.search_index,
+                         facet_index=facet_index)
+    client = app.app.test_client()
+    encodings = ['identity', 'gzip'] + (['br'] if app.brotli is not None else [])
+
+    print(f"{'search':<22} {'limit':>5} {'format':<8} {'encoding':<9} {'bytes':>10} {'smaller':>8} {'server ms':>10}")
+    for keywords, filters in SEARCHES:
+        name = keywords or ','.join(f'{k}={v[0]}' for k, v in filters.items())
+        for limit in map(int, args.limits.split(',')):
+            baseline = None
+            for result_format in app.SEARCH_FORMATS:
+                for encoding in encodings:
+                    body = {'keywords': keywords, 'filters': filters, 'limit': limit, 'format': result_format}
+                    times = []
+                    for _ in range(args.repeat):
+                        response = client.post('/search', json=body, headers={'Accept-Encoding': encoding})
+                        times.append(server_ms(response))
+                    size = len(response.get_data())
+                    baseline = baseline or size
+                    print(f'{name:<22} {limit:>5} {result_format:<8} {encoding:<9} {size:>10} '
+                          f'{baseline / size:>7.1f}x {statistics.median(times):>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+"""
+Benchmark parsing, indexing, filtering, search and export on synthetic DART catalogs.
+
+For each catalog size the suite generates (or reuses) a CSV and an XLSX
+catalog (see catalog.py) and runs every size/format case in a fresh
+process, so peak RSS is measured per case. It times parse_csv_file /
+parse_excel_file, build_facet_index, _compute_filters, _apply_filters
+(with NumPy installed, also its posting-list engine as
+_apply_filters_postings), search_rows and /export (xlsx, csv and
+csv.gz), and writes the results as JSON: throughput, p50/p99 latency and peak RSS per benchmark. Queries and
+exports run in the first format's case (CSV by default); the store they
+search is the same either way. The query result cache is disabled, so
+every query does the full work.
+
+Usage:
+    python benchmarks/suite.py                              # 10k, 100k and 1M rows, CSV and XLSX
+    python benchmarks/suite.py --sizes 10000,100000 --formats csv --out results.json
+    python benchmarks/suite.py --out after.json --compare before.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from catalog import catalog_rows, write_csv, write_xlsx  # noqa: E402
+
+DEFAULT_SIZES = '10000,100000,1000000'
+# Bump when catalog_rows() changes, so cached catalogs are regenerated
+CATALOG_VERSION = 1
+EXPORT_FORMATS = ('xlsx', 'csv', 'csv.gz')
+# Main metric per benchmark, compared by --compare (lower is better)
+COMPARED_METRICS = ('seconds', 'p50_ms', 'p99_ms', 'peak_rss_mb')
+
+
+def reset_peak_rss():
+    """Restart peak RSS tracking for this process, where the OS supports it (Linux)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (since the last reset_peak_rss, on Linux)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def latency_stats(samples, items=None):
+    """p50/p99/mean/max latency (ms) and throughput for per-call durations in seconds."""
+    ordered = sorted(samples)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))] * 1000, 3)
+
+    total = sum(ordered)
+    stats = {
+        'calls': len(ordered),
+        'p50_ms': pct(50),
+        'p99_ms': pct(99),
+        'mean_ms': round(total / len(ordered) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+        'calls_per_s': round(len(ordered) / total, 1) if total else None,
+    }
+    if items is not None:
+        stats['rows_per_s'] = round(items / total) if total else None
+    return stats
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def search_queries(store, n, rng):
+    """Keyword queries drawn from the catalog: words, word prefixes, item number prefixes and misses."""
+    queries = []
+    for _ in range(n):
+        row = store.row(rng.randrange(len(store)))
+        words = row[1].split()
+        kind = rng.random()
+        if kind < 0.1:
+            queries.append(row[0][:rng.randint(4, 8)])
+        elif kind < 0.15:
+            queries.append(f'zq{rng.randint(0, 10 ** 6)}')
+        else:
+            picked = rng.sample(words, min(len(words), rng.randint(1, 3)))
+            if kind < 0.5:
+                # a word being typed
+                picked[-1] = picked[-1][:rng.randint(2, max(2, len(picked[-1])))]
+            queries.append(' '.join(picked))
+    return queries
+
+
+def filter_queries(app, store, facet_index, n, rng):
+    """Filter selections of 1-3 facets with 1-3 values each, taken from real rows."""
+    fields = list(app.FILTER_FIELDS.items())
+    queries = []
+    for _ in range(n):
+        filters = {}
+        for name, field in rng.sample(fields, rng.randint(1, 3)):
+            keys = {store.columns[field].key(rng.randrange(len(store))) for _ in range(rng.randint(1, 3))}
+            filters[name] = [k or app.BLANK_LABEL for k in keys]
+        queries.append(filters)
+    return queries
+
+
+def run_case(path, n_queries, seed, full):
+    """Benchmarks for one catalog file; returns {benchmark: stats}."""
+    # A private dataset: no snapshot loading or sharing, no result cache
+    os.environ['DART_LOAD_SNAPSHOT'] = '0'
+    os.environ['DART_SHARED_DATASET'] = '0'
+    os.environ['DART_RESULT_CACHE_SIZE'] = '0'
+    import logging
+    logging.disable(logging.INFO)
+    import app
+
+    results = {}
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    builder = app.DatasetBuilder()
+    reset_peak_rss()
+    if path.endswith('.csv'):
+        (store, error), seconds = timed(app.parse_csv_file, path, builder)
+        name = 'parse_csv_file'
+    else:
+        (store, error), seconds = timed(app.parse_excel_file, path, builder)
+        name = 'parse_excel_file'
+    if error:
+        raise SystemExit(f'{path}: {error}')
+    results[name] = {'seconds': round(seconds, 3), 'rows': len(store), 'file_mb': round(size_mb, 1),
+                     'rows_per_s': round(len(store) / seconds), 'mb_per_s': round(size_mb / seconds, 2),
+                     'peak_rss_mb': peak_rss_mb()}
+    search_index = builder.search_index
+
+    reset_peak_rss()
+    facet_index, seconds = timed(app.build_facet_index, store)
+    results['build_facet_index'] = {'seconds': round(seconds, 3), 'rows_per_s': round(len(store) / seconds),
+                                    'peak_rss_mb': peak_rss_mb()}
+    filters, _ = timed(app._compute_filters, facet_index)
+    results['_compute_filters'] = latency_stats([timed(app._compute_filters, facet_index)[1] for _ in range(20)])
+    if not full:
+        return results
+
+    rng = random.Random(seed)
+    filter_set = filter_queries(app, store, facet_index, n_queries, rng)
+    # With NumPy, the posting-list engine runs too for comparison
+    engines = {'_apply_filters': app.VECTORIZED_FILTERS}
+    if app.VECTORIZED_FILTERS:
+        engines['_apply_filters_postings'] = False
+    matches = {}
+    for name, vectorized in engines.items():
+        app.VECTORIZED_FILTERS = vectorized
+        reset_peak_rss()
+        samples, matches[name] = [], []
+        for filters_query in filter_set:
+            ids, seconds = timed(app._apply_filters, store, filters_query, None, facet_index)
+            samples.append(seconds)
+            matches[name].append(list(ids))
+        results[name] = dict(latency_stats(samples), engine='numpy' if vectorized else 'postings',
+                             mean_matches=round(sum(map(len, matches[name])) / len(samples)),
+                             peak_rss_mb=peak_rss_mb())
+    app.VECTORIZED_FILTERS = engines['_apply_filters']
+    if len(matches) > 1 and matches['_apply_filters'] != matches['_apply_filters_postings']:
+        raise SystemExit(f'{path}: the filter engines returned different rows')
+
+    reset_peak_rss()
+    samples, matched = [], 0
+    for keywords in search_queries(store, n_queries, rng):
+        ids, seconds = timed(app.search_rows, keywords, store, search_index)
+        samples.append(seconds)
+        matched += len(ids)
+    results['search_rows'] = dict(latency_stats(samples), mean_matches=round(matched / len(samples)),
+                                  peak_rss_mb=peak_rss_mb())
+
+    # /export through the Flask app: a broad filter, a keyword search and a narrow combination
+    app._publish_dataset(app.DEFAULT_DATASET, store=store, filename=os.path.basename(path), filters=filters,
+                         search_index=search_index, facet_index=facet_index)
+    client = app.app.test_client()
+    exports = [{'keywords': '', 'filters': {'sales_status': 'Active'}},
+               {'keywords': search_queries(store, 1, rng)[0], 'filters': {}},
+               {'keywords': '', 'filters': filter_queries(app, store, facet_index, 1, rng)[0]}]
+    for export_format in EXPORT_FORMATS:
+        reset_peak_rss()
+        samples, rows, size = [], 0, 0
+        for body in exports:
+            start = time.perf_counter()
+            response = client.post('/export', json=dict(body, format=export_format))
+            size += sum(len(chunk) for chunk in response.response)
+            response.close()
+            samples.append(time.perf_counter() - start)
+            rows += int(response.headers.get('X-Export-Rows', 0))
+        results[f'export_{export_format}'] = dict(latency_stats(samples, items=rows), rows=rows,
+                                                  mb=round(size / (1024 * 1024), 2), peak_rss_mb=peak_rss_mb())
+    return results
+
+
+def catalog_file(data_dir, rows, fmt, seed):
+    """Path of a generated catalog, generating it on first use."""
+    path = os.path.join(data_dir, f'dart_v{CATALOG_VERSION}_{rows}_{seed}.{fmt}')
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        tmp_path = path + '.part'
+        (write_csv if fmt == 'csv' else write_xlsx)(tmp_path, catalog_rows(rows, seed))
+        os.replace(tmp_path, path)
+        print(f'Generated {path} in {time.perf_counter() - start:.1f}s', file=sys.stderr)
+    return path
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print metric changes against a baseline run; returns the number of regressions."""
+    before = {(c['rows'], c['format'], name): stats
+              for c in baseline['cases'] for name, stats in c['benchmarks'].items()}
+    regressions = 0
+    for case in results['cases']:
+        for name, stats in case['benchmarks'].items():
+            old = before.get((case['rows'], case['format'], name))
+            if not old:
+                continue
+            for metric in COMPARED_METRICS:
+                if not old.get(metric) or stats.get(metric) is None:
+                    continue
+                change = (stats[metric] - old[metric]) / old[metric] * 100
+                flag = ''
+                if change > threshold:
+                    flag = '  REGRESSION'
+                    regressions += 1
+                print(f"{case['rows']:>8} {case['format']:<5} {name:<20} {metric:<12} "
+                      f"{old[metric]:>10} -> {stats[metric]:>10} ({change:+.1f}%){flag}", file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'comma-separated row counts (default {DEFAULT_SIZES})')
+    parser.add_argument('--formats', default='csv,xlsx', help='catalog formats to parse (default csv,xlsx)')
+    parser.add_argument('--queries', type=int, default=200, help='search and filter queries per case')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'dart_benchmarks'),
+                        help='where generated catalogs are kept between runs')
+    parser.add_argument('--out', help='write the JSON results here (default: stdout)')
+    parser.add_argument('--compare', help='earlier JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='with --compare, percent slowdown reported as a regression (exit status 1)')
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    parser.add_argument('--full', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        # child process: one catalog file, results as JSON on stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            results = run_case(args.case, args.queries, args.seed, args.full)
+        json.dump(results, sys.stdout)
+        return
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    formats = [f.strip() for f in args.formats.split(',') if f.strip()]
+    results = {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'queries': args.queries,
+            'seed': args.seed,
+        },
+        'cases': [],
+    }
+    for rows in (int(s) for s in args.sizes.split(',')):
+        for i, fmt in enumerate(formats):
+            path = catalog_file(args.data_dir, rows, fmt, args.seed)
+            cmd = [sys.executable, os.path.abspath(__file__), '--case', path,
+                   '--queries', str(args.queries), '--seed', str(args.seed)]
+            if i == 0:
+                cmd.append('--full')
+            print(f'Running {rows} rows, {fmt}...', file=sys.stderr)
+            child = subprocess.run(cmd, stdout=subprocess.PIPE, check=True)
+            benchmarks = json.loads(child.stdout)
+            results['cases'].append({'rows': rows, 'format': fmt, 'benchmarks': benchmarks})
+            for name, stats in benchmarks.items():
+                summary = ', '.join(f'{k}={v}' for k, v in stats.items()
+                                    if k in ('seconds', 'rows_per_s', 'p50_ms', 'p99_ms', 'peak_rss_mb'))
+                print(f'  {name}: {summary}', file=sys.stderr)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
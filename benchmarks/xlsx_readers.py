@@ -0,0 +1,99 @@
+"""
+Compare the streaming .xlsx reader with the openpyxl reader.
+
+Both readers parse the same workbook through parse_excel_file(); the script
+prints the time each one takes and checks that they load identical rows.
+
+Usage:
+    python benchmarks/xlsx_readers.py                   # synthetic 100,000-row workbook
+    python benchmarks/xlsx_readers.py --rows 500000 --extra-columns 30
+    python benchmarks/xlsx_readers.py --file path/to/DART.xlsx
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+from catalog import HEADERS, write_xlsx  # noqa: E402
+
+WORDS = ['steel', 'hex', 'bolt', 'nut', 'washer', 'stainless', 'glove', 'nitrile', 'sterile',
+         'gauze', 'pad', 'tape', 'latex', 'free', 'small', 'large', 'syringe', 'needle',
+         'catheter', 'foley', 'kit', 'tray', 'Blue', 'RED', 'Straße']
+MANUFACTURERS = ['Acme', ' Medline ', 'Cardinal', '', 'BD', '3M', 'Ethicon']
+
+
+def sample_rows(n_rows, extra_columns, seed=1):
+    """Synthetic DART rows; None marks an empty cell."""
+    rng = random.Random(seed)
+    yield HEADERS + [f'Extra {i + 1}' for i in range(extra_columns)]
+    for i in range(n_rows):
+        desc = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 6)))
+        mfr_item = rng.randint(1000, 99999) if rng.random() < 0.5 else f'M-{rng.randint(0, 99999)}'
+        if rng.random() < 0.01:
+            # a stray duration-formatted cell, read as a time like openpyxl does
+            mfr_item = ('duration', round(rng.random() * 2, 4))
+        row = [f'A{i:07d}', desc, rng.choice(['DIV1', 'DIV2', ' DIV3', None]),
+               rng.choice([None, 'Active', 'Obsolete', '(blank)']), rng.choice(MANUFACTURERS) or None,
+               mfr_item, rng.choice([None, 'S1', 'S2']), rng.choice(['PM A', 'PM B', None]),
+               rng.choice(['MG1', 'MG2', None]), rng.choice(['Group one', 'Group two', None])]
+        for j in range(extra_columns):
+            kind = j % 3
+            if kind == 0:
+                row.append(round(rng.random() * 1000, 2))
+            elif kind == 1:
+                row.append(f'note {rng.randint(0, 5000)}')
+            else:
+                row.append(('date', 40000 + rng.randint(0, 5000)))
+        yield row
+
+
+def write_sample_xlsx(path, n_rows, extra_columns=0, seed=1):
+    """Write a synthetic DART workbook (shared strings, sparse rows) the way Excel lays it out."""
+    write_xlsx(path, sample_rows(n_rows, extra_columns, seed))
+
+
+def time_reader(path, reader):
+    start = time.perf_counter()
+    store, error = app.parse_excel_file(path, reader=reader)
+    elapsed = time.perf_counter() - start
+    if error:
+        raise SystemExit(f'{reader} reader failed: {error}')
+    return store, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--file', help='existing .xlsx file to read (default: generate one)')
+    parser.add_argument('--rows', type=int, default=100000, help='rows in the generated workbook')
+    parser.add_argument('--extra-columns', type=int, default=20,
+                        help='unmapped columns in the generated workbook')
+    args = parser.parse_args()
+
+    path = args.file
+    if not path:
+        path = os.path.join(tempfile.mkdtemp(), 'dart_benchmark.xlsx')
+        start = time.perf_counter()
+        write_sample_xlsx(path, args.rows, args.extra_columns)
+        print(f'Generated {path} ({args.rows} rows, {args.extra_columns} extra columns, '
+              f'{os.path.getsize(path) / (1024 * 1024):.1f}MB) in {time.perf_counter() - start:.1f}s')
+
+    results = {reader: time_reader(path, reader) for reader in ('stream', 'openpyxl')}
+    for reader, (store, elapsed) in results.items():
+        print(f'{reader:>8}: {elapsed:7.2f}s  {len(store) / elapsed:10.0f} rows/s  ({len(store)} rows)')
+    stream_store, openpyxl_store = results['stream'][0], results['openpyxl'][0]
+    identical = (len(stream_store) == len(openpyxl_store) and
+                 all(stream_store.row(i) == openpyxl_store.row(i) for i in range(len(stream_store))))
+    print(f"speedup: {results['openpyxl'][1] / results['stream'][1]:.1f}x, "
+          f"rows identical: {'yes' if identical else 'NO'}")
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,14 @@
+"""
+Gunicorn settings, read by `gunicorn app:app` started from this folder.
+
+Threaded (gthread) workers serve several requests at once each, so a long
+/export or /upload occupies one thread instead of a whole worker and
+searches keep being answered beside it. The workers share each dataset
+through its memory-mapped snapshot (see _sync_shared_dataset in app.py).
+"""
+
+import os
+
+worker_class = 'gthread'
+workers = int(os.environ.get('DART_WORKERS', '2'))
+threads = int(os.environ.get('DART_THREADS', '8'))
@@ -5,10 +5,16 @@ const uploadStatus = document.getElementById('uploadStatus');
 const fileInfo = document.getElementById('fileInfo');
 const fileName = document.getElementById('fileName');
 const rowCount = document.getElementById('rowCount');
+const datasetInput = document.getElementById('datasetName');
+const datasetOptions = document.getElementById('datasetOptions');
+const datasetLabel = document.getElementById('datasetLabel');
 
 const searchInput = document.getElementById('searchInput');
 const searchBtn = document.getElementById('searchBtn');
 const exportBtn = document.getElementById('exportBtn');
+const exportFormat = document.getElementById('exportFormat');
+const searchSort = document.getElementById('searchSort');
+const fuzzySearch = document.getElementById('fuzzySearch');
 const clearSearchBtn = document.getElementById('clearSearchBtn');
 const clearUploadBtn = document.getElementById('clearUploadBtn');
 const searchStatus = document.getElementById('searchStatus');
@@ -30,6 +36,11 @@ const materialGroupSearch = document.getElementById('materialGroupSearch');
 const materialGroupDescSearch = document.getElementById('materialGroupDescSearch');
 
 let isFileLoaded = false;
+// number of result rows fetched per /search page
+const SEARCH_PAGE_SIZE = 200;
+// paging state of the current search (keywords/filters are frozen at search time)
+let searchPaging = null;
+let pageObserver = null;
 // store full options (from uploaded dataset) and current options (based on current search results)
 const fullFilterOptions = {
     manufacturers: [],
@@ -46,12 +57,54 @@ const currentFilterOptions = {
     sub_items: []
 };
 
+// result counts per option of the current search ({ manufacturers: { 'Acme': 124 }, ... }); empty when not searched
+let currentFilterCounts = {};
+
 // include material group options
 fullFilterOptions.material_groups = [];
 fullFilterOptions.material_group_descs = [];
 currentFilterOptions.material_groups = [];
 currentFilterOptions.material_group_descs = [];
 
+// Dataset (catalog) that uploads go to and searches run on; several can be loaded at once
+function currentDataset() {
+    return (datasetInput?.value || '').trim() || 'default';
+}
+
+// Show the selected dataset's file (if loaded) and filters, and list the known datasets
+async function selectDataset() {
+    stopPaging();
+    resultsContainer.innerHTML = '<p class="placeholder-text">Upload a file and search to see results here</p>';
+    try {
+        const res = await fetchGetWithRetries('/datasets');
+        const data = await res.json();
+        const datasets = data.datasets || [];
+        if (datasetOptions) {
+            datasetOptions.innerHTML = '';
+            datasets.forEach(d => {
+                const opt = document.createElement('option');
+                opt.value = d.dataset;
+                datasetOptions.appendChild(opt);
+            });
+        }
+        const selected = datasets.find(d => d.dataset === currentDataset() && d.state !== 'empty');
+        isFileLoaded = Boolean(selected);
+        fileInfo.style.display = isFileLoaded ? 'block' : 'none';
+        if (isFileLoaded) {
+            fileName.textContent = selected.filename || '';
+            rowCount.textContent = selected.rows != null ? selected.rows.toLocaleString() : '';
+            if (datasetLabel) datasetLabel.textContent = currentDataset();
+            resultsContainer.innerHTML = '<p class="placeholder-text">Ready to search. Enter keywords above.</p>';
+            fetchFilters();
+        }
+    } catch (err) {
+        console.error('Failed to list datasets', err);
+    }
+}
+
+datasetInput?.addEventListener('change', selectDataset);
+document.addEventListener('DOMContentLoaded', selectDataset);
+
 // File Upload Handler
 uploadBtn.addEventListener('click', uploadFile);
 fileInput.addEventListener('change', (e) => {
@@ -80,6 +133,8 @@ async function uploadFile() {
     uploadBtn.textContent = 'Uploading...';
 
     const formData = new FormData();
+    formData.append('dataset', currentDataset());
+    formData.append('mode', document.getElementById('uploadMode').value);
     formData.append('file', file);
 
     // Use XMLHttpRequest to report upload progress
@@ -132,8 +187,6 @@ async function uploadFile() {
 
         xhr.onreadystatechange = async function () {
             if (xhr.readyState === 4) {
-                uploadBtn.disabled = false;
-                uploadBtn.textContent = 'Upload File';
                 try {
                     // Prefer structured JSON message, but gracefully fall back to raw text
                     const msgFromResp = await parseResponseMessage(xhr);
@@ -143,11 +196,19 @@ async function uploadFile() {
 
                     const defaultMsg = 'Upload failed. Check Render logs for details.';
 
+                    if (xhr.status >= 200 && xhr.status < 300 && data.success && data.job_id && data.state !== 'done') {
+                        // the file is parsed in the background: follow the job until it finishes
+                        uploadBtn.textContent = 'Processing...';
+                        showStatus(uploadStatus, data.message || 'Processing file...', 'info');
+                        data = await pollUploadJob(data.job_id, progressBar, progressText);
+                    }
+
                     if (xhr.status >= 200 && xhr.status < 300 && data.success) {
                         // success path
                         showStatus(uploadStatus, data.message || msgFromResp || 'File uploaded', 'success');
                         fileName.textContent = file.name;
                         rowCount.textContent = (data.row_count || 0).toLocaleString();
+                        if (datasetLabel) datasetLabel.textContent = data.dataset || currentDataset();
                         fileInfo.style.display = 'block';
                         isFileLoaded = true;
                         resultsContainer.innerHTML = '<p class="placeholder-text">Ready to search. Enter keywords above.</p>';
@@ -167,6 +228,8 @@ async function uploadFile() {
                     isFileLoaded = false;
                     fileInfo.style.display = 'none';
                 }
+                uploadBtn.disabled = false;
+                uploadBtn.textContent = 'Upload File';
                 // hide progress after short delay
                 setTimeout(() => { progressWrap.style.display = 'none'; }, 800);
                 resolve();
@@ -191,6 +254,39 @@ async function uploadFile() {
     });
 }
 
+// Labels shown in the progress bar for each server-side upload phase
+const UPLOAD_PHASE_LABELS = {
+    save: 'Saving',
+    parse: 'Parsing',
+    index: 'Indexing',
+    diff: 'Comparing with loaded data',
+    apply: 'Applying changes',
+    filters: 'Building filters'
+};
+
+// Poll /upload/status/<job_id> until the job is done or failed; resolves with the final status
+async function pollUploadJob(jobId, progressBar, progressText, intervalMs = 500) {
+    while (true) {
+        await new Promise(r => setTimeout(r, intervalMs));
+        let status;
+        try {
+            const res = await fetchGetWithRetries(`/upload/status/${encodeURIComponent(jobId)}`);
+            status = await res.json();
+        } catch (err) {
+            return { success: false, message: err?.message || 'Lost track of the upload job' };
+        }
+        if (!status.success || status.state === 'done' || status.state === 'error') {
+            return status;
+        }
+        const label = status.state === 'queued' ? 'Waiting' : (UPLOAD_PHASE_LABELS[status.phase] || 'Processing');
+        const rows = (status.rows_parsed || 0).toLocaleString();
+        if (status.phase === 'parse' && status.progress != null) {
+            progressBar.value = status.progress;
+        }
+        progressText.textContent = `${label}: ${rows} rows (${Math.round(status.elapsed || 0)}s)`;
+    }
+}
+
 // Helper: parse fetch Response to prefer JSON.message, else raw text
 async function parseFetchResponseMessage(res) {
     try {
@@ -241,6 +337,10 @@ searchInput.addEventListener('keypress', (e) => {
         performSearch();
     }
 });
+// re-run the shown search in the new order, or with/without typos
+[searchSort, fuzzySearch].forEach(control => control?.addEventListener('change', () => {
+    if (resultsContainer.querySelector('.results-table')) performSearch();
+}));
 
 // Export handler
 exportBtn?.addEventListener('click', exportResults);
@@ -252,6 +352,11 @@ async function performSearch() {
     }
     
     const keywords = searchInput.value.trim();
+    const dataset = currentDataset();
+    // 'file' (default) or 'relevance'
+    const sort = searchSort?.value || 'file';
+    // keywords matching nothing are searched as similar words
+    const fuzzy = !!fuzzySearch?.checked;
     // allow searching by filters alone (check multi-select selections)
     // check if any checkbox is selected in the filter lists
     const hasFilters = (manufacturerFilter && manufacturerFilter.querySelectorAll('input[type="checkbox"]:checked').length > 0)
@@ -291,13 +396,14 @@ async function performSearch() {
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({ keywords, filters })
+            body: JSON.stringify({ dataset, keywords, filters, sort, fuzzy, offset: 0, limit: SEARCH_PAGE_SIZE, format: 'columns' })
         }, 30000);
 
         let data = {};
+        stopPaging();
         if (response.ok) {
-            try { data = await response.json(); } catch (e) { data = {}; }
-            if (data.no_match || data.results.length === 0) {
+            try { data = decodeSearchResponse(await response.json()); } catch (e) { data = {}; }
+            if (data.no_match || !data.results || data.results.length === 0) {
                 resultsContainer.innerHTML = `
                     <div class="no-match-message">
                         ❌ No Match Found
@@ -307,10 +413,17 @@ async function performSearch() {
                 // update filters to be empty (no results)
                 updateFiltersFromResults([]);
             } else {
-                displayResults(data.results, keywords);
-                showStatus(searchStatus, `Found ${data.count} result(s)`, 'success');
+                const total = data.total ?? data.count;
+                const highlight = expandedKeywords(keywords, data.expanded);
+                displayResults(data.results, highlight, total);
+                showStatus(searchStatus, `Found ${total} result(s)${describeExpansions(data.expanded)}`, 'success');
                 // update filter options to reflect only values present in search results
-                updateFiltersFromResults(data.results);
+                if (data.result_filters) {
+                    applyCurrentFilterOptions(data.result_filters, data.facet_counts);
+                } else {
+                    updateFiltersFromResults(data.results);
+                }
+                startPaging({ dataset, keywords, filters, sort, fuzzy, highlight, offset: data.results.length, total });
             }
         } else {
             // parse message (JSON or text) and show friendly 502 message when applicable
@@ -355,11 +468,13 @@ async function exportResults() {
         };
 
         const keywords = searchInput.value.trim();
+        // xlsx (default), csv or csv.gz
+        const format = exportFormat?.value || 'xlsx';
 
         const res = await fetchWithTimeout('/export', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ keywords, filters })
+            body: JSON.stringify({ dataset: currentDataset(), keywords, filters, format, sort: searchSort?.value || 'file', fuzzy: !!fuzzySearch?.checked })
         }, 60000);
 
         if (!res.ok) {
@@ -373,7 +488,7 @@ async function exportResults() {
         const blob = await res.blob();
         // try to get filename from header
         const disp = res.headers.get('Content-Disposition') || '';
-        let filename = 'search_results.xlsx';
+        let filename = `search_results.${format}`;
         const fnMatch = /filename\*?=([^;]+)/i.exec(disp);
         if (fnMatch) {
             filename = fnMatch[1].replace(/UTF-8''/, '').replace(/"/g, '').trim();
@@ -402,7 +517,7 @@ async function exportResults() {
 // Fetch filter options from server and populate selects
 async function fetchFilters() {
     try {
-        const res = await fetchGetWithRetries('/filters');
+        const res = await fetchGetWithRetries(`/filters?dataset=${encodeURIComponent(currentDataset())}`);
         let data = {};
         try { data = await res.json(); } catch (e) { data = {}; }
         if (res.ok && data.filters) {
@@ -416,6 +531,7 @@ async function fetchFilters() {
             fullFilterOptions.material_group_descs = data.filters.material_group_descs || [];
 
             // initialize current options to full options
+            currentFilterCounts = {};
             currentFilterOptions.manufacturers = [...fullFilterOptions.manufacturers];
             currentFilterOptions.product_divisions = [...fullFilterOptions.product_divisions];
             currentFilterOptions.sales_statuses = [...fullFilterOptions.sales_statuses];
@@ -497,6 +613,13 @@ function populateCheckboxList(listEl, items, key) {
         span.textContent = val;
         wrapper.appendChild(cb);
         wrapper.appendChild(span);
+        const count = (currentFilterCounts[listEl.dataset.facet] || {})[val];
+        if (count !== undefined) {
+            const countSpan = document.createElement('span');
+            countSpan.className = 'option-count';
+            countSpan.textContent = `(${count})`;
+            wrapper.appendChild(countSpan);
+        }
         listEl.appendChild(wrapper);
     });
 }
@@ -546,6 +669,7 @@ resetFiltersBtn?.addEventListener('click', () => {
     if (materialGroupDescFilter) Array.from(materialGroupDescFilter.querySelectorAll('input[type="checkbox"]')).forEach(cb => cb.checked = false);
     showStatus(searchStatus, 'Filters reset', 'info');
     // reset current options to full options
+    currentFilterCounts = {};
     currentFilterOptions.manufacturers = [...fullFilterOptions.manufacturers];
     currentFilterOptions.product_divisions = [...fullFilterOptions.product_divisions];
     currentFilterOptions.sales_statuses = [...fullFilterOptions.sales_statuses];
@@ -562,29 +686,60 @@ resetFiltersBtn?.addEventListener('click', () => {
     populateCheckboxList(materialGroupDescFilter, currentFilterOptions.material_group_descs, 'material_group_desc');
 });
 
-function displayResults(results, keywords) {
+// Keywords with each one that matched nothing replaced by the similar words searched instead
+function expandedKeywords(keywords, expanded) {
+    if (!expanded) return keywords;
+    return keywords.split(/\s+/).map(word => (expanded[word.toLowerCase()] || [word]).join(' ')).join(' ');
+}
+
+// " (similar words: stainles → stainless)" for a fuzzy search's expanded keywords
+function describeExpansions(expanded) {
+    const parts = Object.entries(expanded || {})
+        .filter(([, words]) => words.length)
+        .map(([word, words]) => `${word} → ${words.join(', ')}`);
+    return parts.length ? ` (similar words: ${parts.join('; ')})` : '';
+}
+
+// Highlight keywords in description
+function highlightText(text, keywords) {
+    if (!text) return text;
+    const searchWords = keywords.toLowerCase().split(' ');
+    let highlightedText = String(text);
+
+    searchWords.forEach(word => {
+        const regex = new RegExp(`(${word})`, 'gi');
+        highlightedText = highlightedText.replace(regex, '<mark>$1</mark>');
+    });
+
+    return highlightedText;
+}
+
+function renderResultRows(results, keywords) {
+    return results.map(row => `
+                    <tr>
+                        <td>${escapeHtml(row.item_no) || '-'}</td>
+                        <td>${highlightText(row.description, keywords)}</td>
+                                <td>${escapeHtml(row.product_division) || '-'}</td>
+                                <td>${escapeHtml(row.material_group) || '-'}</td>
+                                <td>${escapeHtml(row.material_group_desc) || '-'}</td>
+                                <td>${escapeHtml(row.manufacturer_name) || '-'}</td>
+                        <td>${escapeHtml(row.manufacturer_item_no) || '-'}</td>
+                        <td>${escapeHtml(row.sales_status) || '-'}</td>
+                        <td>${escapeHtml(row.product_manager) || '-'}</td>
+                        <td>${escapeHtml(row.sub_item) || '-'}</td>
+                    </tr>
+                `).join('');
+}
+
+function displayResults(results, keywords, total = results.length) {
     if (results.length === 0) {
         resultsContainer.innerHTML = '<p class="placeholder-text">No results found</p>';
         return;
     }
     
-    // Highlight keywords in description
-    const highlightText = (text, keywords) => {
-        if (!text) return text;
-        const searchWords = keywords.toLowerCase().split(' ');
-        let highlightedText = String(text);
-        
-        searchWords.forEach(word => {
-            const regex = new RegExp(`(${word})`, 'gi');
-            highlightedText = highlightedText.replace(regex, '<mark>$1</mark>');
-        });
-        
-        return highlightedText;
-    };
-    
     const html = `
         <div class="result-count">
-            Total Results: <strong>${results.length}</strong>
+            Total Results: <strong>${total}</strong>
         </div>
         <table class="results-table">
             <thead>
@@ -602,27 +757,89 @@ function displayResults(results, keywords) {
                 </tr>
             </thead>
             <tbody>
-                ${results.map(row => `
-                    <tr>
-                        <td>${escapeHtml(row.item_no) || '-'}</td>
-                        <td>${highlightText(row.description, keywords)}</td>
-                                <td>${escapeHtml(row.product_division) || '-'}</td>
-                                <td>${escapeHtml(row.material_group) || '-'}</td>
-                                <td>${escapeHtml(row.material_group_desc) || '-'}</td>
-                                <td>${escapeHtml(row.manufacturer_name) || '-'}</td>
-                        <td>${escapeHtml(row.manufacturer_item_no) || '-'}</td>
-                        <td>${escapeHtml(row.sales_status) || '-'}</td>
-                        <td>${escapeHtml(row.product_manager) || '-'}</td>
-                        <td>${escapeHtml(row.sub_item) || '-'}</td>
-                    </tr>
-                `).join('')}
+                ${renderResultRows(results, keywords)}
             </tbody>
         </table>
+        <div id="resultsSentinel" class="results-sentinel"></div>
     `;
     
     resultsContainer.innerHTML = html;
 }
 
+// Turn a format=columns /search response back into row objects (results) and
+// filter option lists (result_filters), as the default format sends them
+function decodeSearchResponse(data) {
+    if (!data.columns) return data;
+    const { fields, columns, dictionaries } = data;
+    const results = new Array(data.count);
+    for (let i = 0; i < data.count; i++) {
+        const row = {};
+        fields.forEach(field => {
+            const value = columns[field][i];
+            row[field] = dictionaries[field] ? dictionaries[field][value] : value;
+        });
+        results[i] = row;
+    }
+    data.results = results;
+    if (data.facet_counts) {
+        data.result_filters = Object.fromEntries(
+            Object.entries(data.facet_counts).map(([key, counts]) => [key, Object.keys(counts).sort()]));
+    }
+    return data;
+}
+
+// Fetch further result pages as the bottom of the table scrolls into view
+function startPaging(state) {
+    stopPaging();
+    const sentinel = document.getElementById('resultsSentinel');
+    if (!sentinel || state.offset >= state.total) return;
+    searchPaging = { ...state, loading: false };
+    sentinel.textContent = `Showing ${state.offset} of ${state.total}`;
+    pageObserver = new IntersectionObserver(entries => {
+        if (entries.some(e => e.isIntersecting)) loadNextPage();
+    }, { rootMargin: '400px' });
+    pageObserver.observe(sentinel);
+}
+
+function stopPaging() {
+    if (pageObserver) pageObserver.disconnect();
+    pageObserver = null;
+    searchPaging = null;
+}
+
+async function loadNextPage() {
+    const paging = searchPaging;
+    if (!paging || paging.loading || paging.offset >= paging.total) return;
+    paging.loading = true;
+    const sentinel = document.getElementById('resultsSentinel');
+    if (sentinel) sentinel.textContent = 'Loading more results...';
+    try {
+        const response = await fetchWithTimeout('/search', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ dataset: paging.dataset, keywords: paging.keywords, filters: paging.filters, sort: paging.sort, fuzzy: paging.fuzzy, offset: paging.offset, limit: SEARCH_PAGE_SIZE, format: 'columns' })
+        }, 30000);
+        // ignore pages that arrive after a new search was started
+        if (paging !== searchPaging) return;
+        const data = response.ok ? decodeSearchResponse(await response.json()) : {};
+        const rows = data.results || [];
+        const tbody = resultsContainer.querySelector('.results-table tbody');
+        if (!response.ok || !tbody || rows.length === 0) {
+            if (sentinel) sentinel.textContent = 'Failed to load more results. Scroll to retry.';
+            return;
+        }
+        tbody.insertAdjacentHTML('beforeend', renderResultRows(rows, paging.highlight));
+        paging.offset += rows.length;
+        if (sentinel) sentinel.textContent = paging.offset < paging.total ? `Showing ${paging.offset} of ${paging.total}` : '';
+        if (paging.offset >= paging.total) stopPaging();
+    } catch (err) {
+        console.error('Loading next page failed', err);
+        if (sentinel) sentinel.textContent = 'Failed to load more results. Scroll to retry.';
+    } finally {
+        paging.loading = false;
+    }
+}
+
 function updateFiltersFromResults(results) {
     // compute unique sets from results
     const mset = new Set();
@@ -644,13 +861,27 @@ function updateFiltersFromResults(results) {
         if (r.material_group_desc) mgdset.add(String(r.material_group_desc).trim());
     });
 
-    currentFilterOptions.manufacturers = Array.from(mset).sort();
-    currentFilterOptions.product_divisions = Array.from(pdset).sort();
-    currentFilterOptions.sales_statuses = Array.from(ssset).sort();
-    currentFilterOptions.product_managers = Array.from(pmset).sort();
-    currentFilterOptions.sub_items = Array.from(siset).sort();
-    currentFilterOptions.material_groups = Array.from(mgset).sort();
-    currentFilterOptions.material_group_descs = Array.from(mgdset).sort();
+    applyCurrentFilterOptions({
+        manufacturers: Array.from(mset).sort(),
+        product_divisions: Array.from(pdset).sort(),
+        sales_statuses: Array.from(ssset).sort(),
+        product_managers: Array.from(pmset).sort(),
+        sub_items: Array.from(siset).sort(),
+        material_groups: Array.from(mgset).sort(),
+        material_group_descs: Array.from(mgdset).sort()
+    });
+}
+
+// Replace the current filter options (e.g. with server-computed result_filters and their facet_counts)
+function applyCurrentFilterOptions(options, counts) {
+    currentFilterCounts = counts || {};
+    currentFilterOptions.manufacturers = options.manufacturers || [];
+    currentFilterOptions.product_divisions = options.product_divisions || [];
+    currentFilterOptions.sales_statuses = options.sales_statuses || [];
+    currentFilterOptions.product_managers = options.product_managers || [];
+    currentFilterOptions.sub_items = options.sub_items || [];
+    currentFilterOptions.material_groups = options.material_groups || [];
+    currentFilterOptions.material_group_descs = options.material_group_descs || [];
 
     // populate checkbox lists and preserve checked boxes where possible
     const prevChecked = sel => sel ? Array.from(sel.querySelectorAll('input[type="checkbox"]:checked')).map(i => i.value) : [];
@@ -692,6 +923,7 @@ clearSearchBtn?.addEventListener('click', () => {
     // clear search box
     if (searchInput) searchInput.value = '';
     // clear results
+    stopPaging();
     if (resultsContainer) resultsContainer.innerHTML = '<p class="placeholder-text">Ready to search. Enter keywords above.</p>';
     // clear status
     if (searchStatus) {
@@ -713,13 +945,18 @@ clearSearchBtn?.addEventListener('click', () => {
 // Clear Upload: clear uploaded file on server and reset UI
 clearUploadBtn?.addEventListener('click', async () => {
     try {
-        const res = await fetchWithTimeout('/clear', { method: 'POST' }, 20000);
+        const res = await fetchWithTimeout('/clear', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ dataset: currentDataset() })
+        }, 20000);
         if (res.ok) {
             // reset UI
             isFileLoaded = false;
             if (fileInfo) fileInfo.style.display = 'none';
             if (fileName) fileName.textContent = '';
             if (rowCount) rowCount.textContent = '';
+            stopPaging();
             if (resultsContainer) resultsContainer.innerHTML = '<p class="placeholder-text">Upload a file and search to see results here</p>';
             // clear filters and options
             fullFilterOptions.manufacturers = [];
@@ -736,6 +973,7 @@ clearUploadBtn?.addEventListener('click', async () => {
             currentFilterOptions.sub_items = [];
             currentFilterOptions.material_groups = [];
             currentFilterOptions.material_group_descs = [];
+            currentFilterCounts = {};
             populateCheckboxList(manufacturerFilter, [], 'manufacturer');
             populateCheckboxList(productDivisionFilter, [], 'product_division');
             populateCheckboxList(salesStatusFilter, [], 'sales_status');